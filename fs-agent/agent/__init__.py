@@ -1,11 +1,32 @@
 """
 Agent package exposing LangGraph tools for testing.
+
+The pure document helpers come from `core` and import without LangChain or
+LangGraph. Anything else (`graph`, `workflow`, the tools) loads `agent.py` on
+first access.
 """
 
-from .agent import (  # noqa: F401
+import importlib
+import sys
+from pathlib import Path
+
+# agent.py imports its sibling modules absolutely (that is how langgraph loads it),
+# so make them resolvable when the directory is imported as a package too.
+_AGENT_DIR = str(Path(__file__).resolve().parent)
+if _AGENT_DIR not in sys.path:
+    sys.path.insert(0, _AGENT_DIR)
+
+from .core import (  # noqa: F401,E402
     apply_proposals_to_content,
     build_msa_content,
     build_sow_content,
+    compute_quote_summary,
     generate_review_proposals_from_content,
 )
 
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    module = importlib.import_module(".agent", __name__)
+    return getattr(module, name)
@@ -0,0 +1,299 @@
+"""
+Process-wide admission control for model calls.
+
+Every `call_model` goes through `controller.slot()` before it reaches the
+provider. Two token buckets hold the process to the provider's limits:
+`COPILOT_LLM_RPM` requests and `COPILOT_LLM_TPM` tokens per minute (0, the
+default, means no limit). Both are the limits for the whole host: each of the
+`COPILOT_WORKERS` processes serve.py starts (1 under `langgraph dev`) gets an
+even share. Containers do not know about each other, so with several
+containers set the limits to each container's share of the account. A call's tokens are estimated up front from its
+messages and tool schemas plus `COPILOT_LLM_OUTPUT_TOKENS` (default 500), and
+corrected from the reply's usage once it returns.
+
+Calls that cannot go at once wait in a priority queue: interactive turns
+before batch jobs, first come first served within a priority. A run is a batch
+job when `configurable.priority` (header `x-copilot-priority`) is "batch".
+
+Load is shed up front rather than after a long wait. A call is refused with
+AdmissionRejected, whose message is shown to the user, when
+`COPILOT_LLM_MAX_QUEUE` calls are already waiting (default 100), or when its
+estimated wait is longer than `COPILOT_LLM_MAX_QUEUE_WAIT` seconds (default 10)
+or than the turn has left. Queue wait, depth, admissions and shed calls are
+reported in the `copilot_llm_*` metrics and on the chat_node span.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+import deadlines
+import metrics
+from context_enricher import estimate_tokens
+from intents import message_text
+
+
+def per_worker_limit(name: str) -> float:
+    """
+    This process's share of the host-wide per-minute limit in env var `name`.
+    """
+    workers = max(int(os.environ.get("COPILOT_WORKERS", "1")), 1)
+    return float(os.environ.get(name, "0")) / workers
+
+
+RPM = per_worker_limit("COPILOT_LLM_RPM")
+TPM = per_worker_limit("COPILOT_LLM_TPM")
+OUTPUT_TOKENS_ESTIMATE = int(os.environ.get("COPILOT_LLM_OUTPUT_TOKENS", "500"))
+MAX_QUEUE = int(os.environ.get("COPILOT_LLM_MAX_QUEUE", "100"))
+MAX_QUEUE_WAIT_SECONDS = float(os.environ.get("COPILOT_LLM_MAX_QUEUE_WAIT", "10"))
+
+INTERACTIVE, BATCH = "interactive", "batch"
+_PRIORITY_ORDER = {INTERACTIVE: 0, BATCH: 1}
+
+SHED_MESSAGE = (
+    "I'm handling too many requests right now, so I didn't start on this one. "
+    "Please try again in a few seconds."
+)
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, reason: str, message: str = SHED_MESSAGE):
+        super().__init__(message)
+        self.reason = reason
+
+
+def priority_of(config: Optional[Dict[str, Any]]) -> str:
+    configurable = (config or {}).get("configurable") or {}
+    value = configurable.get("priority") or configurable.get("x-copilot-priority") or INTERACTIVE
+    return BATCH if str(value).lower() == BATCH else INTERACTIVE
+
+
+def estimate_call_tokens(messages: Sequence[BaseMessage], tools: Sequence[Any]) -> int:
+    """
+    Rough token count of a model call: prompt, tool schemas and the expected reply.
+    """
+    prompt = sum(estimate_tokens(message_text(message)) for message in messages)
+    schemas = sum(estimate_tokens(json.dumps(tool, default=str)) for tool in tools if isinstance(tool, dict))
+    return prompt + schemas + OUTPUT_TOKENS_ESTIMATE
+
+
+class TokenBucket:
+    """
+    `per_minute` units refilled continuously, holding at most one minute's worth.
+    A rate of 0 means unlimited. Not thread-safe; AdmissionController locks around it.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_seconds(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available (0 if they are now).
+        """
+        if self.unlimited:
+            return 0.0
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def take(self, amount: float, now: float) -> None:
+        if self.unlimited:
+            return
+        self.refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float, now: float) -> None:
+        """
+        Return units (or, with a negative amount, take more) once the real cost is known.
+        """
+        if self.unlimited:
+            return
+        self.refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Ticket:
+    __slots__ = ("order", "priority", "tokens", "loop", "future", "enqueued")
+
+    def __init__(self, order, priority: str, tokens: int, loop: asyncio.AbstractEventLoop):
+        self.order = order
+        self.priority = priority
+        self.tokens = tokens
+        self.loop = loop
+        self.future: asyncio.Future = loop.create_future()
+        self.enqueued = time.perf_counter()
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return self.order < other.order
+
+
+def _admit(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Admission:
+    """
+    An admitted call. `settle()` reports the tokens it really used.
+    """
+
+    def __init__(self, controller: "AdmissionController", tokens: int, waited: float):
+        self.controller = controller
+        self.tokens = tokens
+        self.waited = waited
+
+    def settle(self, used_tokens: Optional[int]) -> None:
+        if used_tokens:
+            self.controller.refund(self.tokens - used_tokens)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rpm: float = RPM,
+        tpm: float = TPM,
+        max_queue: int = MAX_QUEUE,
+        max_queue_wait: float = MAX_QUEUE_WAIT_SECONDS,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self._lock = threading.Lock()
+        self._queue: List[_Ticket] = []
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: str = INTERACTIVE) -> AsyncIterator[Admission]:
+        """
+        Wait for the buckets to allow a call of about `tokens` tokens, in priority order.
+        Raises AdmissionRejected when the call should be shed, DeadlineExceeded when the
+        turn runs out of time while queued.
+        """
+        waited = await self.acquire(tokens, priority)
+        yield Admission(self, tokens, waited)
+
+    async def acquire(self, tokens: int, priority: str = INTERACTIVE) -> float:
+        """
+        Admit one call; returns the seconds it spent queued.
+        """
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket((_PRIORITY_ORDER[priority], next(self._sequence)), priority, tokens, loop)
+        with self._lock:
+            reason = self._shed_reason(ticket)
+            if reason:
+                metrics.llm_admissions.inc(priority=priority, outcome=f"shed_{reason}")
+                raise AdmissionRejected(reason)
+            heapq.heappush(self._queue, ticket)
+            self._set_depth()
+            retry_in = self._dispatch()
+        try:
+            while not ticket.future.done():
+                timeout = retry_in
+                left = deadlines.remaining()
+                if left is not None:
+                    if left <= 0:
+                        raise deadlines.DeadlineExceeded("The turn ran out of time waiting for the model.")
+                    timeout = left if timeout is None else min(timeout, left)
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        retry_in = self._dispatch()
+        except BaseException:
+            with self._lock:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._set_depth()
+                    self._dispatch()
+            if not ticket.future.done():
+                metrics.llm_admissions.inc(priority=priority, outcome="expired")
+            raise
+        waited = time.perf_counter() - ticket.enqueued
+        metrics.llm_admissions.inc(priority=priority, outcome="admitted")
+        metrics.llm_queue_wait.observe(waited, priority=priority)
+        return waited
+
+    def refund(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens.give_back(tokens, time.monotonic())
+            self._dispatch()
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _shed_reason(self, ticket: _Ticket) -> Optional[str]:
+        if len(self._queue) >= self.max_queue:
+            return "queue_full"
+        # Everything already queued at the same or a higher priority goes first.
+        ahead = [queued for queued in self._queue if queued.order < ticket.order]
+        now = time.monotonic()
+        wait = max(
+            self._backlog_seconds(self.requests, len(ahead) + 1, now),
+            self._backlog_seconds(self.tokens, sum(queued.tokens for queued in ahead) + ticket.tokens, now),
+        )
+        left = deadlines.remaining()
+        if wait > self.max_queue_wait or (left is not None and wait > left):
+            return "wait"
+        return None
+
+    @staticmethod
+    def _backlog_seconds(bucket: TokenBucket, amount: float, now: float) -> float:
+        """
+        Seconds until `bucket` has refilled enough for `amount` units, which may exceed its capacity.
+        """
+        if bucket.unlimited:
+            return 0.0
+        bucket.refill(now)
+        return max(0.0, (amount - bucket.level) * 60 / bucket.per_minute)
+
+    def _dispatch(self) -> Optional[float]:
+        """
+        Admit queued calls in order while the buckets allow. Returns the seconds until
+        the head of the queue can go, or None when the queue is empty. Lock held.
+        """
+        now = time.monotonic()
+        retry_in = None
+        while self._queue:
+            head = self._queue[0]
+            wait = max(self.requests.wait_seconds(1, now), self.tokens.wait_seconds(head.tokens, now))
+            if wait > 0:
+                retry_in = wait
+                break
+            heapq.heappop(self._queue)
+            self.requests.take(1, now)
+            self.tokens.take(head.tokens, now)
+            head.loop.call_soon_threadsafe(_admit, head.future)
+        self._set_depth()
+        return retry_in
+
+    def _set_depth(self) -> None:
+        counts = {INTERACTIVE: 0, BATCH: 0}
+        for ticket in self._queue:
+            counts[ticket.priority] += 1
+        for priority, count in counts.items():
+            metrics.llm_queue_depth.set(count, priority=priority)
+
+
+controller = AdmissionController()
@@ -0,0 +1,522 @@
+"""
+Record/replay cassettes: real turns as repeatable offline benchmarks.
+
+Recording writes one graph turn to a JSONL cassette in `COPILOT_CASSETTE_DIR`
+(default "cassettes"), named `<thread id>-<trace id>.jsonl`. A turn is recorded
+when its run sets `configurable.record_cassette`, or every turn when
+`COPILOT_RECORD_CASSETTES=1`. Clients can ask for it with the header
+`x-copilot-record-cassette: 1` only when the server sets
+`COPILOT_ALLOW_CASSETTE_HEADER=1` (default off), since cassettes hold the
+Supabase rows the turn read. A cassette stops taking lines past
+`COPILOT_CASSETTE_MAX_BYTES` (default 10 MB; its "end" line then says
+`truncated`), and starting one removes the oldest cassettes beyond
+`COPILOT_CASSETTE_MAX_FILES` (default 200). 0 means no limit.
+A cassette holds, one JSON object per line:
+
+- "turn": the turn's input state (messages, workflow, entity id, usage) and
+  the plain values of its configurable;
+- "model": each chat_node model reply, with its tier and duration;
+- "supabase": each Supabase HTTP attempt: method, path and query, a digest of
+  the JSON body, and the response status, content headers, body and duration
+  (or the connection error it raised);
+- "tool": each tool call's name, args, result, status and duration;
+- "end": the turn's status and duration.
+
+Every line carries `at`, seconds since the turn started. Hosts, API keys and
+request headers are never written. While a turn is recorded or replayed, the
+caches that can answer it from an earlier turn (the read cache, the response
+cache and the pushback summaries) are bypassed, so the cassette holds every
+read the turn depends on and replays the same way on a cold worker.
+
+Replaying runs the recorded turn through the graph offline:
+
+    python cassette.py cassettes/<thread>-<trace>.jsonl --repeat 5
+
+The "replay" model backend answers each model call with the next recorded
+reply, and `supabase_request` answers each request with the recorded response
+for the same method, path and body (falling back to the oldest unused one for
+the same method and path), both after sleeping the recorded duration
+(`--no-timing` skips the sleeps). Everything else, tools included, runs for
+real, so a code change shows up as a change in replayed time against the
+recorded time. A tool whose result differs from the recording is reported as
+a divergence. A read the cassette cannot answer fails with CassetteMiss; an
+unmatched write is acknowledged with 204 and reported.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from langchain_core.messages import AIMessage, message_to_dict, messages_from_dict, messages_to_dict
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_DIR = os.environ.get("COPILOT_CASSETTE_DIR", "cassettes")
+RECORD_ALL = os.environ.get("COPILOT_RECORD_CASSETTES", "").lower() in ("1", "true", "yes")
+ALLOW_HEADER = os.environ.get("COPILOT_ALLOW_CASSETTE_HEADER", "").lower() in ("1", "true", "yes")
+MAX_BYTES = int(os.environ.get("COPILOT_CASSETTE_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_FILES = int(os.environ.get("COPILOT_CASSETTE_MAX_FILES", "200"))
+
+RESPONSE_HEADERS = ("content-type", "content-range")
+# Configurable keys never written to a cassette, besides LangGraph's own ("__pregel_*", "checkpoint_*").
+_SECRET_KEY = re.compile(r"key|token|secret|authorization|password", re.IGNORECASE)
+_RECORD_KEYS = ("record_cassette", "x-copilot-record-cassette")
+# Forwarded from the request by serve.py and langgraph.json's configurable_headers.
+_RECORD_HEADER = "x-copilot-record-cassette"
+_API_PATH = re.compile(r"/(?:rest|storage)/v1/.*")
+# Placeholders for replaying without Supabase credentials; no request leaves the process.
+REPLAY_SUPABASE_URL = "http://supabase.replay"
+REPLAY_SERVICE_ROLE_KEY = "replay"
+
+
+class CassetteMiss(RuntimeError):
+    pass
+
+
+def recording_requested(config: Optional[Dict[str, Any]]) -> bool:
+    configurable = (config or {}).get("configurable") or {}
+    keys = _RECORD_KEYS if ALLOW_HEADER else tuple(key for key in _RECORD_KEYS if key != _RECORD_HEADER)
+    value = next((configurable[key] for key in keys if configurable.get(key)), None)
+    return RECORD_ALL or str(value).lower() in ("1", "true", "yes")
+
+
+def request_target(url: str, params: Any = None) -> str:
+    """
+    Path and query of a Supabase request, without the host.
+    """
+    found = _API_PATH.search(url)
+    target = found.group(0) if found else urlsplit(url).path
+    if params:
+        target += ("&" if "?" in target else "?") + urlencode(params, doseq=True)
+    return target
+
+
+def body_digest(kwargs: Dict[str, Any]) -> Optional[str]:
+    if kwargs.get("json") is not None:
+        data = json.dumps(kwargs["json"], sort_keys=True, default=str).encode("utf-8")
+    elif isinstance(kwargs.get("data"), (bytes, str)):
+        data = kwargs["data"].encode("utf-8") if isinstance(kwargs["data"], str) else kwargs["data"]
+    else:
+        return None
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _plain_configurable(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    configurable = (config or {}).get("configurable") or {}
+    return {
+        key: value
+        for key, value in configurable.items()
+        if isinstance(value, (str, int, float, bool))
+        and not key.startswith(("__", "checkpoint_", "langgraph_"))
+        and key not in _RECORD_KEYS
+        and not _SECRET_KEY.search(key)
+    }
+
+
+class Recorder:
+    """
+    Appends the lines of one turn's cassette; safe to call from tool and prefetch threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.truncated = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, kind: str, **fields: Any) -> None:
+        line = json.dumps(
+            {"kind": kind, "at": round(time.perf_counter() - self._started, 4), **fields},
+            default=str,
+            separators=(",", ":"),
+        )
+        with self._lock:
+            if self._file.closed:
+                return
+            # The "end" line always fits, so a truncated cassette still says how the turn ended.
+            if kind != "end" and self.max_bytes and self.size + len(line) + 1 > self.max_bytes:
+                self.truncated = True
+                return
+            self._file.write(line + "\n")
+            self.size += len(line) + 1
+
+    def close(self, status: str) -> None:
+        extra = {"truncated": True} if self.truncated else {}
+        self.write("end", status=status, seconds=round(time.perf_counter() - self._started, 4), **extra)
+        with self._lock:
+            self._file.close()
+
+
+_recording: ContextVar[Optional[Recorder]] = ContextVar("copilot_cassette", default=None)
+_turns: Dict[str, Recorder] = {}
+_turns_lock = threading.Lock()
+_replayer: Optional["Replayer"] = None
+
+
+def active() -> bool:
+    """
+    Whether the current turn is being recorded or a cassette is being replayed.
+    """
+    return _replayer is not None or _recording.get() is not None
+
+
+def prune(directory: str, keep: int) -> List[str]:
+    """
+    Remove the oldest cassettes in `directory` so at most `keep` remain, skipping any still being
+    recorded; returns the removed paths.
+    """
+    with _turns_lock:
+        recording = {recorder.path for recorder in _turns.values()}
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".jsonl")]
+    except FileNotFoundError:
+        return []
+    paths = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            paths.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue
+    removed = []
+    for _, path in sorted(paths)[: max(0, len(paths) - keep)]:
+        if path in recording:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue  # another worker pruned it first
+        removed.append(path)
+    return removed
+
+
+def begin_turn(trace_id: str, state: Dict[str, Any], config: Optional[Dict[str, Any]]) -> Optional[Recorder]:
+    """
+    Start recording the turn `trace_id` if its run asked for it.
+    """
+    if _replayer is not None or not recording_requested(config):
+        return None
+    if MAX_FILES:
+        # Room for the new cassette.
+        prune(CASSETTE_DIR, MAX_FILES - 1)
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id") or "run"
+    recorder = Recorder(os.path.join(CASSETTE_DIR, f"{thread_id}-{trace_id}.jsonl"), max_bytes=MAX_BYTES)
+    recorder.write(
+        "turn",
+        messages=messages_to_dict(state.get("messages") or []),
+        workflow=state.get("workflow"),
+        entity_id=state.get("entity_id"),
+        usage=state.get("usage"),
+        configurable=_plain_configurable(config),
+    )
+    with _turns_lock:
+        _turns[trace_id] = recorder
+    return recorder
+
+
+def end_turn(trace_id: Optional[str], status: str = "ok") -> Optional[str]:
+    """
+    Finish the turn's cassette, if it is being recorded; returns its path.
+    """
+    with _turns_lock:
+        recorder = _turns.pop(trace_id, None) if trace_id else None
+    if recorder is None:
+        return None
+    recorder.close(status)
+    return recorder.path
+
+
+@contextmanager
+def turn_scope(trace_id: Optional[str]) -> Iterator[None]:
+    """
+    Route a node's model, tool and Supabase calls to its turn's cassette, like deadlines.deadline_scope.
+    """
+    with _turns_lock:
+        recorder = _turns.get(trace_id) if trace_id else None
+    if recorder is None:
+        yield
+        return
+    token = _recording.set(recorder)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+def record_model(tier: str, response: AIMessage, seconds: float) -> None:
+    recorder = _recording.get()
+    if recorder is not None:
+        recorder.write("model", tier=tier, seconds=round(seconds, 4), message=message_to_dict(response))
+
+
+def record_tool(name: Optional[str], args: Any, result: Any, status: str, seconds: float) -> None:
+    if _replayer is not None:
+        _replayer.check_tool(name, args, result)
+        return
+    recorder = _recording.get()
+    if recorder is not None:
+        recorder.write("tool", name=name, args=args, result=result, status=status, seconds=round(seconds, 4))
+
+
+def send(session: requests.Session, method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    `session.request`, answered from the cassette being replayed, and written to
+    the turn's cassette while recording.
+    """
+    if _replayer is not None:
+        return _replayer.supabase_response(method, url, kwargs)
+    recorder = _recording.get()
+    if recorder is None:
+        return session.request(method, url, **kwargs)
+    request = {"method": method, "target": request_target(url, kwargs.get("params")), "digest": body_digest(kwargs)}
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout) as exc:
+        recorder.write("supabase", **request, error=type(exc).__name__, seconds=round(time.perf_counter() - started, 4))
+        raise
+    recorder.write(
+        "supabase",
+        **request,
+        status=response.status_code,
+        headers={name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers},
+        **_encode_body(response.content),
+        seconds=round(time.perf_counter() - started, 4),
+    )
+    return response
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return (entry.get("body") or "").encode("utf-8")
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class Replayer:
+    def __init__(self, path: str, timing: bool = True):
+        self.path = path
+        self.timing = timing
+        entries = load(path)
+        self.turn = next((entry for entry in entries if entry["kind"] == "turn"), None)
+        if self.turn is None:
+            raise ValueError(f"{path} has no turn line; is it a cassette?")
+        self.recorded = next((entry for entry in entries if entry["kind"] == "end"), None)
+        self._models: Deque[Dict[str, Any]] = deque(entry for entry in entries if entry["kind"] == "model")
+        self._supabase = [entry for entry in entries if entry["kind"] == "supabase"]
+        self._tools = [entry for entry in entries if entry["kind"] == "tool"]
+        self._lock = threading.Lock()
+        self.counts = {"model": 0, "supabase": 0, "tool": 0}
+        self.misses: List[str] = []
+        self.unmatched_writes: List[str] = []
+        self.divergences: List[Dict[str, Any]] = []
+
+    def input(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        The recorded turn's graph input and config, with the model backend set to "replay".
+        """
+        state = {
+            "messages": messages_from_dict(self.turn["messages"]),
+            "workflow": self.turn.get("workflow"),
+            "entity_id": self.turn.get("entity_id"),
+        }
+        if self.turn.get("usage"):
+            state["usage"] = self.turn["usage"]
+        return state, {"configurable": {**self.turn.get("configurable", {}), "model_backend": "replay"}}
+
+    def model_reply(self) -> Tuple[AIMessage, float]:
+        with self._lock:
+            if not self._models:
+                self.misses.append("model call")
+                raise CassetteMiss(f"{self.path} has no more recorded model replies.")
+            entry = self._models.popleft()
+            self.counts["model"] += 1
+        return messages_from_dict([entry["message"]])[0], entry["seconds"] if self.timing else 0.0
+
+    def supabase_response(self, method: str, url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        target = request_target(url, kwargs.get("params"))
+        digest = body_digest(kwargs)
+        with self._lock:
+            entry = self._take(method, target, digest)
+            if entry is None:
+                if method == "GET":
+                    self.misses.append(f"{method} {target}")
+                else:
+                    self.unmatched_writes.append(f"{method} {target}")
+            else:
+                self.counts["supabase"] += 1
+        if entry is None:
+            if method == "GET":
+                raise CassetteMiss(f"{self.path} has no recorded response for {method} {target}.")
+            return _response(url, 204, {}, b"", 0.0)
+        if self.timing:
+            time.sleep(entry["seconds"])
+        if "error" in entry:
+            error = getattr(requests.exceptions, entry["error"], requests.ConnectionError)
+            raise error(f"Replayed {entry['error']} for {method} {target}")
+        return _response(url, entry["status"], entry.get("headers") or {}, _decode_body(entry), entry["seconds"])
+
+    def _take(self, method: str, target: str, digest: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Oldest unused recording for the request: same body if possible, else same method and path. Lock held.
+        """
+        candidates = [entry for entry in self._supabase if entry["method"] == method and entry["target"] == target]
+        entry = next((entry for entry in candidates if entry["digest"] == digest), None) or next(iter(candidates), None)
+        if entry is not None:
+            self._supabase.remove(entry)
+        return entry
+
+    def check_tool(self, name: Optional[str], args: Any, result: Any) -> None:
+        with self._lock:
+            self.counts["tool"] += 1
+            recorded = next((entry for entry in self._tools if entry["name"] == name), None)
+            if recorded is not None:
+                self._tools.remove(recorded)
+            if recorded is None or recorded.get("result") != result:
+                self.divergences.append(
+                    {
+                        "tool": name,
+                        "args": args,
+                        "recorded": None if recorded is None else recorded.get("result"),
+                        "replayed": result,
+                    }
+                )
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cassette": self.path,
+                "recorded_seconds": (self.recorded or {}).get("seconds"),
+                "truncated": bool((self.recorded or {}).get("truncated")),
+                "replayed_seconds": round(seconds, 4),
+                "calls": dict(self.counts),
+                "unused": {"model": len(self._models), "supabase": len(self._supabase), "tool": len(self._tools)},
+                "misses": list(self.misses),
+                "unmatched_writes": list(self.unmatched_writes),
+                "divergences": list(self.divergences),
+            }
+
+
+def _response(url: str, status: int, headers: Dict[str, str], content: bytes, seconds: float) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = "utf-8"
+    response.url = url
+    response.elapsed = timedelta(seconds=seconds)
+    return response
+
+
+def next_model_reply() -> Tuple[AIMessage, float]:
+    """
+    The next recorded model reply and how long to wait before returning it (the "replay" backend).
+    """
+    if _replayer is None:
+        raise CassetteMiss('The "replay" model backend only works while a cassette is replayed.')
+    return _replayer.model_reply()
+
+
+@contextmanager
+def replaying(replayer: Replayer) -> Iterator[Replayer]:
+    """
+    Serve every Supabase request in the process from `replayer`, background threads included.
+    """
+    global _replayer
+    previous, _replayer = _replayer, replayer
+    try:
+        yield replayer
+    finally:
+        _replayer = previous
+
+
+async def replay(path: str, graph: Any, timing: bool = True) -> Dict[str, Any]:
+    """
+    Run the cassette's turn through `graph` against its recordings; returns the replay report.
+    """
+    replayer = Replayer(path, timing=timing)
+    state, config = replayer.input()
+    with replaying(replayer):
+        started = time.perf_counter()
+        await graph.ainvoke(state, config)
+        seconds = time.perf_counter() - started
+    return replayer.report(seconds)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    calls = report["calls"]
+    print(
+        f"{report['cassette']}: recorded {report['recorded_seconds']}s, replayed {report['replayed_seconds']:.3f}s "
+        f"({calls['model']} model, {calls['supabase']} supabase, {calls['tool']} tool calls)"
+    )
+    if report.get("truncated"):
+        print("  truncated: the recording hit COPILOT_CASSETTE_MAX_BYTES; expect misses")
+    for miss in report["misses"]:
+        print(f"  miss: {miss}")
+    for write in report["unmatched_writes"]:
+        print(f"  unmatched write: {write}")
+    for divergence in report["divergences"]:
+        print(f"  divergence: {divergence['tool']} {json.dumps(divergence['args'], default=str)}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette", help="Cassette (.jsonl) to replay.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the turn this many times.")
+    parser.add_argument("--no-timing", action="store_true", help="Don't wait the recorded model and Supabase latency.")
+    parser.add_argument("--json", type=str, default="", help="Write the report(s) to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Warm-up would send its pool probes into the cassette.
+    os.environ.setdefault("COPILOT_WARM_STARTUP", "0")
+    import agent as agent_module
+    # The module agent.py and supabase_client.py hook into, not this script's `__main__` copy.
+    import cassette as hooks
+
+    agent_module.SUPABASE_URL = agent_module.SUPABASE_URL or REPLAY_SUPABASE_URL
+    agent_module.SUPABASE_SERVICE_ROLE_KEY = agent_module.SUPABASE_SERVICE_ROLE_KEY or REPLAY_SERVICE_ROLE_KEY
+    reports = []
+    for _ in range(args.repeat):
+        report = asyncio.run(hooks.replay(args.cassette, agent_module.graph, timing=not args.no_timing))
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(reports, fh, indent=2, default=str)
+    return 1 if any(report["misses"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
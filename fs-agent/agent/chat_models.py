@@ -0,0 +1,317 @@
+"""
+Chat-model backends for the copilot graph.
+
+`get_chat_model` picks the backend from the run config (`configurable.model_backend`)
+or the `COPILOT_MODEL_BACKEND` environment variable:
+
+- "openai" (default): ChatOpenAI.
+- "fake": ScriptedChatModel, which replays predefined tool calls and text with a
+  configurable latency and token rate so the whole graph can be exercised and
+  benchmarked offline, deterministically and for free.
+- "replay": ReplayChatModel, which answers with the model replies of the cassette
+  being replayed, after their recorded latency (see cassette.py).
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import cassette
+from intents import message_text
+
+DEFAULT_MODEL = "gpt-4o"
+
+# Rules are tried in order against the latest user message; the step within a turn
+# is the number of model replies since that message (0 = first call, 1 = after the
+# first tool result, ...). "{entity_id}" in tool args is filled from the system prompt.
+DEFAULT_FAKE_SCRIPT: List[Dict[str, Any]] = [
+    {
+        "match": r"\btotal\b|how much|\bcost\b",
+        "steps": [
+            {"tool_calls": [{"name": "get_project_total", "args": {"estimate_id": "{entity_id}"}}]},
+            {"content": "The current quote total is shown above, including role rates and overrides."},
+        ],
+    },
+    {
+        "match": r"\bwbs\b|work breakdown",
+        "steps": [
+            {"tool_calls": [{"name": "generate_wbs", "args": {"estimate_id": "{entity_id}"}}]},
+            {"content": "I generated a new WBS for this estimate. Review the rows in the Effort Estimate stage."},
+        ],
+    },
+    {
+        "match": r"pushback|conflict",
+        "steps": [
+            {"tool_calls": [{"name": "summarize_pushbacks", "args": {"agreement_id": "{entity_id}"}}]},
+            {"content": "Here is a summary of the pushbacks recorded on this agreement."},
+        ],
+    },
+    {
+        "match": r"\bnote\b",
+        "steps": [
+            {"tool_calls": [{"name": "add_agreement_note", "args": {"agreement_id": "{entity_id}", "note": "Follow up with the client."}}]},
+            {"content": "I added the note to this agreement."},
+        ],
+    },
+    {
+        "match": r"exemplar",
+        "steps": [
+            {"tool_calls": [{"name": "load_exemplar_contracts", "args": {"contract_type": "SOW"}}]},
+            {"content": "I loaded the latest SOW exemplars for reference."},
+        ],
+    },
+    {
+        "steps": [
+            {"content": "I can help with estimates and contracts. Ask me about totals, the WBS, pushbacks or notes."},
+        ],
+    },
+]
+
+_ENTITY_ID = re.compile(r"Current entity ID: (\S+)")
+
+
+def _fill(value: Any, variables: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace("{" + name + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {key: _fill(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, variables) for item in value]
+    return value
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic fake chat model driven by a script of rules (see DEFAULT_FAKE_SCRIPT).
+    """
+
+    script: List[Dict[str, Any]] = DEFAULT_FAKE_SCRIPT
+    latency_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    model_name: str = "scripted-fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool schemas are irrelevant to a scripted reply; keep the same call signature as ChatOpenAI.
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        last_human = ""
+        step = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                last_human = message_text(message)
+                break
+            if isinstance(message, AIMessage):
+                step += 1
+        entity_id = ""
+        for message in messages:
+            if isinstance(message, SystemMessage):
+                found = _ENTITY_ID.search(message_text(message))
+                if found:
+                    entity_id = found.group(1)
+        ai_count = sum(1 for message in messages if isinstance(message, AIMessage))
+
+        rule = next(
+            (
+                rule
+                for rule in self.script
+                if not rule.get("match") or re.search(rule["match"], last_human, re.IGNORECASE)
+            ),
+            None,
+        )
+        steps = (rule or {}).get("steps") or [{"content": ""}]
+        if step < len(steps):
+            reply = _fill(steps[step], {"entity_id": entity_id})
+        else:
+            # Script exhausted: answer with the last text instead of looping on tool calls.
+            reply = {"content": steps[-1].get("content", "")}
+
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{ai_count}_{idx}", "type": "tool_call"}
+            for idx, call in enumerate(reply.get("tool_calls", []))
+        ]
+        content = reply.get("content", "")
+        input_tokens = sum(len(message_text(message).split()) for message in messages)
+        output_tokens = len(content.split()) + sum(len(json.dumps(call["args"]).split()) for call in tool_calls)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._next_message(messages)
+        time.sleep(self.latency_ms / 1000 + self._token_delay() * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._next_message(messages)
+        await asyncio.sleep(self.latency_ms / 1000 + self._token_delay() * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._next_message(messages)
+        time.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(message):
+            time.sleep(self._token_delay())
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._next_message(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(self._token_delay())
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    def _chunks(self, message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        words = message.content.split(" ") if message.content else []
+        for idx, word in enumerate(words):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if idx == 0 else f" {word}"))
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": idx}
+                        for idx, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata=message.usage_metadata,
+                response_metadata=message.response_metadata,
+            )
+        )
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model that replays the recorded replies of the cassette being replayed, in order.
+    """
+
+    model_name: str = "cassette-replay"
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, seconds = cassette.next_model_reply()
+        time.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, seconds = cassette.next_model_reply()
+        await asyncio.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@lru_cache(maxsize=8)
+def load_fake_script(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_FAKE_SCRIPT
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def get_model_backend(config: Optional[Dict[str, Any]] = None) -> str:
+    configurable = (config or {}).get("configurable") or {}
+    return configurable.get("model_backend") or os.environ.get("COPILOT_MODEL_BACKEND", "openai")
+
+
+def get_chat_model(config: Optional[Dict[str, Any]] = None, model: str = DEFAULT_MODEL) -> BaseChatModel:
+    """
+    Build the chat model for one chat_node call according to the configured backend.
+    """
+    backend = get_model_backend(config)
+    if backend == "fake":
+        configurable = (config or {}).get("configurable") or {}
+        return ScriptedChatModel(
+            script=configurable.get("fake_script") or load_fake_script(os.environ.get("COPILOT_FAKE_SCRIPT")),
+            latency_ms=float(configurable.get("fake_latency_ms", os.environ.get("COPILOT_FAKE_LATENCY_MS", "0"))),
+            tokens_per_second=float(
+                configurable.get("fake_tokens_per_second", os.environ.get("COPILOT_FAKE_TOKENS_PER_SECOND", "0"))
+            ),
+        )
+    if backend == "replay":
+        return ReplayChatModel()
+    if backend != "openai":
+        raise ValueError(f"Unknown COPILOT_MODEL_BACKEND {backend!r}; expected 'openai', 'fake' or 'replay'.")
+
+    return _openai_model(model)
+
+
+@lru_cache(maxsize=8)
+def _openai_model(model: str) -> BaseChatModel:
+    # One client per model keeps its HTTP connection pool warm across turns.
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model)
@@ -0,0 +1,558 @@
+"""
+Compacting SQLite checkpoint store for the copilot graph.
+
+The stock savers write the whole `AgentState` at every super-step: all
+`messages`, the `entity_data` snapshot and the `tools` list. As conversations
+grow, each write and read takes longer. This saver keeps the work per step
+roughly constant:
+
+- channel values are stored once in a content-addressed `blobs` table (keyed by
+  hash), so an `entity_data` or `tools` value that did not change is not written
+  again, and identical values are shared between threads;
+- channels whose version did not move reuse the parent checkpoint's reference
+  without being serialized at all;
+- `messages` is stored as a delta against the parent checkpoint (how many of
+  the parent's messages to keep, plus the hashes of the appended ones). Every
+  `COPILOT_CHECKPOINT_BASE_EVERY` steps a full list is written so that a read
+  never walks a long chain;
+- every `COPILOT_CHECKPOINT_COMPACT_EVERY` writes to a thread, the thread is
+  compacted to its last `COPILOT_CHECKPOINT_KEEP` checkpoints. `compact()` also
+  deletes blobs that are no longer referenced.
+
+serve.py uses this store for SQLite checkpoint files unless
+`COPILOT_CHECKPOINT_STORE=sqlite` selects langgraph's own AsyncSqliteSaver.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+import metrics
+
+BASE_EVERY = int(os.environ.get("COPILOT_CHECKPOINT_BASE_EVERY", "16"))
+COMPACT_EVERY = int(os.environ.get("COPILOT_CHECKPOINT_COMPACT_EVERY", "50"))
+KEEP_CHECKPOINTS = int(os.environ.get("COPILOT_CHECKPOINT_KEEP", "20"))
+DELTA_CHANNELS = ("messages",)
+
+checkpoint_write_bytes = metrics.Histogram(
+    "copilot_checkpoint_write_bytes",
+    "Bytes written to the checkpoint store per checkpoint.",
+    ("workflow",),
+    buckets=(1e2, 1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6),
+)
+checkpoint_compactions = metrics.Counter(
+    "copilot_checkpoint_compactions_total",
+    "Checkpoints and blobs removed by compaction.",
+    ("kind",),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compact_checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    channel_refs TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS compact_blobs (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS compact_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+def _hash(type_: str, data: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(type_.encode())
+    digest.update(b"\0")
+    digest.update(data or b"")
+    return digest.hexdigest()
+
+
+class CompactingSqliteSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpoint saver storing message deltas and hash-deduplicated channel blobs in one SQLite file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        base_every: int = BASE_EVERY,
+        compact_every: int = COMPACT_EVERY,
+        keep: int = KEEP_CHECKPOINTS,
+        busy_timeout_ms: int = 5000,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.base_every = max(base_every, 1)
+        self.compact_every = compact_every
+        self.keep = max(keep, 1)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # (thread_id, ns) -> (checkpoint_id, refs, messages, message hashes) of the last write/read.
+        self._last: Dict[Tuple[str, str], Tuple[str, Dict[str, Any], List[Any], List[str]]] = {}
+        self._puts_since_compaction: Dict[str, int] = defaultdict(int)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    # -- serialization -------------------------------------------------
+
+    def _store_blob(self, value: Any, written: List[int]) -> str:
+        type_, data = self.serde.dumps_typed(value)
+        digest = _hash(type_, data)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO compact_blobs (hash, type, data) VALUES (?, ?, ?)", (digest, type_, data)
+        )
+        if cursor.rowcount:
+            written[0] += len(data or b"")
+        return digest
+
+    def _load_blobs(self, hashes: Sequence[str]) -> Dict[str, Any]:
+        loaded: Dict[str, Any] = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, type, data FROM compact_blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for digest, type_, data in rows:
+                loaded[digest] = self.serde.loads_typed((type_, data))
+        return loaded
+
+    def _refs_of(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT channel_refs FROM compact_checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _message_hashes(self, thread_id: str, checkpoint_ns: str, ref: Dict[str, Any]) -> List[str]:
+        """
+        Resolve a delta-encoded message list to the full list of message hashes.
+        """
+        chain = [ref]
+        while chain[-1].get("parent"):
+            parent_refs = self._refs_of(thread_id, checkpoint_ns, chain[-1]["parent"]) or {}
+            parent = parent_refs.get(chain[-1]["channel"]) if "channel" in chain[-1] else None
+            if parent is None:
+                raise ValueError(f"Checkpoint {chain[-1]['parent']} missing from message delta chain")
+            chain.append(parent)
+        hashes: List[str] = []
+        for link in reversed(chain):
+            hashes = hashes[: link["keep"]] + link["append"]
+        return hashes
+
+    def _channel_values(self, thread_id: str, checkpoint_ns: str, refs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        hashes_by_channel = {
+            channel: self._message_hashes(thread_id, checkpoint_ns, ref)
+            for channel, ref in refs.items()
+            if "append" in ref
+        }
+        needed = [ref["blob"] for ref in refs.values() if "blob" in ref]
+        for hashes in hashes_by_channel.values():
+            needed.extend(hashes)
+        blobs = self._load_blobs(needed)
+        values: Dict[str, Any] = {}
+        for channel, ref in refs.items():
+            if "blob" in ref:
+                values[channel] = blobs[ref["blob"]]
+            else:
+                values[channel] = [blobs[digest] for digest in hashes_by_channel[channel]]
+        return values, hashes_by_channel
+
+    def _delta_ref(
+        self,
+        channel: str,
+        messages: List[Any],
+        parent: Optional[Tuple[str, Dict[str, Any], List[Any], List[str]]],
+        written: List[int],
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        parent_id, parent_refs, parent_messages, parent_hashes = parent or (None, {}, [], [])
+        parent_ref = parent_refs.get(channel) or {}
+        keep = 0
+        if parent_messages:
+            # Cheap prefix check on the objects we last saw for this thread (channel
+            # values are never mutated in place, so an identical object is unchanged).
+            for old, new in zip(parent_messages, messages):
+                if old is not new and old != new:
+                    break
+                keep += 1
+            hashes = parent_hashes[:keep] + [self._store_blob(message, written) for message in messages[keep:]]
+        else:
+            hashes = [self._store_blob(message, written) for message in messages]
+            for old, new in zip(parent_hashes, hashes):
+                if old != new:
+                    break
+                keep += 1
+        depth = parent_ref.get("depth", 0) + 1
+        if parent_id is None or "append" not in parent_ref or depth >= self.base_every:
+            return {"channel": channel, "parent": None, "keep": 0, "append": hashes, "depth": 0}, hashes
+        return {"channel": channel, "parent": parent_id, "keep": keep, "append": hashes[keep:], "depth": depth}, hashes
+
+    # -- BaseCheckpointSaver -------------------------------------------
+
+    def _tuple(self, row: Tuple[Any, ...], remember: bool = False) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint_b, metadata_b, refs_json = row
+        refs = json.loads(refs_json)
+        checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        values, hashes_by_channel = self._channel_values(thread_id, checkpoint_ns, refs)
+        if remember:
+            for channel, hashes in hashes_by_channel.items():
+                self._last[(thread_id, checkpoint_ns)] = (checkpoint_id, refs, values[channel], hashes)
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM compact_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=json.loads(metadata_b) if metadata_b else {},
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata, channel_refs"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM compact_checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM compact_checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._tuple(row, remember=True) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata, "
+                f"channel_refs FROM compact_checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = json.loads(row[6]) if row[6] else {}
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            with self._lock:
+                yield self._tuple(row)
+            if limit is not None:
+                limit -= 1
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        stored = checkpoint.copy()
+        values: Dict[str, Any] = stored.pop("channel_values")  # type: ignore[misc]
+        written = [0]
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                parent = self._last.get((thread_id, checkpoint_ns))
+                if parent is None or parent[0] != parent_id:
+                    parent_refs = self._refs_of(thread_id, checkpoint_ns, parent_id) if parent_id else None
+                    parent = None
+                    if parent_refs is not None:
+                        delta = next((ref for ref in parent_refs.values() if "append" in ref), None)
+                        hashes = self._message_hashes(thread_id, checkpoint_ns, delta) if delta else []
+                        parent = (parent_id, parent_refs, [], hashes)
+                parent_refs = parent[1] if parent else {}
+                refs: Dict[str, Any] = {}
+                remembered: Optional[Tuple[List[Any], List[str]]] = None
+                for channel, value in values.items():
+                    if channel in DELTA_CHANNELS and isinstance(value, list):
+                        if channel not in new_versions and "append" in parent_refs.get(channel, {}):
+                            refs[channel] = parent_refs[channel]
+                            remembered = (parent[2], parent[3]) if parent else None
+                            continue
+                        refs[channel], hashes = self._delta_ref(channel, value, parent, written)
+                        remembered = (value, hashes)
+                    elif channel not in new_versions and "blob" in parent_refs.get(channel, {}):
+                        refs[channel] = parent_refs[channel]
+                    else:
+                        refs[channel] = {"blob": self._store_blob(value, written)}
+                type_, checkpoint_b = self.serde.dumps_typed(stored)
+                metadata_b = json.dumps(get_checkpoint_metadata(config, metadata), default=str).encode()
+                refs_json = json.dumps(refs, separators=(",", ":"))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO compact_checkpoints "
+                    "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata, channel_refs) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, checkpoint_b, metadata_b, refs_json),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            written[0] += len(checkpoint_b) + len(metadata_b) + len(refs_json)
+            if remembered is not None:
+                self._last[(thread_id, checkpoint_ns)] = (checkpoint["id"], refs, list(remembered[0]), remembered[1])
+            self._puts_since_compaction[thread_id] += 1
+            due = self.compact_every > 0 and self._puts_since_compaction[thread_id] >= self.compact_every
+        checkpoint_write_bytes.observe(written[0], workflow=values.get("workflow") or "none")
+        if due:
+            self.compact_thread(thread_id)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path))
+        # Special writes (errors, interrupts) overwrite; regular ones are written once.
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock:
+            self.conn.executemany(
+                f"{verb} INTO compact_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("DELETE FROM compact_checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM compact_writes WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("COMMIT")
+            for key in [key for key in self._last if key[0] == thread_id]:
+                del self._last[key]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{time.time_ns() % 10**16:016}"
+
+    # -- compaction ------------------------------------------------------
+
+    def compact_thread(self, thread_id: str, keep: Optional[int] = None) -> int:
+        """
+        Keep the newest `keep` checkpoints per namespace of `thread_id`; return how many were removed.
+        """
+        keep = keep or self.keep
+        removed = 0
+        with self._lock:
+            self._puts_since_compaction[thread_id] = 0
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                namespaces = [row[0] for row in self.conn.execute(
+                    "SELECT DISTINCT checkpoint_ns FROM compact_checkpoints WHERE thread_id = ?", (thread_id,)
+                )]
+                for checkpoint_ns in namespaces:
+                    rows = self.conn.execute(
+                        "SELECT checkpoint_id, channel_refs FROM compact_checkpoints "
+                        "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+                        (thread_id, checkpoint_ns),
+                    ).fetchall()
+                    if len(rows) <= keep:
+                        continue
+                    kept = {checkpoint_id for checkpoint_id, _ in rows[:keep]}
+                    # Re-base kept checkpoints whose message delta points at a checkpoint about to go.
+                    for checkpoint_id, refs_json in reversed(rows[:keep]):
+                        refs = json.loads(refs_json)
+                        changed = False
+                        for channel, ref in refs.items():
+                            if "append" in ref and ref.get("parent") and ref["parent"] not in kept:
+                                hashes = self._message_hashes(thread_id, checkpoint_ns, ref)
+                                refs[channel] = {"channel": channel, "parent": None, "keep": 0, "append": hashes, "depth": 0}
+                                changed = True
+                        if changed:
+                            self.conn.execute(
+                                "UPDATE compact_checkpoints SET channel_refs = ? "
+                                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                                (json.dumps(refs, separators=(",", ":")), thread_id, checkpoint_ns, checkpoint_id),
+                            )
+                    doomed = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _ in rows[keep:]]
+                    self.conn.executemany(
+                        "DELETE FROM compact_checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", doomed
+                    )
+                    self.conn.executemany(
+                        "DELETE FROM compact_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", doomed
+                    )
+                    removed += len(doomed)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            # Cached refs may point at a re-based checkpoint; re-read them on the next write.
+            for key in [key for key in self._last if key[0] == thread_id]:
+                del self._last[key]
+        if removed:
+            checkpoint_compactions.inc(removed, kind="checkpoint")
+        return removed
+
+    def collect_garbage(self) -> int:
+        """
+        Delete blobs that no remaining checkpoint references; return how many were removed.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                referenced = set()
+                for (refs_json,) in self.conn.execute("SELECT channel_refs FROM compact_checkpoints"):
+                    for ref in json.loads(refs_json).values():
+                        if "blob" in ref:
+                            referenced.add(ref["blob"])
+                        else:
+                            referenced.update(ref["append"])
+                stale = [(digest,) for (digest,) in self.conn.execute("SELECT hash FROM compact_blobs") if digest not in referenced]
+                self.conn.executemany("DELETE FROM compact_blobs WHERE hash = ?", stale)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if stale:
+            checkpoint_compactions.inc(len(stale), kind="blob")
+        return len(stale)
+
+    def compact(self, keep: Optional[int] = None) -> Dict[str, int]:
+        """
+        Compact every thread, then drop unreferenced blobs.
+        """
+        with self._lock:
+            threads = [row[0] for row in self.conn.execute("SELECT DISTINCT thread_id FROM compact_checkpoints")]
+        checkpoints = sum(self.compact_thread(thread_id, keep) for thread_id in threads)
+        return {"threads": len(threads), "checkpoints": checkpoints, "blobs": self.collect_garbage()}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {
+                table: self.conn.execute(f"SELECT COUNT(*) FROM compact_{table}").fetchone()[0]
+                for table in ("checkpoints", "blobs", "writes")
+            }
+            counts["blob_bytes"] = self.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM compact_blobs").fetchone()[0]
+        return counts
+
+    # -- async API (sqlite3 calls run in a worker thread) ----------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
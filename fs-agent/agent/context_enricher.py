@@ -0,0 +1,153 @@
+"""
+Entity fact sheet for the chat_node system prompt.
+
+Factual questions ("how many hours are on this?", "which version are we on?")
+used to cost a tool call and a second model round-trip. chat_node now adds a
+compact fact sheet about the current entity to the system prompt:
+
+- estimates: total hours and cost, hours by role, WBS row count, payment terms and timeline;
+- contracts: agreement type and counterparty, current version, note count and open review proposals.
+
+The sheet is capped at `COPILOT_FACT_SHEET_TOKENS` (default 300, estimated at
+four characters per token). Lines are listed in priority order, and whatever
+does not fit is dropped. Sheets are cached per entity and validated against the
+same version stamp the response cache uses. Within one turn, a sheet is reused
+until the agent writes to one of the entity's tables.
+`COPILOT_FACT_SHEET=0` disables the enricher.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from metrics import cache_lookups
+
+FACT_SHEET_ENABLED = os.environ.get("COPILOT_FACT_SHEET", "1") != "0"
+FACT_SHEET_TOKEN_BUDGET = int(os.environ.get("COPILOT_FACT_SHEET_TOKENS", "300"))
+FACT_SHEET_MAX_ENTRIES = 1024
+FACT_SHEET_HEADER = (
+    "Known facts about this entity (current as of this turn). Answer factual questions from them "
+    "directly; call tools for anything not listed or to make changes:"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _number(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def estimate_facts(quote_summary: Dict[str, Any]) -> List[str]:
+    """
+    Fact lines for an estimate, most important first, from a `compute_quote_summary` result.
+    """
+    lines = quote_summary.get("lines") or []
+    if not lines:
+        return ["WBS: no rows yet"]
+    currency = quote_summary.get("currency") or "USD"
+    hours_by_role: Dict[str, float] = {}
+    for line in lines:
+        role = line.get("role") or "Unassigned"
+        hours_by_role[role] = hours_by_role.get(role, 0.0) + float(line.get("hours") or 0)
+    roles = sorted(hours_by_role.items(), key=lambda item: item[1], reverse=True)
+    facts = [
+        f"Total: {_number(quote_summary.get('total_hours') or 0)} hours, "
+        f"{currency} {_number(quote_summary.get('total_cost') or 0)}",
+        "Hours by role: " + ", ".join(f"{role} {_number(hours)}h" for role, hours in roles),
+        f"WBS rows: {len(lines)}",
+    ]
+    if quote_summary.get("payment_terms"):
+        facts.append(f"Payment terms: {quote_summary['payment_terms']}")
+    if quote_summary.get("delivery_timeline"):
+        facts.append(f"Delivery timeline: {quote_summary['delivery_timeline']}")
+    return facts
+
+
+def contract_facts(agreement: Dict[str, Any], note_count: Optional[int], open_proposals: Optional[int]) -> List[str]:
+    """
+    Fact lines for an agreement, most important first.
+    """
+    facts = [
+        f"Agreement: {agreement.get('type') or 'Unknown'} with {agreement.get('counterparty') or 'Unknown'}",
+        f"Current version: {agreement.get('current_version') or 1}",
+    ]
+    if note_count is not None:
+        facts.append(f"Notes: {note_count}")
+    if open_proposals is not None:
+        facts.append(f"Open review proposals: {open_proposals}")
+    if agreement.get("linked_estimate_id"):
+        facts.append(f"Linked estimate: {agreement['linked_estimate_id']}")
+    return facts
+
+
+def render_fact_sheet(facts: List[str], budget: int = FACT_SHEET_TOKEN_BUDGET) -> str:
+    """
+    Header plus as many fact lines as fit in `budget` tokens; "" if not even one fits.
+    """
+    text = FACT_SHEET_HEADER
+    rendered = 0
+    for fact in facts:
+        candidate = f"{text}\n- {fact}"
+        if estimate_tokens(candidate) > budget:
+            break
+        text = candidate
+        rendered += 1
+    return text if rendered else ""
+
+
+class FactSheetCache:
+    def __init__(self, max_entries: int = FACT_SHEET_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (workflow, entity_id) -> (stamp, trace_id, write generation, sheet)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[str], Optional[str], Hashable, str]]" = OrderedDict()
+
+    def reuse(self, workflow: str, entity_id: str, trace_id: Optional[str], generation: Hashable) -> Optional[str]:
+        """
+        Sheet built earlier in the same turn, if the agent has not written to the entity since.
+        """
+        with self._lock:
+            entry = self._entries.get((workflow, entity_id))
+        if entry and trace_id and entry[1] == trace_id and entry[2] == generation:
+            cache_lookups.inc(cache="fact_sheet", result="hit")
+            return entry[3]
+        return None
+
+    def built_in_turn(self, workflow: str, entity_id: str, trace_id: Optional[str]) -> bool:
+        with self._lock:
+            entry = self._entries.get((workflow, entity_id))
+        return bool(entry and trace_id and entry[1] == trace_id)
+
+    def get(self, workflow: str, entity_id: str, stamp: Optional[str]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((workflow, entity_id))
+        if stamp and entry and entry[0] == stamp:
+            cache_lookups.inc(cache="fact_sheet", result="hit")
+            return entry[3]
+        cache_lookups.inc(cache="fact_sheet", result="miss")
+        return None
+
+    def put(
+        self,
+        workflow: str,
+        entity_id: str,
+        stamp: Optional[str],
+        trace_id: Optional[str],
+        generation: Hashable,
+        sheet: str,
+    ) -> None:
+        with self._lock:
+            self._entries[(workflow, entity_id)] = (stamp, trace_id, generation, sheet)
+            self._entries.move_to_end((workflow, entity_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+fact_sheets = FactSheetCache()
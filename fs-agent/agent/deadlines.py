@@ -0,0 +1,126 @@
+"""
+Per-turn deadline and step budget.
+
+Every turn gets a deadline when it starts, `COPILOT_TURN_TIMEOUT` seconds
+away (default 60). A run can ask for a different budget with
+`configurable.deadline_seconds`; through serve.py, that is the
+`x-copilot-deadline-seconds` header. Since the header comes from the client,
+a value that is not a positive number is ignored and a larger one is capped
+at `COPILOT_MAX_TURN_TIMEOUT` seconds (default 300). The deadline is kept in
+the graph state, and each traced node (intent_router, chat_node, tool_node) puts it in a
+contextvar. This way the code a node calls can see it without passing it
+around, including tools and prefetches that run in worker threads:
+
+- `supabase_request` caps every HTTP timeout at the time remaining and fails
+  fast with DeadlineExceeded once the deadline has passed;
+- chat_node limits the model call to the time remaining, and stops after
+  `COPILOT_MAX_MODEL_CALLS` model calls in one turn (default 8).
+
+When a turn runs out of time or steps, chat_node answers with what the
+turn's tools have already done instead of looping on.
+"""
+
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+TURN_TIMEOUT_SECONDS = float(os.environ.get("COPILOT_TURN_TIMEOUT", "60"))
+MAX_TURN_TIMEOUT_SECONDS = float(os.environ.get("COPILOT_MAX_TURN_TIMEOUT", "300"))
+MAX_MODEL_CALLS = int(os.environ.get("COPILOT_MAX_MODEL_CALLS", "8"))
+# Below this, a model call is not worth starting.
+MIN_MODEL_SECONDS = 1.0
+
+_deadline: ContextVar[Optional[float]] = ContextVar("copilot_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def turn_deadline(config: Optional[Dict[str, Any]] = None) -> float:
+    """
+    Wall-clock deadline (epoch seconds) for a turn starting now. Wall-clock, not
+    monotonic, because it is stored in the checkpoint and may be read by another worker.
+    """
+    configurable = (config or {}).get("configurable") or {}
+    requested = configurable.get("deadline_seconds") or configurable.get("x-copilot-deadline-seconds")
+    seconds = TURN_TIMEOUT_SECONDS
+    if requested:
+        try:
+            value = float(requested)
+        except (TypeError, ValueError):
+            value = math.nan
+        if math.isfinite(value) and value > 0:
+            seconds = min(value, MAX_TURN_TIMEOUT_SECONDS)
+        else:
+            print(f"[Copilot][deadline] Ignoring deadline_seconds={requested!r}; using {TURN_TIMEOUT_SECONDS:g}s")
+    return time.time() + seconds
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline, or None outside a turn.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def timeout(default: float) -> float:
+    """
+    `default`, capped at the time remaining. Raises DeadlineExceeded if none is left.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("The request deadline has passed.")
+    return min(default, left)
+
+
+def turn_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """
+    Messages after the latest user message.
+    """
+    for idx in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[idx], HumanMessage):
+            return list(messages[idx + 1:])
+    return list(messages)
+
+
+def model_calls_this_turn(messages: Sequence[BaseMessage]) -> int:
+    return sum(1 for message in turn_messages(messages) if isinstance(message, AIMessage))
+
+
+def partial_answer(messages: Sequence[BaseMessage], reason: str) -> AIMessage:
+    """
+    Closing reply for a turn stopped by its deadline ("deadline") or step budget ("steps").
+    """
+    done = [
+        message.name
+        for message in turn_messages(messages)
+        if isinstance(message, ToolMessage) and message.status != "error" and message.name
+    ]
+    if reason == "deadline":
+        text = "I ran out of time before I could finish this request."
+    else:
+        text = "I stopped because this request was taking too many steps."
+    if done:
+        text += f" Completed so far: {', '.join(dict.fromkeys(done))}."
+    else:
+        text += " No steps were completed."
+    text += " Ask me to continue if you need the rest."
+    return AIMessage(content=text)
@@ -0,0 +1,458 @@
+"""
+In-memory stand-in for the Supabase PostgREST API.
+
+Serves the subset of PostgREST that the agent uses (eq/neq/gt/gte/lt/lte/in/is
+filters, select, order, limit/offset, `Prefer: count=exact`,
+`return=representation`, the unique constraints in UNIQUE_KEYS and the RPC
+functions in `rpc()`), plus storage uploads and signed URLs, over real HTTP on localhost, so load tests and offline
+benchmarks exercise the same `requests` code paths as production without a
+database. Not meant for anything but local testing.
+"""
+
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    operator, _, value = expression.partition(".")
+    current = row.get(column)
+    if operator == "is":
+        return current is None if value == "null" else str(current).lower() == value
+    if operator == "in":
+        return str(current) in value.strip("()").split(",")
+    if current is None:
+        return False
+    if operator == "eq":
+        return str(current) == value
+    if operator == "neq":
+        return str(current) != value
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        try:
+            current, value = float(current), float(value)
+        except ValueError:
+            current = str(current)
+    else:
+        current = str(current)
+    if operator == "gt":
+        return current > value
+    if operator == "gte":
+        return current >= value
+    if operator == "lt":
+        return current < value
+    if operator == "lte":
+        return current <= value
+    raise ValueError(f"Unsupported filter operator {operator!r}")
+
+
+def _sort_key(column: str):
+    def key(row):
+        value = row.get(column)
+        if value is None:
+            return (True, 0)
+        return (False, int(value) if isinstance(value, bool) else value)
+    return key
+
+
+class ConflictError(ValueError):
+    code = "23505"
+
+
+class StaleVersionError(ConflictError):
+    # Raised by a function with `RAISE ... USING ERRCODE = 'PT409'`.
+    code = "PT409"
+
+
+class FakeSupabaseStore:
+    """
+    Thread-safe table store with PostgREST-style query semantics.
+    """
+
+    CONTROL_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+    # Mirrors the unique constraints in ../migrations.
+    UNIQUE_KEYS = {"contract_versions": ("agreement_id", "version_number")}
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        # "bucket/path" -> (content type, bytes)
+        self.objects: Dict[str, tuple] = {}
+        self.lock = threading.Lock()
+
+    def _filtered(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        rows = self.tables.get(table, [])
+        for column, expression in params:
+            if column in self.CONTROL_PARAMS:
+                continue
+            rows = [row for row in rows if _matches(row, column, expression)]
+        return rows
+
+    def select(self, table: str, params: List[tuple]):
+        query = dict(params)
+        with self.lock:
+            rows = [dict(row) for row in self._filtered(table, params)]
+        for clause in reversed((query.get("order") or "").split(",")):
+            if not clause:
+                continue
+            parts = clause.split(".")
+            descending = "desc" in parts[1:]
+            rows.sort(key=_sort_key(parts[0]), reverse=descending)
+            if "nullslast" in parts[1:] and descending:
+                rows.sort(key=lambda row, column=parts[0]: row.get(column) is None)
+        total = len(rows)
+        offset = int(query.get("offset") or 0)
+        limit = query.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        columns = [column.strip() for column in (query.get("select") or "*").split(",")]
+        if "*" not in columns:
+            rows = [{column: row.get(column) for column in columns if "(" not in column} for row in rows]
+        return rows, offset, total
+
+    def insert(self, table: str, payload) -> List[Dict[str, Any]]:
+        records = payload if isinstance(payload, list) else [payload]
+        with self.lock:
+            return self._insert(table, records)
+
+    def _insert(self, table: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = [{"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **record} for record in records]
+        unique = self.UNIQUE_KEYS.get(table)
+        if unique:
+            seen = {tuple(row.get(column) for column in unique) for row in self.tables.get(table, [])}
+            for row in rows:
+                key = tuple(row.get(column) for column in unique)
+                if key in seen:
+                    raise ConflictError(f"duplicate key value violates unique constraint on {table} {unique}")
+                seen.add(key)
+        self.tables.setdefault(table, []).extend(rows)
+        return [dict(row) for row in rows]
+
+    def rpc(self, name: str, args: Dict[str, Any]):
+        """
+        The database functions defined in ../migrations, each run atomically under the store lock.
+        """
+        if name != "create_contract_version":
+            raise KeyError(name)
+        agreement_id = args.get("p_agreement_id")
+        with self.lock:
+            agreements = self._filtered("contract_agreements", [("id", f"eq.{agreement_id}")])
+            if not agreements:
+                raise ValueError(f"Agreement {agreement_id} not found")
+            locked_version = agreements[0].get("current_version") or 0
+            expected = args.get("p_expected_version")
+            if expected is not None and locked_version != expected:
+                raise StaleVersionError(f"Agreement {agreement_id} is at version {locked_version}, not {expected}")
+            versions = self._filtered("contract_versions", [("agreement_id", f"eq.{agreement_id}")])
+            next_version = max((row.get("version_number") or 0 for row in versions), default=0) + 1
+            (created,) = self._insert(
+                "contract_versions",
+                [{
+                    "agreement_id": agreement_id,
+                    "version_number": next_version,
+                    "content": args.get("p_content"),
+                    "notes": args.get("p_notes"),
+                    "created_by": args.get("p_created_by"),
+                }],
+            )
+            agreements[0].update(content=args.get("p_content"), current_version=next_version, updated_at=_now())
+        return created
+
+    def update(self, table: str, params: List[tuple], changes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self._filtered(table, params)
+            for row in rows:
+                row.update(changes)
+                if "updated_at" not in changes:
+                    row["updated_at"] = _now()
+            return [dict(row) for row in rows]
+
+    def delete(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        with self.lock:
+            doomed = self._filtered(table, params)
+            doomed_ids = {id(row) for row in doomed}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in doomed_ids]
+            return [dict(row) for row in doomed]
+
+
+def seed_fixtures(store: FakeSupabaseStore, estimates: int = 10, agreements: int = 10, wbs_rows: int = 12, notes: int = 8):
+    """
+    Populate realistic estimates (WBS, quote, rates) and agreements (notes, drafts).
+    Returns the generated ids as {"estimates": [...], "agreements": [...]}.
+    """
+    roles = ["Engagement Lead", "Solutions Architect", "Backend Engineer", "QA Lead", "Business Analyst"]
+    base = datetime(2025, 1, 1)
+    ids = {"estimates": [], "agreements": []}
+    with store.lock:
+        tables = store.tables
+        for idx in range(estimates):
+            estimate_id = f"est-{idx:04d}"
+            ids["estimates"].append(estimate_id)
+            stamp = (base + timedelta(minutes=idx)).isoformat() + "Z"
+            tables.setdefault("estimates", []).append(
+                {"id": estimate_id, "name": f"Project {idx}", "owner": f"Client {idx}", "stage": "Quote", "updated_at": stamp}
+            )
+            for row_idx in range(wbs_rows):
+                tables.setdefault("estimate_wbs_rows", []).append(
+                    {
+                        "id": f"{estimate_id}-wbs-{row_idx:03d}",
+                        "estimate_id": estimate_id,
+                        "task_code": f"TASK-{row_idx:03d}",
+                        "description": f"Deliver work package {row_idx}",
+                        "role": roles[row_idx % len(roles)],
+                        "hours": 4 + (row_idx * 3) % 40,
+                        "assumptions": "Scope as per requirements.",
+                        "sort_order": row_idx,
+                        "updated_at": stamp,
+                    }
+                )
+            tables.setdefault("estimate_quote", []).append(
+                {
+                    "id": f"{estimate_id}-quote",
+                    "estimate_id": estimate_id,
+                    "currency": "USD",
+                    "payment_terms": "Net 30",
+                    "delivery_timeline": "Delivery within 8 weeks",
+                    "delivered": False,
+                    "updated_at": stamp,
+                }
+            )
+            for role_idx, role in enumerate(roles):
+                tables.setdefault("estimate_quote_rates", []).append(
+                    {"id": f"{estimate_id}-rate-{role_idx}", "estimate_id": estimate_id, "role": role, "rate": 120 + role_idx * 15, "updated_at": stamp}
+                )
+            tables.setdefault("estimate_requirements", []).append(
+                {"id": f"{estimate_id}-req", "estimate_id": estimate_id, "content": "<p>Self-service analytics</p><p>SSO login</p>"}
+            )
+            tables.setdefault("estimate_business_case", []).append(
+                {"id": f"{estimate_id}-bc", "estimate_id": estimate_id, "content": "<p>Drive adoption.</p>"}
+            )
+        for idx in range(agreements):
+            agreement_id = f"agr-{idx:04d}"
+            ids["agreements"].append(agreement_id)
+            stamp = (base + timedelta(minutes=idx)).isoformat() + "Z"
+            content = "Payment terms: Net 60. Client may terminate with 30 days notice. " * 20
+            tables.setdefault("contract_agreements", []).append(
+                {
+                    "id": agreement_id,
+                    "type": "SOW" if idx % 2 else "MSA",
+                    "counterparty": f"Client {idx}",
+                    "content": content,
+                    "current_version": 1,
+                    "linked_estimate_id": None,
+                    "updated_at": stamp,
+                }
+            )
+            tables.setdefault("contract_versions", []).append(
+                {"id": f"{agreement_id}-v1", "agreement_id": agreement_id, "version_number": 1, "content": content, "created_at": stamp}
+            )
+            tables.setdefault("contract_review_drafts", []).append(
+                {"id": f"{agreement_id}-draft", "agreement_id": agreement_id, "content": content, "created_at": stamp}
+            )
+            for note_idx in range(notes):
+                tables.setdefault("contract_notes", []).append(
+                    {
+                        "id": f"{agreement_id}-note-{note_idx:03d}",
+                        "agreement_id": agreement_id,
+                        "note_text": f"Client pushed back on clause {note_idx}.",
+                        "created_by": "Reviewer",
+                        "created_at": (base + timedelta(minutes=idx, seconds=note_idx)).isoformat() + "Z",
+                    }
+                )
+    return ids
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format, *args):  # noqa: A002 - silence per-request logging
+        return
+
+    def _send(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None):
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.fake.record(self.command, self.path, status)
+
+    def _send_bytes(self, status: int, payload: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.fake.record(self.command, self.path, status)
+
+    def _raw_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _handle_storage(self, key: str):
+        """
+        Storage API subset: upload to `object/<bucket>/<path>`, `object/sign/<bucket>/<path>`
+        to get a signed URL, and GET of that URL.
+        """
+        store = self.server.fake.store
+        signed = key.startswith("sign/")
+        if signed:
+            key = key[len("sign/"):]
+        if self.command == "POST" and signed:
+            with store.lock:
+                exists = key in store.objects
+            if not exists:
+                return self._send(404, {"message": "Object not found"})
+            return self._send(200, {"signedURL": f"/object/sign/{key}?token=fake-token"})
+        if self.command in ("POST", "PUT") and not signed:
+            with store.lock:
+                store.objects[key] = (self.headers.get("Content-Type") or "application/octet-stream", self._raw_body())
+            return self._send(200, {"Key": key})
+        if self.command == "GET":
+            with store.lock:
+                found = store.objects.get(key)
+            if found is None:
+                return self._send(404, {"message": "Object not found"})
+            return self._send_bytes(200, found[1], found[0])
+        return self._send(405, {"message": "Method not allowed"})
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        prefix = "/rest/v1/"
+        if not parsed.path.startswith(prefix):
+            return None, []
+        return parsed.path[len(prefix):], parse_qsl(parsed.query, keep_blank_values=True)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null") if length else None
+
+    def _handle(self):
+        fake = self.server.fake
+        if fake.latency_ms:
+            time.sleep(fake.latency_ms / 1000)
+        storage_prefix = "/storage/v1/object/"
+        if self.path.startswith(storage_prefix):
+            return self._handle_storage(urlparse(self.path).path[len(storage_prefix):])
+        table, params = self._route()
+        if table is None:
+            return self._send(404, {"message": "Not found"})
+        if fake.fail_tables.get(table):
+            return self._send(fake.fail_tables[table], {"message": "Injected failure"})
+        if fake.take_transient_failure(table):
+            return self._send(503, {"message": "Injected transient failure"})
+        prefer = self.headers.get("Prefer") or ""
+        store = fake.store
+        try:
+            if table.startswith("rpc/"):
+                if self.command != "POST":
+                    return self._send(405, {"message": "Method not allowed"})
+                try:
+                    return self._send(200, store.rpc(table[len("rpc/"):], self._body() or {}))
+                except KeyError:
+                    return self._send(404, {"code": "PGRST202", "message": f"Function {table} not found"})
+            if self.command in ("GET", "HEAD"):
+                rows, offset, total = store.select(table, params)
+                headers = {}
+                if "count=exact" in prefer:
+                    end = offset + len(rows) - 1
+                    headers["Content-Range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+                return self._send(200, rows if self.command == "GET" else None, headers)
+            if self.command == "POST":
+                rows = store.insert(table, self._body())
+                return self._send(201, rows if "return=representation" in prefer else None)
+            if self.command == "PATCH":
+                rows = store.update(table, params, self._body() or {})
+                return self._send(200 if "return=representation" in prefer else 204, rows if "return=representation" in prefer else None)
+            if self.command == "DELETE":
+                rows = store.delete(table, params)
+                return self._send(200 if "return=representation" in prefer else 204, rows if "return=representation" in prefer else None)
+        except ConflictError as exc:
+            return self._send(409, {"code": exc.code, "message": str(exc)})
+        except ValueError as exc:
+            return self._send(400, {"message": str(exc)})
+        return self._send(405, {"message": "Method not allowed"})
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeSupabase"
+
+
+class FakeSupabase:
+    """
+    Local PostgREST stand-in. Use as a context manager or call start()/stop():
+
+        with FakeSupabase(latency_ms=5) as fake:
+            seed_fixtures(fake.store)
+            agent_module.SUPABASE_URL = fake.url
+    """
+
+    service_role_key = "fake-service-role-key"
+
+    def __init__(self, latency_ms: float = 0.0, store: Optional[FakeSupabaseStore] = None):
+        self.latency_ms = latency_ms
+        self.store = store or FakeSupabaseStore()
+        self.fail_tables: Dict[str, int] = {}
+        # table -> number of upcoming requests answered with 503
+        self.transient_failures: Dict[str, int] = {}
+        self.requests: Dict[tuple, int] = {}
+        self._requests_lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "FakeSupabase is not running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, method: str, path: str, status: int):
+        table = urlparse(path).path.rsplit("/", 1)[-1]
+        with self._requests_lock:
+            key = (method, table, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def take_transient_failure(self, table: str) -> bool:
+        with self._requests_lock:
+            if self.transient_failures.get(table, 0) <= 0:
+                return False
+            self.transient_failures[table] -= 1
+            return True
+
+    def start(self) -> "FakeSupabase":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-supabase", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeSupabase":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,207 @@
+"""
+Deterministic intent fast-path for the copilot graph.
+
+Common read-only commands such as "what's the project total" or "summarize
+pushbacks" map one-to-one onto a backend tool once the workflow and entity are
+known. Matching them here lets the graph call the tool directly and render the
+reply from a template, skipping both model round-trips. Anything the matcher is
+not confident about falls back to the LLM, and so does any command that writes
+(e.g. "generate the WBS" deletes and reinserts rows), so a loose match can never
+destroy data.
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+FAST_PATH_ENABLED = os.environ.get("COPILOT_FAST_PATH", "1") != "0"
+
+# Requests longer than this are almost always compound or nuanced, so leave them to the model.
+MAX_FAST_PATH_WORDS = 12
+
+_PREFIX = r"(?:(?:hey |hi )?copilot,? )?(?:please |can you |could you |would you )?(?:please )?"
+_SUFFIX = r"(?: please)?"
+_THIS_ESTIMATE = r"(?: (?:for|on|of) (?:this|the current) (?:estimate|project|quote))?"
+_THIS_AGREEMENT = r"(?: (?:for|on|of) (?:this|the current) (?:agreement|contract|msa|sow))?"
+
+
+def _pattern(body: str):
+    return re.compile(f"^{_PREFIX}{body}{_SUFFIX}$")
+
+
+def _render_project_total(result: Dict[str, Any]) -> str:
+    if not result.get("lines"):
+        return result.get("message") or "No WBS rows available. Approve a WBS first."
+    currency = result.get("currency") or "USD"
+    lines = [
+        f"The current quote total is **{currency} {result.get('total_cost', 0):,.2f}** "
+        f"across {result.get('total_hours', 0):g} hours ({len(result['lines'])} WBS rows)."
+    ]
+    if result.get("payment_terms"):
+        lines.append(f"Payment terms: {result['payment_terms']}.")
+    if result.get("delivery_timeline"):
+        lines.append(f"Delivery timeline: {result['delivery_timeline']}.")
+    return "\n".join(lines)
+
+
+def _render_pushbacks(result: Dict[str, Any]) -> str:
+    if result.get("error"):
+        return result["error"]
+    return result.get("summary") or "No notes found."
+
+
+def _render_text(result: Any) -> str:
+    return str(result)
+
+
+INTENTS: List[Dict[str, Any]] = [
+    {
+        "name": "project_total",
+        "workflow": "estimates",
+        "tool_name": "get_project_total",
+        "arg_name": "estimate_id",
+        "patterns": [
+            _pattern(r"(?:what(?:'s| is) )?(?:the )?(?:current )?(?:project|quote|estimate) total(?: cost)?" + _THIS_ESTIMATE),
+            _pattern(r"(?:get|show|calculate) (?:me )?(?:the )?(?:current )?(?:project|quote|estimate) total" + _THIS_ESTIMATE),
+            _pattern(r"how much (?:is|does) (?:this|the) (?:project|estimate|quote)(?: cost)?(?: in total)?"),
+        ],
+        "render": _render_project_total,
+    },
+    {
+        "name": "summarize_business_case",
+        "workflow": "estimates",
+        "tool_name": "summarize_business_case",
+        "arg_name": "estimate_id",
+        "patterns": [
+            _pattern(r"(?:summari[sz]e|draft) (?:the )?business case" + _THIS_ESTIMATE),
+        ],
+        "render": _render_text,
+    },
+    {
+        "name": "summarize_requirements",
+        "workflow": "estimates",
+        "tool_name": "summarize_requirements",
+        "arg_name": "estimate_id",
+        "patterns": [
+            _pattern(r"(?:summari[sz]e|draft) (?:the )?requirements" + _THIS_ESTIMATE),
+        ],
+        "render": _render_text,
+    },
+    {
+        "name": "summarize_pushbacks",
+        "workflow": "contracts",
+        "tool_name": "summarize_pushbacks",
+        "arg_name": "agreement_id",
+        "patterns": [
+            _pattern(r"(?:summari[sz]e|show|list) (?:the )?(?:pushbacks|push backs|policy conflicts)" + _THIS_AGREEMENT),
+        ],
+        "render": _render_pushbacks,
+    },
+]
+
+_INTENTS_BY_NAME = {intent["name"]: intent for intent in INTENTS}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {"hits": {}, "misses": 0, "ambiguous": 0, "skipped": 0}
+
+
+def _record(outcome: str, intent_name: Optional[str] = None):
+    with _stats_lock:
+        if outcome == "hit":
+            _stats["hits"][intent_name] = _stats["hits"].get(intent_name, 0) + 1
+        else:
+            _stats[outcome] += 1
+
+
+def normalize_request(text: str) -> str:
+    text = (text or "").lower().replace("’", "'")
+    text = re.sub(r"[^a-z0-9' ,]+", " ", text)
+    text = re.sub(r"\s+", " ", text).strip(" ,")
+    return text
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return content or ""
+
+
+def match_intent(
+    messages: List[BaseMessage],
+    workflow: Optional[str],
+    entity_id: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the tool call for a high-confidence intent, or None to fall back to the LLM.
+
+    Only the latest message is considered, and only when it is a fresh user turn
+    (not a frontend tool result) for a workflow with an entity in context.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage) or not entity_id:
+        _record("skipped")
+        return None
+
+    text = normalize_request(message_text(messages[-1]))
+    if not text or len(text.split()) > MAX_FAST_PATH_WORDS:
+        _record("misses")
+        return None
+
+    matches = [
+        intent
+        for intent in INTENTS
+        if intent["workflow"] == workflow
+        and any(pattern.match(text) for pattern in intent["patterns"])
+    ]
+    if not matches:
+        _record("misses")
+        return None
+    if len(matches) > 1:
+        _record("ambiguous")
+        return None
+
+    intent = matches[0]
+    _record("hit", intent["name"])
+    return {
+        "intent": intent["name"],
+        "tool_name": intent["tool_name"],
+        "args": {intent["arg_name"]: entity_id},
+    }
+
+
+def render_intent_reply(match: Dict[str, Any], result: Any) -> str:
+    return _INTENTS_BY_NAME[match["intent"]]["render"](result)
+
+
+def get_intent_stats() -> Dict[str, Any]:
+    """
+    Snapshot of fast-path outcomes since process start, for tuning the patterns.
+    """
+    with _stats_lock:
+        hits = dict(_stats["hits"])
+        misses = _stats["misses"]
+        ambiguous = _stats["ambiguous"]
+        skipped = _stats["skipped"]
+    total_hits = sum(hits.values())
+    considered = total_hits + misses + ambiguous
+    return {
+        "hits": hits,
+        "total_hits": total_hits,
+        "misses": misses,
+        "ambiguous": ambiguous,
+        "skipped": skipped,
+        "hit_rate": round(total_hits / considered, 4) if considered else 0.0,
+    }
+
+
+def reset_intent_stats():
+    with _stats_lock:
+        _stats["hits"] = {}
+        _stats["misses"] = 0
+        _stats["ambiguous"] = 0
+        _stats["skipped"] = 0
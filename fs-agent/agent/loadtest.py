@@ -0,0 +1,226 @@
+"""
+Concurrent-session load test for the copilot graph.
+
+Drives many concurrent threads through the compiled graph with scripted
+conversations across the estimates and contracts workflows. Everything runs
+locally: the scripted fake chat model stands in for OpenAI and an in-memory
+PostgREST (fake_supabase.py) stands in for Supabase, both with configurable
+latency.
+
+    python loadtest.py --sessions 50 --turns 4 --llm-latency-ms 400 --db-latency-ms 15
+    python loadtest.py --sweep 10,25,50,100 --slo-p99-ms 3000
+
+Reports throughput and p50/p95/p99 latency per turn, per graph node and per tool.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import agent as agent_module
+from fake_supabase import FakeSupabase, seed_fixtures
+from tracing import turn_guard
+
+CONVERSATIONS: Dict[str, List[str]] = {
+    "estimates": [
+        "What's the project total?",
+        "How much does this cost by role, roughly?",
+        "Generate the WBS",
+        "What is the total cost now with the new rows?",
+        "Summarize the requirements",
+        "Can you explain which roles drive the cost?",
+    ],
+    "contracts": [
+        "Summarize pushbacks",
+        "Add a note saying the client wants Net 45 payment terms",
+        "Load the SOW exemplars so we can compare clauses",
+        "Are there any policy conflicts left on this agreement?",
+        "What should we push back on next?",
+    ],
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile: the smallest value with at least `pct` percent of the values at or below it.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: List[str] = []
+
+    def add(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds * 1000)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(max(values), 2),
+            }
+            for name, values in sorted(self.samples.items())
+        }
+
+
+async def run_turn(graph, recorder: LatencyRecorder, mode: str, state: Dict[str, Any], config: Dict[str, Any]):
+    started = time.perf_counter()
+    with turn_guard():
+        if mode == "ainvoke":
+            await graph.ainvoke(state, config)
+        else:
+            last = started
+            # subgraphs=True also yields the chat_node/tool_node steps inside the workflow subgraphs.
+            async for _, chunk in graph.astream(state, config, stream_mode="updates", subgraphs=True):
+                now = time.perf_counter()
+                for node, update in chunk.items():
+                    recorder.add(f"node:{node}", now - last)
+                    if node == "tool_node" and update:
+                        for message in update.get("messages", []):
+                            recorder.add(f"tool:{getattr(message, 'name', None) or 'unknown'}", now - last)
+                last = now
+    recorder.add("turn", time.perf_counter() - started)
+
+
+async def run_session(graph, recorder: LatencyRecorder, args, workflow: str, entity_id: str, start_delay: float):
+    await asyncio.sleep(start_delay)
+    config = {
+        "configurable": {
+            "thread_id": str(uuid.uuid4()),
+            "model_backend": "fake",
+            "fake_latency_ms": args.llm_latency_ms,
+            "fake_tokens_per_second": args.llm_tokens_per_second,
+        },
+        "recursion_limit": 25,
+    }
+    script = CONVERSATIONS[workflow]
+    for turn in range(args.turns):
+        state = {
+            "messages": [HumanMessage(content=script[turn % len(script)])],
+            "workflow": workflow,
+            "entity_id": entity_id,
+            "entity_type": "project" if workflow == "estimates" else "agreement",
+        }
+        try:
+            await run_turn(graph, recorder, args.mode, state, config)
+        except Exception as exc:  # keep the run going; errors are part of the report
+            recorder.errors.append(f"{workflow}/{entity_id}: {exc!r}")
+        if args.think_ms:
+            await asyncio.sleep(args.think_ms / 1000)
+
+
+async def run_load(args, sessions: int, fake: FakeSupabase, ids: Dict[str, List[str]]) -> Dict[str, Any]:
+    graph = agent_module.workflow.compile(checkpointer=MemorySaver())
+    recorder = LatencyRecorder()
+    tasks = []
+    for idx in range(sessions):
+        workflow = "estimates" if idx % 2 == 0 else "contracts"
+        pool = ids["estimates" if workflow == "estimates" else "agreements"]
+        delay = (args.ramp_seconds * idx / sessions) if sessions else 0
+        tasks.append(run_session(graph, recorder, args, workflow, pool[idx % len(pool)], delay))
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    # Queued notes are part of the run's database load; send them before the fake goes away.
+    await asyncio.to_thread(agent_module.note_queue.flush)
+
+    turns = len(recorder.samples.get("turn", []))
+    return {
+        "sessions": sessions,
+        "turns": turns,
+        "errors": len(recorder.errors),
+        "error_samples": recorder.errors[:5],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "latency": recorder.summary(),
+        "supabase_requests": sum(fake.requests.values()),
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(
+        f"\n== {report['sessions']} sessions: {report['turns']} turns in {report['elapsed_s']}s "
+        f"({report['throughput_turns_per_s']} turns/s), errors: {report['errors']}, "
+        f"supabase requests: {report['supabase_requests']}"
+    )
+    print(f"{'':32} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, stats in report["latency"].items():
+        print(
+            f"{name:32} {stats['count']:>7} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+            f"{stats['p99_ms']:>10.1f} {stats['max_ms']:>10.1f}"
+        )
+    for sample in report["error_samples"]:
+        print(f"  error: {sample}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent copilot sessions (threads).")
+    parser.add_argument("--sweep", type=str, default="", help="Comma-separated session counts to run in sequence.")
+    parser.add_argument("--turns", type=int, default=4, help="User turns per session.")
+    parser.add_argument("--mode", choices=["astream", "ainvoke"], default="astream")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Fake model time to first token.")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0, help="Fake model output rate.")
+    parser.add_argument("--db-latency-ms", type=float, default=10.0, help="Added latency per Supabase request.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between turns within a session.")
+    parser.add_argument("--ramp-seconds", type=float, default=1.0, help="Spread session starts over this window.")
+    parser.add_argument("--estimates", type=int, default=20, help="Seeded estimates.")
+    parser.add_argument("--agreements", type=int, default=20, help="Seeded agreements.")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every turn through the model.")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache.")
+    parser.add_argument("--slo-p99-ms", type=float, default=0.0, help="Exit non-zero if turn p99 exceeds this.")
+    parser.add_argument("--json", type=str, default="", help="Write the full report(s) to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    levels = [int(level) for level in args.sweep.split(",") if level.strip()] or [args.sessions]
+    if args.no_fast_path:
+        agent_module.FAST_PATH_ENABLED = False
+    if args.no_cache:
+        agent_module.response_cache.ttl_seconds = 0
+
+    reports = []
+    with FakeSupabase(latency_ms=args.db_latency_ms) as fake:
+        ids = seed_fixtures(fake.store, estimates=args.estimates, agreements=args.agreements)
+        agent_module.SUPABASE_URL = fake.url
+        agent_module.SUPABASE_SERVICE_ROLE_KEY = fake.service_role_key
+        for sessions in levels:
+            agent_module.response_cache.clear()
+            report = asyncio.run(run_load(args, sessions, fake, ids))
+            print_report(report)
+            reports.append(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(reports, fh, indent=2)
+
+    if args.slo_p99_ms:
+        breaches = [r["sessions"] for r in reports if r["latency"].get("turn", {}).get("p99_ms", 0) > args.slo_p99_ms]
+        if breaches:
+            print(f"\nTurn p99 exceeded {args.slo_p99_ms}ms at {breaches} sessions.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
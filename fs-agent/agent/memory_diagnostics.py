@@ -0,0 +1,243 @@
+"""
+Memory diagnostics for the long-running agent process.
+
+Enabled with `COPILOT_MEMORY_DIAGNOSTICS=1` (tracemalloc costs CPU and memory,
+so it is off by default). Once started, a background thread takes a tracemalloc
+snapshot every `COPILOT_MEMORY_SNAPSHOT_INTERVAL` seconds and keeps:
+
+- the top allocation sites by line and by module, plus the growth since the first snapshot;
+- traced and resident (RSS) memory, exported as gauges in metrics.py;
+- a growth alert, raised when retained memory grew at every one of the last
+  `COPILOT_MEMORY_GROWTH_WINDOW` snapshots and by more than
+  `COPILOT_MEMORY_GROWTH_THRESHOLD_MB` over that window.
+
+Separately, graph nodes report the approximate size of each thread's state
+(`messages`, `entity_data`, `tools`) so runaway conversations can be found.
+`report()` backs the `/debug/memory` route in webapp.py, which only takes an
+on-demand snapshot while the monitor runs, so a request cannot start tracemalloc.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+MEMORY_DIAGNOSTICS_ENABLED = os.environ.get("COPILOT_MEMORY_DIAGNOSTICS") == "1"
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("COPILOT_MEMORY_SNAPSHOT_INTERVAL", "60"))
+GROWTH_WINDOW = int(os.environ.get("COPILOT_MEMORY_GROWTH_WINDOW", "5"))
+GROWTH_THRESHOLD_MB = float(os.environ.get("COPILOT_MEMORY_GROWTH_THRESHOLD_MB", "64"))
+TRACEMALLOC_FRAMES = int(os.environ.get("COPILOT_TRACEMALLOC_FRAMES", "1"))
+TOP_ALLOCATIONS = 15
+MAX_TRACKED_THREADS = 2000
+
+traced_bytes = metrics.Gauge("copilot_memory_traced_bytes", "Memory currently traced by tracemalloc.", ())
+rss_bytes = metrics.Gauge("copilot_memory_rss_bytes", "Resident set size of the agent process.", ())
+growth_alerts = metrics.Counter("copilot_memory_growth_alerts_total", "Sustained memory growth alerts.", ())
+state_bytes = metrics.Histogram(
+    "copilot_thread_state_bytes",
+    "Approximate size of a thread's state per node run.",
+    ("field", "workflow"),
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7),
+)
+
+
+def read_rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # ru_maxrss is the peak, in KiB on Linux; better than nothing elsewhere.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def _approximate_size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, list):
+        return sum(_approximate_size(item) for item in value)
+    content = getattr(value, "content", None)
+    if content is not None:
+        size = len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+        tool_calls = getattr(value, "tool_calls", None)
+        if tool_calls:
+            size += len(json.dumps(tool_calls, default=str))
+        return size
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class MemoryMonitor:
+    def __init__(
+        self,
+        interval_seconds: float = SNAPSHOT_INTERVAL_SECONDS,
+        growth_window: int = GROWTH_WINDOW,
+        growth_threshold_mb: float = GROWTH_THRESHOLD_MB,
+    ):
+        self.interval_seconds = interval_seconds
+        self.growth_window = growth_window
+        self.growth_threshold_bytes = int(growth_threshold_mb * 1024 * 1024)
+        self.alert: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=max(growth_window + 1, 2))
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._latest: Dict[str, Any] = {}
+        self._threads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="copilot-memory-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.take_snapshot()
+            self._stop.wait(self.interval_seconds)
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """
+        Take one snapshot, update gauges and the growth alert, and return the summary.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        rss = read_rss_bytes()
+        summary = {
+            "taken_at": time.time(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "rss_bytes": rss,
+            "top_lines": [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            ],
+            "top_modules": [
+                {"module": stat.traceback[0].filename, "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("filename")[:TOP_ALLOCATIONS]
+            ],
+        }
+        with self._lock:
+            if self._baseline is None:
+                self._baseline = snapshot
+            summary["growth_since_start"] = [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size_diff}
+                for stat in snapshot.compare_to(self._baseline, "lineno")[:TOP_ALLOCATIONS]
+                if stat.size_diff > 0
+            ]
+            self._samples.append(current)
+            self._latest = summary
+            self._check_growth()
+        traced_bytes.set(current)
+        rss_bytes.set(rss)
+        return summary
+
+    def _check_growth(self) -> None:
+        samples = list(self._samples)
+        if len(samples) <= self.growth_window:
+            return
+        window = samples[-(self.growth_window + 1):]
+        rising = all(later > earlier for earlier, later in zip(window, window[1:]))
+        growth = window[-1] - window[0]
+        if rising and growth > self.growth_threshold_bytes:
+            if self.alert is None:
+                growth_alerts.inc()
+                print(
+                    f"[Copilot][memory] Retained memory grew {growth / 1048576:.1f} MiB over the last "
+                    f"{self.growth_window} snapshots (now {window[-1] / 1048576:.1f} MiB traced)"
+                )
+            since = self.alert["since"] if self.alert else time.time()
+            self.alert = {"growth_bytes": growth, "snapshots": len(window), "since": since}
+        elif not rising:
+            self.alert = None
+
+    def record_state(self, thread_id: Optional[str], state: Dict[str, Any]) -> None:
+        """
+        Account the approximate size of one thread's state. Called by the node wrapper while diagnostics run.
+        """
+        sizes = {
+            "messages": _approximate_size(state.get("messages")),
+            "entity_data": _approximate_size(state.get("entity_data")),
+            "tools": _approximate_size(state.get("tools")),
+        }
+        workflow = state.get("workflow") or "none"
+        for field, size in sizes.items():
+            state_bytes.observe(size, field=field, workflow=workflow)
+        key = thread_id or "unknown"
+        with self._lock:
+            self._threads[key] = {
+                **sizes,
+                "total": sum(sizes.values()),
+                "message_count": len(state.get("messages") or []),
+                "workflow": workflow,
+                "seen_at": time.time(),
+            }
+            self._threads.move_to_end(key)
+            while len(self._threads) > MAX_TRACKED_THREADS:
+                self._threads.popitem(last=False)
+
+    def largest_threads(self, limit: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            threads = [{"thread_id": thread_id, **sizes} for thread_id, sizes in self._threads.items()]
+        return sorted(threads, key=lambda item: item["total"], reverse=True)[:limit]
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            latest = dict(self._latest)
+            samples = list(self._samples)
+        return {
+            "enabled": self.running,
+            "rss_bytes": read_rss_bytes(),
+            "snapshot": latest,
+            "traced_history": samples,
+            "alert": self.alert,
+            "largest_threads": self.largest_threads(limit),
+        }
+
+
+monitor = MemoryMonitor()
+
+
+def record_state(thread_id: Optional[str], state: Dict[str, Any]) -> None:
+    if monitor.running:
+        monitor.record_state(thread_id, state)
+
+
+if MEMORY_DIAGNOSTICS_ENABLED:
+    monitor.start()
@@ -0,0 +1,362 @@
+"""
+In-process Prometheus metrics for the copilot agent.
+
+A small registry of counters, gauges and histograms rendered in the Prometheus
+text exposition format by `render()`, which `webapp.py` serves at `/metrics`
+next to the LangGraph API. Every series is labelled by workflow; the workflow of
+the running graph node is kept in a contextvar so tools and Supabase calls made
+inside the node are labelled without passing it around.
+
+`export()` returns the series as plain data and `render_workers()` renders the
+exports of several processes as one page; worker_stats.py uses them so every
+serve.py worker reports the whole server.
+"""
+
+import copy
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+_workflow: ContextVar[str] = ContextVar("copilot_metrics_workflow", default="none")
+
+
+def set_workflow(workflow: Optional[str]):
+    """
+    Label metrics recorded in the current context with `workflow`. Returns a token for `reset_workflow`.
+    """
+    return _workflow.set(workflow or "none")
+
+
+def reset_workflow(token) -> None:
+    _workflow.reset(token)
+
+
+def current_workflow() -> str:
+    return _workflow.get()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ("workflow",)):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if "workflow" in self.labelnames and "workflow" not in labels:
+            labels["workflow"] = current_workflow()
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return self._render(self.labelnames, series)
+
+    def export(self) -> List[list]:
+        with self._lock:
+            return [[list(key), copy.deepcopy(value)] for key, value in self._series.items()]
+
+    def render_workers(self, exports: Dict[str, List[list]]) -> List[str]:
+        """
+        Render the `export()`s of several workers, keyed by worker, with their series added up.
+        """
+        merged: Dict[Tuple[str, ...], Any] = {}
+        for series in exports.values():
+            for key, value in series:
+                key = tuple(key)
+                merged[key] = value if key not in merged else self._add(merged[key], value)
+        return self._render(self.labelnames, sorted(merged.items()))
+
+    def _add(self, left, right):
+        return left + right
+
+    def _render(self, labelnames: Sequence[str], series) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in series:
+            lines.extend(self._render_series(labelnames, key, value))
+        return lines
+
+    def _render_series(self, labelnames, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(labelnames, key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def render_workers(self, exports: Dict[str, List[list]]) -> List[str]:
+        # A level (queue depth, open breakers) does not add up across processes; keep one series per worker.
+        series = sorted((tuple(key) + (worker,), value) for worker, entries in exports.items() for key, value in entries)
+        return self._render((*self.labelnames, "worker"), series)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ("workflow",), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self, **labels) -> Dict[str, Any]:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return {"count": series["count"], "sum": series["sum"]} if series else {"count": 0, "sum": 0.0}
+
+    def _add(self, left, right):
+        return {
+            "counts": [a + b for a, b in zip(left["counts"], right["counts"])],
+            "sum": left["sum"] + right["sum"],
+            "count": left["count"] + right["count"],
+        }
+
+    def _render_series(self, labelnames, key, series) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), series["counts"]):
+            cumulative += count
+            labels = _format_labels(labelnames, key, ("le", _format_number(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+node_duration = Histogram(
+    "copilot_node_duration_seconds", "Graph node latency.", ("node", "workflow", "status")
+)
+tool_duration = Histogram(
+    "copilot_tool_duration_seconds", "Backend tool latency.", ("tool", "workflow", "status")
+)
+turn_duration = Histogram(
+    "copilot_turn_duration_seconds", "End-to-end latency of one user turn.", ("workflow", "status")
+)
+supabase_requests = Counter(
+    "copilot_supabase_requests_total", "Supabase HTTP requests.", ("table", "method", "status", "workflow")
+)
+supabase_duration = Histogram(
+    "copilot_supabase_request_duration_seconds", "Supabase HTTP request latency.", ("table", "method", "workflow")
+)
+supabase_retries = Counter(
+    "copilot_supabase_retries_total", "Supabase reads retried, by table and reason.", ("table", "reason", "workflow")
+)
+supabase_breaker_state = Gauge(
+    "copilot_supabase_breaker_state", "Supabase circuit breaker state per table (0 closed, 1 half-open, 2 open).", ("table",)
+)
+supabase_breaker_rejections = Counter(
+    "copilot_supabase_breaker_rejections_total", "Supabase requests failed fast by an open circuit.", ("table", "workflow")
+)
+supabase_inflight = Gauge(
+    "copilot_supabase_inflight", "Supabase requests currently in flight in this process.", ()
+)
+supabase_bulkhead_wait = Histogram(
+    "copilot_supabase_bulkhead_wait_seconds", "Time spent waiting for a Supabase request slot.", ("workflow",)
+)
+supabase_bulkhead_rejections = Counter(
+    "copilot_supabase_bulkhead_rejections_total", "Supabase requests refused because every slot stayed busy.", ("workflow",)
+)
+write_queue_depth = Gauge(
+    "copilot_write_queue_depth", "Rows waiting in a write-behind queue.", ("queue",)
+)
+write_queue_flushed = Counter(
+    "copilot_write_queue_flushed_rows_total", "Rows bulk-inserted from a write-behind queue, by trigger.", ("queue", "trigger")
+)
+write_queue_flush_failures = Counter(
+    "copilot_write_queue_flush_failures_total", "Write-behind batches that failed and were re-queued.", ("queue",)
+)
+write_queue_dropped = Counter(
+    "copilot_write_queue_dropped_rows_total", "Rows a write-behind queue dropped (full, closed, rejected or unsent at shutdown).", ("queue", "reason")
+)
+cache_lookups = Counter(
+    "copilot_cache_lookups_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result", "workflow")
+)
+fast_path_lookups = Counter(
+    "copilot_fast_path_total", "Turns answered by the intent fast path (hit) or sent to the model (miss, or error when the fast-path tool failed).", ("result", "workflow")
+)
+turn_tokens = Histogram(
+    "copilot_turn_tokens", "LLM tokens per turn.", ("direction", "workflow"), buckets=TOKEN_BUCKETS
+)
+llm_tokens = Counter(
+    "copilot_llm_tokens_total", "LLM tokens.", ("direction", "model", "workflow")
+)
+turn_budget_stops = Counter(
+    "copilot_turn_budget_stops_total", "Turns ended early by their deadline or model-call budget.", ("reason", "workflow")
+)
+model_calls = Counter(
+    "copilot_model_calls_total", "Model calls by tier and outcome (ok/escalated).", ("tier", "model", "outcome", "workflow")
+)
+model_latency = Histogram(
+    "copilot_model_call_duration_seconds", "Model call latency by tier.", ("tier", "model", "workflow")
+)
+model_cost_saved = Gauge(
+    "copilot_model_cost_saved_usd", "Net estimated USD saved by small-tier calls versus the large model.", ("workflow",)
+)
+model_latency_saved = Gauge(
+    "copilot_model_latency_saved_seconds",
+    "Net estimated seconds saved by small-tier calls versus the large model's mean latency.",
+    ("workflow",),
+)
+llm_admissions = Counter(
+    "copilot_llm_admissions_total",
+    "Model calls by admission outcome (admitted, expired, shed_queue_full, shed_wait).",
+    ("priority", "outcome", "workflow"),
+)
+llm_queue_wait = Histogram(
+    "copilot_llm_queue_wait_seconds", "Time model calls spent queued for admission.", ("priority", "workflow")
+)
+llm_queue_depth = Gauge(
+    "copilot_llm_queue_depth", "Model calls waiting for admission in this process.", ("priority",)
+)
+inflight_sessions = Gauge(
+    "copilot_inflight_sessions", "Sessions with a turn currently running.", ("workflow",)
+)
+
+
+class TurnTracker:
+    """
+    Follows each turn from the entry node to the node that routes to END, keyed by
+    trace id, to report turn latency, tokens per turn and in-flight sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns: Dict[str, Dict[str, Any]] = {}
+
+    def begin(self, trace_id: str, workflow: Optional[str]):
+        workflow = workflow or "none"
+        with self._lock:
+            self._turns[trace_id] = {"workflow": workflow, "started": time.perf_counter(), "input": 0, "output": 0}
+        inflight_sessions.inc(workflow=workflow)
+
+    def add_tokens(self, trace_id: Optional[str], input_tokens: int, output_tokens: int):
+        with self._lock:
+            turn = self._turns.get(trace_id)
+            if turn is not None:
+                turn["input"] += input_tokens
+                turn["output"] += output_tokens
+
+    def end(self, trace_id: Optional[str], status: str = "ok"):
+        with self._lock:
+            turn = self._turns.pop(trace_id, None)
+        if turn is None:
+            return
+        workflow = turn["workflow"]
+        inflight_sessions.dec(workflow=workflow)
+        turn_duration.observe(time.perf_counter() - turn["started"], workflow=workflow, status=status)
+        turn_tokens.observe(turn["input"], direction="input", workflow=workflow)
+        turn_tokens.observe(turn["output"], direction="output", workflow=workflow)
+
+    def active(self) -> int:
+        with self._lock:
+            return len(self._turns)
+
+
+turns = TurnTracker()
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def export() -> Dict[str, List[list]]:
+    """
+    Every metric's series as JSON-serialisable data, keyed by metric name.
+    """
+    return {metric.name: metric.export() for metric in REGISTRY}
+
+
+def render_workers(exports: Dict[str, Dict[str, List[list]]]) -> str:
+    """
+    `render()` for the `export()`s of several processes, keyed by worker: counters and
+    histograms are summed, gauges keep one series per worker under a `worker` label.
+    """
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(
+            metric.render_workers({worker: data[metric.name] for worker, data in exports.items() if metric.name in data})
+        )
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """
+    Drop every recorded series (tests and load-test sweeps).
+    """
+    for metric in REGISTRY:
+        metric.clear()
@@ -0,0 +1,162 @@
+"""
+Latency-aware model tiering for chat_node.
+
+Every model call used to go to gpt-4o, even turns like "add a note saying X"
+that only need one tool call. `select_tier` now picks a tier for each turn:
+
+- "small" (`COPILOT_MODEL_SMALL`, default gpt-4o-mini): short requests that read
+  like a command ("add ...", "apply ...", "what's the total") and do not ask for
+  drafting or reasoning.
+- "large" (`COPILOT_MODEL_LARGE`, default gpt-4o): everything else, such as
+  drafting, reviewing, explaining or long requests.
+
+If a small-tier reply contains a tool call that fails validation (unknown tool,
+arguments that do not match the schema, unparseable JSON), chat_node discards
+it and asks the large model instead. Each call is recorded per tier in
+`copilot_model_calls_total` and `copilot_model_call_duration_seconds`.
+The `copilot_model_cost_saved_usd` and `copilot_model_latency_saved_seconds` gauges
+estimate what the small tier saved compared with sending the same call to the
+large model. Escalations count against those savings. `COPILOT_MODEL_TIERING=0`
+sends every call to the large model.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import metrics
+from chat_models import DEFAULT_MODEL
+from intents import message_text
+
+MODEL_TIERING_ENABLED = os.environ.get("COPILOT_MODEL_TIERING", "1") != "0"
+LARGE_MODEL = os.environ.get("COPILOT_MODEL_LARGE", DEFAULT_MODEL)
+SMALL_MODEL = os.environ.get("COPILOT_MODEL_SMALL", "gpt-4o-mini")
+SMALL_TURN_MAX_WORDS = int(os.environ.get("COPILOT_SMALL_TURN_MAX_WORDS", "30"))
+
+# USD per million input / output tokens.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+_DISPATCH = re.compile(
+    r"^(please\s+|can you\s+|could you\s+)?"
+    r"(add|log|record|apply|accept|reject|load|show|get|list|set|update|adjust|advance|move|create|"
+    r"summari[sz]e|what'?s|what is|how many|how much)\b",
+    re.IGNORECASE,
+)
+_DRAFTING = re.compile(
+    r"\b(draft|write|rewrite|redline|review|explain|why|compare|negotiat\w*|propose|recommend|"
+    r"analy[sz]e|business case|requirements|clause|language)\b",
+    re.IGNORECASE,
+)
+
+
+def select_tier(messages: Sequence[BaseMessage]) -> str:
+    """
+    "small" for short, tool-dispatch-shaped turns, otherwise "large".
+    """
+    if not MODEL_TIERING_ENABLED:
+        return "large"
+    request = next((message for message in reversed(messages) if isinstance(message, HumanMessage)), None)
+    if request is None:
+        return "large"
+    text = message_text(request).strip()
+    if len(text.split()) > SMALL_TURN_MAX_WORDS or _DRAFTING.search(text):
+        return "large"
+    return "small" if _DISPATCH.search(text) else "large"
+
+
+def model_for(tier: str) -> str:
+    return SMALL_MODEL if tier == "small" else LARGE_MODEL
+
+
+def _tool_schema(tool: Any) -> Dict[str, Any]:
+    return convert_to_openai_tool(tool)["function"]
+
+
+def tool_call_problems(response: AIMessage, tools: Sequence[Any]) -> List[str]:
+    """
+    Why the tool calls in `response` cannot be run against `tools` (empty list: they can).
+
+    Backend tools are validated against their argument model. Frontend actions only
+    have a JSON schema, so for those only the required arguments are checked.
+    """
+    problems = [
+        f"{call.get('name') or 'tool call'}: {call.get('error') or 'invalid arguments'}"
+        for call in getattr(response, "invalid_tool_calls", None) or []
+    ]
+    by_name = {}
+    for tool in tools:
+        name = getattr(tool, "name", None) or _tool_schema(tool)["name"]
+        by_name[name] = tool
+    for call in getattr(response, "tool_calls", None) or []:
+        tool = by_name.get(call.get("name"))
+        if tool is None:
+            problems.append(f"{call.get('name')}: unknown tool")
+            continue
+        args = call.get("args") or {}
+        args_schema = getattr(tool, "args_schema", None)
+        if hasattr(args_schema, "model_validate"):
+            try:
+                args_schema.model_validate(args)
+            except Exception as exc:
+                problems.append(f"{call['name']}: {str(exc).splitlines()[0]}")
+            continue
+        required = _tool_schema(tool).get("parameters", {}).get("required", [])
+        missing = [name for name in required if name not in args]
+        if missing:
+            problems.append(f"{call['name']}: missing {', '.join(missing)}")
+    return problems
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+
+def _usage(response: AIMessage) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {"input": usage.get("input_tokens", 0), "output": usage.get("output_tokens", 0)}
+
+
+def record_call(
+    tier: str, seconds: float, response: AIMessage, escalated: bool = False, trace_id: Optional[str] = None
+) -> None:
+    """
+    Per-tier call metrics, plus the estimated savings of a small-tier call.
+
+    An escalated small call saved nothing: its whole cost and latency were spent
+    on top of the large call that replaced it. Its reply never reaches the state,
+    so its tokens are added to the turn here.
+    """
+    model = model_for(tier)
+    metrics.model_calls.inc(tier=tier, model=model, outcome="escalated" if escalated else "ok")
+    metrics.model_latency.observe(seconds, tier=tier, model=model)
+    if tier != "small":
+        return
+    usage = _usage(response)
+    small_cost = cost_usd(model, usage["input"], usage["output"])
+    large_cost = cost_usd(LARGE_MODEL, usage["input"], usage["output"])
+    if escalated:
+        reported_model = (getattr(response, "response_metadata", None) or {}).get("model_name", "unknown")
+        metrics.turns.add_tokens(trace_id, usage["input"], usage["output"])
+        metrics.llm_tokens.inc(usage["input"], direction="input", model=reported_model)
+        metrics.llm_tokens.inc(usage["output"], direction="output", model=reported_model)
+        if small_cost is not None:
+            metrics.model_cost_saved.inc(-small_cost)
+        metrics.model_latency_saved.inc(-seconds)
+        return
+    if small_cost is not None and large_cost is not None:
+        metrics.model_cost_saved.inc(large_cost - small_cost)
+    large = metrics.model_latency.snapshot(tier="large", model=LARGE_MODEL)
+    if large["count"]:
+        metrics.model_latency_saved.inc(large["sum"] / large["count"] - seconds)
@@ -0,0 +1,120 @@
+"""
+Opt-in CPU profiling of individual copilot turns.
+
+A turn is profiled when the run config asks for it (`configurable.profile`, or
+the `X-Copilot-Profile` request header, which langgraph.json forwards into
+`configurable`), or when it is picked by 1-in-N sampling
+(`COPILOT_PROFILE_SAMPLE_RATE=N`). While at least one profiled turn is running,
+a background thread samples the Python stacks of every thread that is busy (not
+parked in select/wait) every `COPILOT_PROFILE_INTERVAL_MS`. When the turn ends
+the samples are written in folded-stack format to
+`COPILOT_PROFILE_DIR/<trace_id>.folded`, ready for flamegraph.pl, speedscope or
+inferno.
+
+Samples are process-wide: turns of other sessions running at the same time
+show up in the same profile. When no turn is being profiled there is no
+sampler thread and a turn pays one dictionary lookup.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+PROFILE_SAMPLE_RATE = int(os.environ.get("COPILOT_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("COPILOT_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("COPILOT_PROFILE_INTERVAL_MS", "5"))
+PROFILE_HEADER = "x-copilot-profile"
+MAX_STACK_DEPTH = 128
+
+# Leaf frames that mean "this thread is waiting, not burning CPU".
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "wait", "_wait_for_tstate_lock", "acquire", "get", "sleep", "accept"}
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", "socket.py")
+
+
+def profile_requested(config: Optional[Dict[str, Any]]) -> bool:
+    configurable = (config or {}).get("configurable") or {}
+    flag = configurable.get("profile", configurable.get(PROFILE_HEADER))
+    if isinstance(flag, str):
+        return flag.strip().lower() in {"1", "true", "yes", "on"}
+    if flag:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.randrange(PROFILE_SAMPLE_RATE) == 0
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return code.co_name in _IDLE_FUNCTIONS and code.co_filename.endswith(_IDLE_FILES)
+
+
+class SamplingProfiler:
+    """
+    Shared stack sampler. `start(trace_id)` opens a profile, `stop(trace_id)` closes
+    it and writes the folded stacks; the thread exits once no profile is open.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, output_dir: str = PROFILE_DIR):
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._profiles)
+
+    def start(self, trace_id: str) -> None:
+        with self._lock:
+            self._profiles[trace_id] = {"stacks": Counter(), "samples": 0, "started": time.perf_counter()}
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="copilot-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, trace_id: str) -> Optional[str]:
+        """
+        Close the profile for `trace_id` and return the path of the written file (None if it was not profiled).
+        """
+        with self._lock:
+            profile = self._profiles.pop(trace_id, None)
+        if profile is None:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{trace_id}.folded")
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in profile["stacks"].most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or _is_idle(frame):
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(labels)))
+            with self._lock:
+                for profile in self._profiles.values():
+                    profile["samples"] += 1
+                    profile["stacks"].update(stacks)
+            time.sleep(self.interval)
+
+
+profiler = SamplingProfiler()
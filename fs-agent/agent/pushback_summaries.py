@@ -0,0 +1,171 @@
+"""
+Incremental pushback summaries.
+
+`summarize_pushbacks` keeps a running summary per agreement (note count and
+latest notes) together with a high-water mark, the newest note `created_at`
+folded in so far:
+
+- The first call for an agreement pages through its whole note history,
+  oldest first, `COPILOT_PUSHBACK_PAGE_SIZE` notes per request (default 500),
+  so agreements with thousands of notes are read in constant memory.
+- Later calls only fetch notes created since the mark, minus
+  `COPILOT_PUSHBACK_LOOKBACK_SECONDS` (default 30). Another worker's
+  write-behind queue can land a note with a timestamp slightly older than
+  the mark; the overlap catches it, and notes already counted are skipped by id.
+
+Note reads select `id,note_text,created_at` and the agreement read
+`id,type,counterparty`; the agreement `content` is never fetched. Entries are
+rebuilt from scratch after `COPILOT_PUSHBACK_CACHE_TTL` seconds (default 3600,
+which also drops deleted notes), and at most `COPILOT_PUSHBACK_CACHE_MAX_ENTRIES`
+agreements are kept (default 512).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import cache_lookups
+
+PAGE_SIZE = int(os.environ.get("COPILOT_PUSHBACK_PAGE_SIZE", "500"))
+LOOKBACK_SECONDS = float(os.environ.get("COPILOT_PUSHBACK_LOOKBACK_SECONDS", "30"))
+CACHE_TTL_SECONDS = float(os.environ.get("COPILOT_PUSHBACK_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.environ.get("COPILOT_PUSHBACK_CACHE_MAX_ENTRIES", "512"))
+RECENT_NOTES = 5
+
+NOTE_COLUMNS = "id,note_text,created_at"
+AGREEMENT_COLUMNS = "id,type,counterparty"
+
+FetchHeader = Callable[[str], Optional[Dict[str, Any]]]
+# (agreement_id, since, offset, limit) -> notes ordered by created_at, id
+FetchNotes = Callable[[str, Optional[str], int, int], List[Dict[str, Any]]]
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    A PostgREST timestamp as naive UTC.
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def new_summary(agreement: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "agreement": {"type": agreement.get("type"), "counterparty": agreement.get("counterparty")},
+        "note_count": 0,
+        "recent": [],
+        "high_water": None,
+        # id -> created_at of the notes inside the lookback window, to skip overlap re-reads.
+        "seen": {},
+    }
+
+
+def fetch_since(summary: Dict[str, Any], lookback_seconds: float = LOOKBACK_SECONDS) -> Optional[str]:
+    """
+    Lower `created_at` bound for the next incremental read, or None for the full history.
+    """
+    if summary["high_water"] is None:
+        return None
+    return format_timestamp(summary["high_water"] - timedelta(seconds=lookback_seconds))
+
+
+def merge_notes(summary: Dict[str, Any], notes: List[Dict[str, Any]], lookback_seconds: float = LOOKBACK_SECONDS) -> int:
+    """
+    Fold `notes` into `summary` in place, skipping notes already counted. Returns how many were new.
+    """
+    seen = summary["seen"]
+    fresh = []
+    for note in notes:
+        if note.get("id") in seen or not note.get("created_at"):
+            continue
+        created = parse_timestamp(note["created_at"])
+        seen[note.get("id")] = created
+        fresh.append({"note_text": note.get("note_text") or "", "created_at": note["created_at"], "_at": created})
+    if not fresh:
+        return 0
+    summary["note_count"] += len(fresh)
+    summary["recent"] = sorted(summary["recent"] + fresh, key=lambda note: note["_at"], reverse=True)[:RECENT_NOTES]
+    newest = max(note["_at"] for note in fresh)
+    if summary["high_water"] is None or newest > summary["high_water"]:
+        summary["high_water"] = newest
+    cutoff = summary["high_water"] - timedelta(seconds=lookback_seconds)
+    for note_id in [note_id for note_id, created in seen.items() if created < cutoff]:
+        del seen[note_id]
+    return len(fresh)
+
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    agreement = summary["agreement"]
+    parts = [
+        f"### Pushback Summary for {agreement.get('type') or 'Agreement'} - {agreement.get('counterparty') or 'Unknown'}",
+        "",
+    ]
+    if summary["recent"]:
+        parts.append("**Recent Notes:**")
+        parts.extend(f"- {note['note_text']}" for note in summary["recent"])
+    else:
+        parts.append("No notes found.")
+    return "\n".join(parts)
+
+
+class PushbackSummaryCache:
+    def __init__(
+        self,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        page_size: int = PAGE_SIZE,
+        lookback_seconds: float = LOOKBACK_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.page_size = page_size
+        self.lookback_seconds = lookback_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def summarize(self, agreement_id: str, fetch_header: FetchHeader, fetch_notes: FetchNotes) -> Dict[str, Any]:
+        """
+        Bring the agreement's summary up to date and return
+        `{"summary", "note_count", "new_notes"}`. Raises on request errors.
+        """
+        with self._lock:
+            entry = self._entries.get(agreement_id)
+            if entry is not None and time.monotonic() - entry["built_at"] > self.ttl_seconds:
+                entry = None
+            since = fetch_since(entry["summary"], self.lookback_seconds) if entry is not None else None
+        cache_lookups.inc(cache="pushback_summary", result="miss" if entry is None else "hit")
+        if entry is None:
+            entry = {"summary": new_summary(fetch_header(agreement_id) or {}), "built_at": time.monotonic()}
+
+        added = 0
+        offset = 0
+        while True:
+            page = fetch_notes(agreement_id, since, offset, self.page_size)
+            with self._lock:
+                added += merge_notes(entry["summary"], page, self.lookback_seconds)
+            if len(page) < self.page_size:
+                break
+            offset += len(page)
+
+        with self._lock:
+            self._entries[agreement_id] = entry
+            self._entries.move_to_end(agreement_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            summary = entry["summary"]
+            return {"summary": render_summary(summary), "note_count": summary["note_count"], "new_notes": added}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+summaries = PushbackSummaryCache()
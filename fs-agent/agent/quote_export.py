@@ -0,0 +1,152 @@
+"""
+Streaming quote export (CSV / XLSX).
+
+The `export_quote` tool prices an estimate's WBS the same way as
+`get_project_total` (role rates, per-row overrides) and writes the quote to a
+temporary file one row at a time. WBS rows are read in pages of
+`COPILOT_EXPORT_PAGE_SIZE` (default 500), so memory stays flat however large
+the WBS is. The file is uploaded to the `COPILOT_QUOTE_EXPORT_BUCKET` storage
+bucket (default "quote-exports") and the tool returns the storage path and a
+signed download URL valid for `COPILOT_EXPORT_URL_TTL` seconds (default 3600).
+The file contents never enter the conversation.
+
+The layout matches the web app's CSV export (`buildQuoteCsv`): one line per
+WBS row, a blank row, then Total Hours, Total Cost, Payment Terms and Delivery
+Timeline. XLSX needs openpyxl (`pip install "fs-agent[xlsx]"`) and is
+written with its write-only workbook, which also streams rows.
+"""
+
+import csv
+import io
+import os
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from core import build_rate_maps, price_wbs_row
+
+EXPORT_PAGE_SIZE = int(os.environ.get("COPILOT_EXPORT_PAGE_SIZE", "500"))
+EXPORT_BUCKET = os.environ.get("COPILOT_QUOTE_EXPORT_BUCKET", "quote-exports")
+EXPORT_URL_TTL_SECONDS = int(os.environ.get("COPILOT_EXPORT_URL_TTL", "3600"))
+
+HEADER = ["Task Code", "Description", "Role", "Hours", "Rate", "Cost", "Assumptions"]
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# (estimate_id, offset, limit) -> WBS rows ordered by sort_order
+FetchPage = Callable[[str, int, int], List[Dict[str, Any]]]
+
+
+def iter_quote_lines(
+    estimate_id: str,
+    fetch_page: FetchPage,
+    rates: List[Dict[str, Any]],
+    overrides: List[Dict[str, Any]],
+    page_size: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Priced quote lines (with assumptions), one WBS page in memory at a time.
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    rate_map, override_map = build_rate_maps(rates, overrides)
+    offset = 0
+    while True:
+        rows = fetch_page(estimate_id, offset, page_size)
+        for row in rows:
+            yield {**price_wbs_row(row, rate_map, override_map), "assumptions": row.get("assumptions") or ""}
+        if len(rows) < page_size:
+            return
+        offset += len(rows)
+
+
+class QuoteTotals:
+    def __init__(self, quote: Dict[str, Any]):
+        self.currency = quote.get("currency") or "USD"
+        self.payment_terms = quote.get("payment_terms") or ""
+        self.delivery_timeline = quote.get("delivery_timeline") or ""
+        self.rows = 0
+        self.hours = 0.0
+        self.cost = 0.0
+
+    def add(self, line: Dict[str, Any]) -> None:
+        self.rows += 1
+        self.hours += line["hours"]
+        self.cost += line["cost"]
+
+    def footer(self) -> List[List[str]]:
+        return [
+            ["Total Hours", f"{self.hours:.2f}"],
+            ["Total Cost", f"{self.currency} {self.cost:.2f}"],
+            ["Payment Terms", self.payment_terms],
+            ["Delivery Timeline", self.delivery_timeline],
+        ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "currency": self.currency,
+            "total_hours": round(self.hours, 2),
+            "total_cost": round(self.cost, 2),
+        }
+
+
+def write_csv(lines: Iterable[Dict[str, Any]], quote: Dict[str, Any], out: IO[bytes]) -> QuoteTotals:
+    totals = QuoteTotals(quote)
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerow(HEADER)
+    for line in lines:
+        totals.add(line)
+        writer.writerow(
+            [
+                line["task_code"] or "",
+                line["description"] or "",
+                line["role"],
+                f"{line['hours']:.2f}",
+                f"{line['rate']:.2f}",
+                f"{line['cost']:.2f}",
+                line["assumptions"],
+            ]
+        )
+    writer.writerow([])
+    writer.writerows(totals.footer())
+    text.flush()
+    text.detach()
+    return totals
+
+
+def write_xlsx(lines: Iterable[Dict[str, Any]], quote: Dict[str, Any], out: IO[bytes]) -> QuoteTotals:
+    try:
+        from openpyxl import Workbook
+    except ImportError as exc:
+        raise RuntimeError('XLSX export needs openpyxl; install "fs-agent[xlsx]" or export as CSV') from exc
+    totals = QuoteTotals(quote)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Quote")
+    sheet.append(HEADER)
+    for line in lines:
+        totals.add(line)
+        sheet.append(
+            [
+                line["task_code"] or "",
+                line["description"] or "",
+                line["role"],
+                round(line["hours"], 2),
+                round(line["rate"], 2),
+                round(line["cost"], 2),
+                line["assumptions"],
+            ]
+        )
+    sheet.append([])
+    for row in totals.footer():
+        sheet.append(row)
+    workbook.save(out)
+    return totals
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+def export_path(estimate_id: str, export_format: str, stamp: str) -> str:
+    return f"{estimate_id}/quote-{stamp}.{export_format}"
+
@@ -0,0 +1,192 @@
+"""
+Short-lived read cache for Supabase GETs, filled by speculative prefetch.
+
+When `chat_node` starts a turn on an entity, it prefetches the rows the tools
+will most likely read (see PREFETCH_BUNDLES in agent.py) in background threads
+while the model is still thinking. Those GETs run inside `filling()`, so
+`supabase_request` stores their responses here, keyed by URL and query
+parameters. A tool issuing the same GET shortly afterwards gets the stored
+response. If the prefetch is still in flight, the tool waits for it instead of
+sending a second request.
+
+Only prefetched queries are ever stored, and only for the turn that
+prefetched them: each traced node runs in `turn_scope(trace_id)`, entries are
+keyed by that trace id, and they are dropped when the turn ends. A later turn
+always reads fresh rows, so edits made in the web app between turns are seen.
+Entries also expire after `COPILOT_READ_CACHE_TTL` seconds (default 30). Any
+write through `supabase_request` drops the table's entries, including
+prefetches that are still running. `COPILOT_PREFETCH=0` turns prefetching off.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+import deadlines
+from metrics import cache_lookups
+
+READ_CACHE_TTL_SECONDS = float(os.environ.get("COPILOT_READ_CACHE_TTL", "30"))
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("COPILOT_READ_CACHE_MAX_ENTRIES", "512"))
+PREFETCH_ENABLED = os.environ.get("COPILOT_PREFETCH", "1") != "0"
+INFLIGHT_WAIT_SECONDS = 10
+
+_filling: ContextVar[bool] = ContextVar("copilot_read_cache_filling", default=False)
+_turn: ContextVar[Optional[str]] = ContextVar("copilot_read_cache_turn", default=None)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def make_key(url: str, params: Any = None) -> Key:
+    items = params.items() if isinstance(params, dict) else (params or ())
+    return url, tuple(sorted((str(name), str(value)) for name, value in items))
+
+
+class ReadCache:
+    def __init__(self, ttl_seconds: float = READ_CACHE_TTL_SECONDS, max_entries: int = READ_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (trace id, key) -> (stored at, table, response)
+        self._entries: "OrderedDict[Tuple[Optional[str], Key], Tuple[float, str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[Optional[str], Key], Tuple[str, Future]] = {}
+        self._generations: Dict[str, int] = {}
+        self._tables: Set[str] = set()
+
+    def get(self, key: Key, table: str) -> Optional[Any]:
+        """
+        Response to `key` stored (or being prefetched) by the current turn, or None.
+        """
+        key = (_turn.get(), key)
+        with self._lock:
+            if table not in self._tables:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                entry = None
+            inflight = self._inflight.get(key) if entry is None else None
+        if entry is not None:
+            cache_lookups.inc(cache="read", result="hit")
+            return entry[2]
+        if inflight is not None:
+            try:
+                response = inflight[1].result(timeout=deadlines.timeout(INFLIGHT_WAIT_SECONDS))
+            except Exception:
+                response = None
+            if response is not None:
+                cache_lookups.inc(cache="read", result="inflight")
+                return response
+        cache_lookups.inc(cache="read", result="miss")
+        return None
+
+    @contextmanager
+    def fill(self, key: Key, table: str) -> Iterator[Future]:
+        """
+        Register a prefetch for `key`; set the yielded future to the response (or None).
+        """
+        future: Future = Future()
+        key = (_turn.get(), key)
+        with self._lock:
+            self._tables.add(table)
+            generation = self._generations.get(table, 0)
+            self._inflight[key] = (table, future)
+        try:
+            yield future
+        finally:
+            if not future.done():
+                future.set_result(None)
+            response = future.result()
+            with self._lock:
+                if self._inflight.get(key, (None, None))[1] is future:
+                    del self._inflight[key]
+                # A write to the table while the prefetch ran makes the response stale.
+                if response is not None and self._generations.get(table, 0) == generation:
+                    self._entries[key] = (time.monotonic(), table, response)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [key for key, entry in self._entries.items() if entry[1] == table]:
+                del self._entries[key]
+            for key in [key for key, (owner, _) in self._inflight.items() if owner == table]:
+                del self._inflight[key]
+
+    def discard_turn(self, turn: Optional[str]) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == turn]:
+                del self._entries[key]
+
+    def generation(self, tables: Sequence[str]) -> Tuple[int, ...]:
+        """
+        Write counters of `tables`; they change whenever the agent writes to one of them.
+        """
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+            self._tables.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+read_cache = ReadCache()
+
+# Prefetch tasks run detached from the node that started them; keep them referenced until done.
+_background: Set["asyncio.Task[Any]"] = set()
+
+
+@contextmanager
+def turn_scope(trace_id: Optional[str]) -> Iterator[None]:
+    """
+    Store and look up prefetched reads under the turn `trace_id`, like deadlines.deadline_scope.
+    """
+    token = _turn.set(trace_id)
+    try:
+        yield
+    finally:
+        _turn.reset(token)
+
+
+def filling() -> bool:
+    return _filling.get()
+
+
+def _run_filling(loader: Callable[[], Any]) -> Any:
+    token = _filling.set(True)
+    try:
+        return loader()
+    except Exception:
+        # Nothing is stored for a failed read; the tool's own read reports the error.
+        return None
+    finally:
+        _filling.reset(token)
+
+
+def start_prefetch(loaders: Sequence[Callable[[], Any]]) -> Sequence["asyncio.Task[Any]"]:
+    """
+    Run `loaders` in worker threads without waiting for them; their GETs fill the read cache.
+    Must be called from a running event loop.
+    """
+    if not PREFETCH_ENABLED:
+        return []
+    tasks = []
+    for loader in loaders:
+        task = asyncio.ensure_future(asyncio.to_thread(_run_filling, loader))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+        tasks.append(task)
+    return tasks
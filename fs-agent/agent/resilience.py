@@ -0,0 +1,186 @@
+"""
+Retry, circuit breaker and bulkhead for Supabase requests.
+
+`supabase_client._send` runs every request through these:
+
+- Retries: idempotent reads (GET/HEAD) that fail with a connection error, a
+  timeout, 429 or a 5xx are retried up to `COPILOT_SUPABASE_RETRIES` times
+  (default 2). Backoff is exponential with full jitter (base
+  `COPILOT_SUPABASE_RETRY_BASE_MS`, default 100 ms; at most 2 s), and never
+  sleeps past the turn's deadline. Writes are never retried.
+- Circuit breaker, one per table: after `COPILOT_SUPABASE_BREAKER_FAILURES`
+  consecutive failures (default 5; connection errors, timeouts and 5xx), the
+  table's breaker opens. Requests then fail at once with CircuitOpenError for
+  `COPILOT_SUPABASE_BREAKER_RESET` seconds (default 30). After that, one
+  probe request is let through: success closes the breaker, failure opens it
+  again.
+- Bulkhead: at most `COPILOT_SUPABASE_MAX_INFLIGHT` requests in flight per
+  process (default: the connection pool size). A request waits up to
+  `COPILOT_SUPABASE_BULKHEAD_WAIT` seconds (default 5, capped by the deadline)
+  for a slot, then fails with BulkheadFullError.
+
+Both errors are `requests.RequestException`s, so callers handle them like any
+other failed request.
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import requests
+
+import deadlines
+import metrics
+
+RETRIES = int(os.environ.get("COPILOT_SUPABASE_RETRIES", "2"))
+RETRY_BASE_SECONDS = float(os.environ.get("COPILOT_SUPABASE_RETRY_BASE_MS", "100")) / 1000
+RETRY_MAX_SECONDS = 2.0
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BREAKER_FAILURES = int(os.environ.get("COPILOT_SUPABASE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("COPILOT_SUPABASE_BREAKER_RESET", "30"))
+MAX_INFLIGHT = int(os.environ.get("COPILOT_SUPABASE_MAX_INFLIGHT", os.environ.get("COPILOT_SUPABASE_POOL_SIZE", "32")))
+BULKHEAD_WAIT_SECONDS = float(os.environ.get("COPILOT_SUPABASE_BULKHEAD_WAIT", "5"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class BulkheadFullError(requests.ConnectionError):
+    pass
+
+
+def is_failure(status: int) -> bool:
+    """
+    Whether a response status counts against the breaker (server-side trouble, not bad requests).
+    """
+    return status >= 500
+
+
+def should_retry(method: str, attempt: int) -> bool:
+    return method in RETRY_METHODS and attempt < RETRIES
+
+
+def backoff_seconds(attempt: int) -> Optional[float]:
+    """
+    Full-jitter exponential backoff before retry number `attempt + 1`, capped by the deadline.
+    Returns None when there is no time left to retry.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+    left = deadlines.remaining()
+    if left is not None and left <= delay:
+        return None
+    return delay
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_request(self) -> None:
+        """
+        Raise CircuitOpenError unless a request may be sent now.
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN)
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probing):
+                self._probing = self._state == HALF_OPEN
+                return
+        metrics.supabase_breaker_rejections.inc(table=self.name)
+        raise CircuitOpenError(f"Supabase circuit for {self.name} is open; failing fast.")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != OPEN:
+                    self._set_state(OPEN)
+
+    def release(self) -> None:
+        """
+        Give up a half-open probe that ended without a verdict (e.g. a 4xx).
+        """
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        metrics.supabase_breaker_state.set(_STATE_VALUES[state], table=self.name)
+        print(f"[Copilot][supabase] Circuit for {self.name} is now {state}")
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, table: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(table)
+            if breaker is None:
+                breaker = self._breakers[table] = CircuitBreaker(table)
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.state for breaker in breakers}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+class Bulkhead:
+    def __init__(self, limit: int = MAX_INFLIGHT, wait_seconds: float = BULKHEAD_WAIT_SECONDS):
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        started = time.perf_counter()
+        acquired = self._slots.acquire(timeout=deadlines.timeout(self.wait_seconds))
+        metrics.supabase_bulkhead_wait.observe(time.perf_counter() - started)
+        if not acquired:
+            metrics.supabase_bulkhead_rejections.inc()
+            raise BulkheadFullError(f"More than {self.limit} Supabase requests in flight; try again later.")
+        metrics.supabase_inflight.inc()
+        try:
+            yield
+        finally:
+            metrics.supabase_inflight.dec()
+            self._slots.release()
+
+
+breakers = BreakerRegistry()
+bulkhead = Bulkhead()
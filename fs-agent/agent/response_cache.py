@@ -0,0 +1,153 @@
+"""
+Entity-version-aware response cache for repeated copilot questions.
+
+Answers are keyed by workflow, entity id and the normalized question, and stored
+together with a version stamp of the entity's data (latest `updated_at` / row
+count of the WBS, quote, artifacts, agreement, notes...). A cached answer is only served
+while the stamp is unchanged; a lookup with a newer stamp evicts it.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from intents import normalize_request
+from metrics import cache_lookups
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("COPILOT_RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("COPILOT_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# (table, entity filter column, version column) that together describe an entity's data.
+VERSION_SOURCES: Dict[str, List[Tuple[str, str, str]]] = {
+    "estimates": [
+        ("estimates", "id", "updated_at"),
+        ("estimate_wbs_rows", "estimate_id", "updated_at"),
+        ("estimate_quote", "estimate_id", "updated_at"),
+        ("estimate_quote_rates", "estimate_id", "updated_at"),
+        ("estimate_quote_overrides", "estimate_id", "updated_at"),
+        # summarize_business_case / summarize_requirements answer from the uploaded artifacts.
+        ("estimate_artifacts", "estimate_id", "created_at"),
+    ],
+    "contracts": [
+        ("contract_agreements", "id", "updated_at"),
+        ("contract_notes", "agreement_id", "created_at"),
+        ("contract_review_drafts", "agreement_id", "created_at"),
+    ],
+}
+
+# Only turns that used nothing but these tools produce answers that are safe to replay.
+READ_ONLY_TOOLS = {
+    "summarize_business_case",
+    "summarize_requirements",
+    "get_project_total",
+    "load_exemplar_contracts",
+    "summarize_pushbacks",
+}
+
+# Follow-ups depend on the conversation rather than just the entity.
+_FOLLOW_UP = re.compile(r"^(?:and|also|then|what about|how about|same|it|that|those|these|why)\b")
+
+
+def is_cacheable_question(question: str) -> bool:
+    return bool(question) and not _FOLLOW_UP.match(question)
+
+
+def turn_is_read_only(messages: List[BaseMessage]) -> bool:
+    """
+    True when every tool call since the latest user message is a read-only backend tool.
+    """
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return True
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                if tool_call.get("name") not in READ_ONLY_TOOLS:
+                    return False
+    return True
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "expirations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def make_key(self, workflow: Optional[str], entity_id: Optional[str], question: str, stamp: Optional[str]):
+        """
+        Build the cache key stored in AgentState while a turn is in flight, or None
+        when the turn should not be cached at all.
+        """
+        question = normalize_request(question)
+        if not (self.enabled and workflow and entity_id and stamp and is_cacheable_question(question)):
+            return None
+        return {"workflow": workflow, "entity_id": entity_id, "question": question, "stamp": stamp}
+
+    def get(self, key: Optional[Dict[str, str]]) -> Optional[str]:
+        if not key:
+            return None
+        base = (key["workflow"], key["entity_id"], key["question"])
+        with self._lock:
+            entry = self._entries.get(base)
+            if entry is None:
+                self._stats["misses"] += 1
+                cache_lookups.inc(cache="response", result="miss", workflow=key["workflow"])
+                return None
+            if entry["stamp"] != key["stamp"]:
+                del self._entries[base]
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                cache_lookups.inc(cache="response", result="miss", workflow=key["workflow"])
+                return None
+            if entry["expires_at"] <= time.monotonic():
+                del self._entries[base]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                cache_lookups.inc(cache="response", result="miss", workflow=key["workflow"])
+                return None
+            self._entries.move_to_end(base)
+            self._stats["hits"] += 1
+            cache_lookups.inc(cache="response", result="hit", workflow=key["workflow"])
+            return entry["answer"]
+
+    def put(self, key: Optional[Dict[str, str]], answer: str):
+        if not key or not answer:
+            return
+        base = (key["workflow"], key["entity_id"], key["question"])
+        with self._lock:
+            self._entries[base] = {
+                "stamp": key["stamp"],
+                "answer": answer,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._entries.move_to_end(base)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
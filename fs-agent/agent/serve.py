@@ -0,0 +1,198 @@
+"""
+Production ASGI server for the copilot graph.
+
+`langgraph dev` (the Dockerfile default) keeps every thread in process memory,
+runs a single worker and loses conversations on restart. This entry point
+serves the same graph over the AG-UI protocol (the one `@ag-ui/langgraph`
+speaks) from several uvicorn workers that share one persistent checkpointer:
+
+- `COPILOT_CHECKPOINT_URL` selects the store: a `postgres://` URL uses
+  langgraph-checkpoint-postgres, anything else is a SQLite file path
+  (default `checkpoints.sqlite`, opened in WAL mode so workers can share it)
+  holding the compacting store from checkpoint_store.py.
+- `COPILOT_WORKERS` sets the number of worker processes. Workers accept from
+  the same socket, so the OS spreads connections across them, and any worker
+  can continue any thread because the state lives in the checkpointer. Each
+  worker enforces its share of `COPILOT_LLM_RPM` / `COPILOT_LLM_TPM`
+  (admission.py).
+
+Run with `python serve.py`; point the frontend at it with `LANGGRAPH_AGUI_URL`.
+The operational routes from webapp.py are served by every worker. `/ready`,
+`/live` and `/debug/memory` describe the worker that answered; `/metrics` and
+`/usage` add up all of them through the snapshots in `COPILOT_METRICS_DIR`
+(worker_stats.py), which defaults to a temporary directory when there is more
+than one worker.
+"""
+
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+import webapp
+import worker_stats
+
+AGENT_NAME = "sample_agent"
+CHECKPOINT_URL = os.environ.get("COPILOT_CHECKPOINT_URL", "checkpoints.sqlite")
+# "compacting" (checkpoint_store.py) or "sqlite" (langgraph's AsyncSqliteSaver).
+CHECKPOINT_STORE = os.environ.get("COPILOT_CHECKPOINT_STORE", "compacting")
+COMPACT_INTERVAL_SECONDS = float(os.environ.get("COPILOT_CHECKPOINT_COMPACT_INTERVAL", "900"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("COPILOT_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+WORKERS = int(os.environ.get("COPILOT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+HOST = os.environ.get("COPILOT_HOST", "0.0.0.0")
+PORT = int(os.environ.get("COPILOT_PORT", "8123"))
+# Same convention as langgraph.json's configurable_headers.
+CONFIGURABLE_HEADER_PREFIX = "x-copilot-"
+
+
+def is_postgres_url(target: str) -> bool:
+    return target.startswith(("postgres://", "postgresql://"))
+
+
+@asynccontextmanager
+async def open_checkpointer(target: str = CHECKPOINT_URL) -> AsyncIterator[Any]:
+    """
+    Open (and create the tables of) the shared checkpointer for `target`.
+    """
+    if is_postgres_url(target):
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError as exc:
+            raise RuntimeError(
+                "COPILOT_CHECKPOINT_URL points at Postgres; install langgraph-checkpoint-postgres"
+            ) from exc
+        async with AsyncPostgresSaver.from_conn_string(target) as saver:
+            await saver.setup()
+            yield saver
+        return
+
+    path = target.removeprefix("sqlite:///")
+    if CHECKPOINT_STORE == "compacting":
+        from checkpoint_store import CompactingSqliteSaver
+
+        saver = CompactingSqliteSaver(path, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS)
+        try:
+            yield saver
+        finally:
+            saver.close()
+        return
+
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    conn = await aiosqlite.connect(path)
+    try:
+        # Several workers write the same file; wait for the lock instead of failing.
+        await conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        yield saver
+    finally:
+        await conn.close()
+
+
+async def compact_periodically(checkpointer: Any, interval: float = COMPACT_INTERVAL_SECONDS) -> None:
+    """
+    Trim old checkpoints and unreferenced blobs in the background.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await asyncio.to_thread(checkpointer.compact)
+            print(f"[Copilot][serve] Compacted checkpoints: {result}")
+        except Exception as exc:
+            print(f"[Copilot][serve] Checkpoint compaction failed: {exc}")
+
+
+def request_config(request: Request) -> Dict[str, Any]:
+    """
+    Forward `x-copilot-*` headers into the run's configurable, like the LangGraph API does.
+    """
+    configurable = {
+        name: value for name, value in request.headers.items() if name.startswith(CONFIGURABLE_HEADER_PREFIX)
+    }
+    return {"configurable": configurable}
+
+
+def create_app(checkpoint_url: str = CHECKPOINT_URL) -> FastAPI:
+    """
+    Build one worker's app. The graph is compiled against the checkpointer in the lifespan.
+    """
+    from ag_ui.core.types import RunAgentInput
+    from ag_ui.encoder import EventEncoder
+    from ag_ui_langgraph import LangGraphAgent
+
+    from agent import note_queue, workflow
+    from tracing import turn_guard
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with open_checkpointer(checkpoint_url) as checkpointer:
+            app.state.graph = workflow.compile(checkpointer=checkpointer)
+            background = []
+            if hasattr(checkpointer, "compact") and COMPACT_INTERVAL_SECONDS > 0:
+                background.append(asyncio.create_task(compact_periodically(checkpointer)))
+            if worker_stats.METRICS_DIR:
+                background.append(asyncio.create_task(worker_stats.publish_periodically()))
+            try:
+                yield
+            finally:
+                for task in background:
+                    task.cancel()
+                await asyncio.to_thread(note_queue.close)
+                if worker_stats.METRICS_DIR:
+                    worker_stats.remove_snapshot()
+
+    app = FastAPI(title="Copilot agent", lifespan=lifespan)
+    app.include_router(webapp.router)
+
+    @app.post("/")
+    async def run_agent(input_data: RunAgentInput, request: Request):
+        """
+        AG-UI run endpoint: streams the graph's events for one turn of `input_data.thread_id`.
+        """
+        encoder = EventEncoder(accept=request.headers.get("accept"))
+        # LangGraphAgent keeps the active run on the instance, so each request gets its own.
+        agent = LangGraphAgent(name=AGENT_NAME, graph=request.app.state.graph, config=request_config(request))
+
+        async def event_stream():
+            # Ends the turn even if the client disconnects or the run hits the recursion limit.
+            with turn_guard():
+                async for event in agent.run(input_data):
+                    yield encoder.encode(event)
+
+        return StreamingResponse(event_stream(), media_type=encoder.get_content_type())
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "agent": {"name": AGENT_NAME}}
+
+    return app
+
+
+async def _prepare_checkpointer() -> None:
+    async with open_checkpointer():
+        pass
+
+
+def main() -> None:
+    import uvicorn
+
+    # Create the tables once before the workers start so they don't race on the schema.
+    asyncio.run(_prepare_checkpointer())
+    backend = "postgres" if is_postgres_url(CHECKPOINT_URL) else f"sqlite:{CHECKPOINT_URL}"
+    print(f"[Copilot][serve] {WORKERS} worker(s) on {HOST}:{PORT}, checkpoints in {backend}")
+    # Workers inherit the environment; admission.py splits the LLM rate limits across them.
+    os.environ["COPILOT_WORKERS"] = str(WORKERS)
+    if WORKERS > 1 and not os.environ.get("COPILOT_METRICS_DIR"):
+        # Where the workers share their metrics and usage (worker_stats.py).
+        os.environ["COPILOT_METRICS_DIR"] = tempfile.mkdtemp(prefix="copilot-metrics-")
+    uvicorn.run("serve:create_app", factory=True, host=HOST, port=PORT, workers=WORKERS)
+
+
+if __name__ == "__main__":
+    main()
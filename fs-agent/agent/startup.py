@@ -0,0 +1,133 @@
+"""
+Warm startup and readiness for the agent process.
+
+agent.py registers warm-up steps (tool schemas, document templates, the
+Supabase connection pool, the LLM client) and starts them in a background
+thread when it is loaded. `readiness` records the outcome of each step. The
+`/ready` route in webapp.py only returns 200 once every required step has
+succeeded, so container health checks and load balancers hold traffic back
+until the first request can run warm.
+
+Required steps that fail (Supabase still starting, a DNS blip) are retried in
+the background, waiting `COPILOT_WARM_RETRY_SECONDS` (default 1) after the
+first failure and doubling up to `COPILOT_WARM_RETRY_MAX_SECONDS` (default 30),
+until they all succeed; `/ready` turns 200 as soon as they do. Steps that
+already succeeded are not run again.
+
+Set `COPILOT_WARM_STARTUP=0` to skip the warm-up (the process is then reported
+ready immediately).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+WARM_STARTUP_ENABLED = os.environ.get("COPILOT_WARM_STARTUP", "1") != "0"
+WARM_RETRY_SECONDS = float(os.environ.get("COPILOT_WARM_RETRY_SECONDS", "1"))
+WARM_RETRY_MAX_SECONDS = float(os.environ.get("COPILOT_WARM_RETRY_MAX_SECONDS", "30"))
+
+
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: List[Dict[str, Any]] = []
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.status = "starting"
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+
+    def register(self, name: str, func: Callable[[], Any], required: bool = True) -> None:
+        """
+        Add (or replace) a warm-up step. Optional steps may fail without blocking readiness.
+        """
+        with self._lock:
+            self._steps = [step for step in self._steps if step["name"] != name]
+            self._steps.append({"name": name, "func": func, "required": required})
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def run(self, names: Optional[List[str]] = None) -> bool:
+        """
+        Run the registered steps (only `names`, if given) in order and return whether the process is ready.
+        """
+        with self._lock:
+            steps = [step for step in self._steps if names is None or step["name"] in names]
+            self.status = "warming"
+        for step in steps:
+            started = time.perf_counter()
+            previous = self._results.get(step["name"]) or {}
+            result: Dict[str, Any] = {"required": step["required"], "attempts": previous.get("attempts", 0) + 1}
+            try:
+                detail = step["func"]()
+                result.update(status="ok", detail=detail)
+            except Exception as exc:
+                result.update(status="error", error=f"{type(exc).__name__}: {exc}")
+            result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            with self._lock:
+                self._results[step["name"]] = result
+        with self._lock:
+            failed = bool(self._failed_required())
+            self.status = "failed" if failed else "ready"
+            self.ready_at = time.time() if not failed else None
+        print(f"[Copilot][startup] {self.status} in {sum(r['duration_ms'] for r in self._results.values()):.0f}ms")
+        return not failed
+
+    def _failed_required(self) -> List[str]:
+        return [
+            step["name"]
+            for step in self._steps
+            if step["required"] and (self._results.get(step["name"]) or {}).get("status") != "ok"
+        ]
+
+    def _warm(self) -> None:
+        """
+        Run every step, then retry the failed required ones with exponential backoff until they succeed.
+        """
+        delay = WARM_RETRY_SECONDS
+        ready = self.run()
+        while not ready:
+            with self._lock:
+                failed = self._failed_required()
+            print(f"[Copilot][startup] retrying {', '.join(failed)} in {delay:g}s")
+            time.sleep(delay)
+            delay = min(delay * 2, WARM_RETRY_MAX_SECONDS)
+            ready = self.run(failed)
+
+    def start(self) -> None:
+        """
+        Run the warm-up in a daemon thread (once per process).
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            if not WARM_STARTUP_ENABLED:
+                self.status = "ready"
+                self.ready_at = time.time()
+                return
+            self._thread = threading.Thread(target=self._warm, name="copilot-warm-up", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait up to `timeout` seconds for the warm-up (and its retries) to finish; returns whether the process is ready.
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.ready
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "started_at": self.started_at,
+                "ready_at": self.ready_at,
+                "steps": dict(self._results),
+            }
+
+
+readiness = Readiness()
@@ -0,0 +1,174 @@
+"""
+Shared HTTP entry point for every Supabase (PostgREST / Storage) call the agent makes.
+
+Keeping the calls behind one function gives a single place for cross-cutting
+concerns: requests share one pooled `requests.Session` (keep-alive connections,
+`COPILOT_SUPABASE_POOL_SIZE` per host), timeouts are capped at the time left
+before the turn's deadline (deadlines.py), failed reads are retried behind a
+per-table circuit breaker and a per-process bulkhead (resilience.py), and each
+attempt is recorded as a `supabase` span with the table, method, status,
+response size and duration, and counted in the Supabase metrics. GETs are
+answered from the prefetch read cache (read_cache.py) when possible; any other
+method invalidates the table there, and an RPC also invalidates the tables it
+writes (RPC_WRITES). While a turn is recorded or replayed
+(cassette.py), the read cache is skipped and each attempt is written to or
+answered from its cassette.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import cassette
+import deadlines
+import read_cache as read_cache_module
+import resilience
+from metrics import supabase_duration, supabase_requests, supabase_retries
+from read_cache import read_cache
+from tracing import span
+
+DEFAULT_TIMEOUT = 10
+POOL_SIZE = int(os.environ.get("COPILOT_SUPABASE_POOL_SIZE", "32"))
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _build_session()
+
+_TABLE = re.compile(r"/(?:rest/v1/(?:rpc/)?|storage/v1/object/(?:public/)?)([^/?]+)")
+
+
+# Tables each RPC function writes; reads of them cached before the call are stale after it.
+RPC_WRITES: Dict[str, Tuple[str, ...]] = {
+    "create_contract_version": ("contract_agreements", "contract_versions"),
+}
+
+
+def table_of(url: str) -> str:
+    """
+    Table (or RPC function / storage bucket) addressed by a Supabase URL.
+    """
+    found = _TABLE.search(url)
+    return found.group(1) if found else "unknown"
+
+
+def supabase_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Issue one Supabase request. Accepts the same keyword arguments as
+    `requests.request`; the timeout defaults to DEFAULT_TIMEOUT seconds and never
+    runs past the turn's deadline (DeadlineExceeded once it has passed).
+    """
+    table = table_of(url)
+    if method != "GET":
+        written = (table, *RPC_WRITES.get(table, ()))
+        _invalidate(written)
+        try:
+            return _send(method, url, table, **kwargs)
+        finally:
+            # A prefetch that read the rows while the write ran holds the old values.
+            _invalidate(written)
+    if cassette.active():
+        return _send(method, url, table, **kwargs)
+    key = read_cache_module.make_key(url, kwargs.get("params"))
+    cached = read_cache.get(key, table)
+    if cached is not None:
+        return cached
+    if not read_cache_module.filling():
+        return _send(method, url, table, **kwargs)
+    with read_cache.fill(key, table) as slot:
+        response = _send(method, url, table, **kwargs)
+        slot.set_result(response if response.ok else None)
+    return response
+
+
+def _invalidate(tables: Tuple[str, ...]) -> None:
+    for table in tables:
+        read_cache.invalidate(table)
+
+
+def _send(method: str, url: str, table: str, **kwargs: Any) -> requests.Response:
+    """
+    Send through the table's circuit breaker and the process bulkhead, retrying failed reads.
+    """
+    breaker = resilience.breakers.get(table)
+    timeout = kwargs.pop("timeout", None) or DEFAULT_TIMEOUT
+    attempt = 0
+    while True:
+        breaker.before_request()
+        error = None
+        try:
+            with resilience.bulkhead.slot():
+                response = _attempt(method, url, table, timeout=deadlines.timeout(timeout), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            if isinstance(exc, resilience.BulkheadFullError):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            if not resilience.should_retry(method, attempt):
+                raise
+            error, reason = exc, type(exc).__name__
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            if resilience.is_failure(response.status_code):
+                breaker.record_failure()
+            elif response.ok:
+                breaker.record_success()
+            else:
+                breaker.release()
+            if response.status_code not in resilience.RETRY_STATUSES or not resilience.should_retry(method, attempt):
+                return response
+            reason = str(response.status_code)
+        delay = resilience.backoff_seconds(attempt)
+        if delay is None:
+            # No time left for another attempt: report the last outcome.
+            if error is not None:
+                raise error
+            return response
+        supabase_retries.inc(table=table, reason=reason)
+        time.sleep(delay)
+        attempt += 1
+
+
+def _attempt(method: str, url: str, table: str, **kwargs: Any) -> requests.Response:
+    started = time.perf_counter()
+    status = "error"
+    try:
+        with span("supabase", table=table, method=method) as request_span:
+            response = cassette.send(session, method, url, **kwargs)
+            status = response.status_code
+            request_span.set(status=status, bytes=len(response.content))
+            return response
+    finally:
+        supabase_requests.inc(table=table, method=method, status=status)
+        supabase_duration.observe(time.perf_counter() - started, table=table, method=method)
+
+
+def warm_pool(base_url: str, headers: Dict[str, str], connections: int = 4) -> Dict[str, Any]:
+    """
+    Open `connections` keep-alive connections to Supabase concurrently and verify
+    that PostgREST answers. Raises on any failed request.
+    """
+    url = f"{base_url}/rest/v1/estimates"
+    params = {"select": "id", "limit": "1"}
+
+    def probe(_):
+        response = supabase_request("GET", url, params=params, headers=headers, timeout=5)
+        response.raise_for_status()
+        return response.elapsed.total_seconds() * 1000
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        latencies = list(executor.map(probe, range(connections)))
+    return {"connections": connections, "max_latency_ms": round(max(latencies), 1)}
@@ -0,0 +1,12 @@
+import os
+import sys
+from pathlib import Path
+
+# langgraph loads agent.py as a top-level module with the agent directory on
+# sys.path, so its sibling modules are imported absolutely. Mirror that here.
+AGENT_DIR = Path(__file__).resolve().parents[1]
+if str(AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENT_DIR))
+
+# Tests warm up explicitly; don't start the background warm-up on every agent.py import.
+os.environ.setdefault("COPILOT_WARM_STARTUP", "0")
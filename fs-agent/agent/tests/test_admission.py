@@ -0,0 +1,114 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import admission
+import metrics
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_admission", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_priority_comes_from_the_run_config():
+    assert admission.priority_of(None) == admission.INTERACTIVE
+    assert admission.priority_of({"configurable": {"priority": "batch"}}) == admission.BATCH
+    assert admission.priority_of({"configurable": {"x-copilot-priority": "BATCH"}}) == admission.BATCH
+    assert admission.priority_of({"configurable": {"priority": "urgent"}}) == admission.INTERACTIVE
+
+
+def test_limits_are_split_across_the_workers(monkeypatch):
+    monkeypatch.setenv("COPILOT_LLM_RPM", "600")
+    monkeypatch.delenv("COPILOT_WORKERS", raising=False)
+    assert admission.per_worker_limit("COPILOT_LLM_RPM") == 600
+
+    monkeypatch.setenv("COPILOT_WORKERS", "4")
+    assert admission.per_worker_limit("COPILOT_LLM_RPM") == 150
+    assert admission.per_worker_limit("COPILOT_LLM_TPM") == 0
+
+
+def test_queued_interactive_calls_go_before_batch_calls():
+    metrics.reset()
+    # One request per 50ms; the first call uses the only request in the bucket.
+    controller = admission.AdmissionController(rpm=1200, max_queue_wait=5)
+    controller.requests.capacity = controller.requests.level = 1
+    order = []
+
+    async def call(name, priority):
+        async with controller.slot(10, priority):
+            order.append(name)
+
+    async def main():
+        await call("first", admission.INTERACTIVE)
+        batch = [asyncio.create_task(call(f"batch-{i}", admission.BATCH)) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", admission.INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+
+    asyncio.run(main())
+
+    assert order == ["first", "interactive", "batch-0", "batch-1"]
+    assert metrics.llm_admissions.value(priority="batch", outcome="admitted") == 2
+    assert metrics.llm_queue_wait.snapshot(priority="batch")["count"] == 2
+    assert controller.depth() == 0
+
+
+def test_calls_are_shed_when_the_queue_is_full_or_the_wait_too_long():
+    metrics.reset()
+
+    async def main():
+        full = admission.AdmissionController(rpm=60, max_queue=1, max_queue_wait=60)
+        full.requests.level = 0
+        waiting = asyncio.create_task(full.acquire(10))
+        await asyncio.sleep(0)
+        with pytest.raises(admission.AdmissionRejected) as rejected:
+            await full.acquire(10)
+        assert rejected.value.reason == "queue_full"
+        waiting.cancel()
+
+        slow = admission.AdmissionController(tpm=600, max_queue_wait=1)
+        with pytest.raises(admission.AdmissionRejected) as rejected:
+            await slow.acquire(1200)
+        assert rejected.value.reason == "wait"
+        assert str(rejected.value) == admission.SHED_MESSAGE
+
+    asyncio.run(main())
+
+    assert metrics.llm_admissions.value(priority="interactive", outcome="shed_queue_full") == 1
+    assert metrics.llm_admissions.value(priority="interactive", outcome="shed_wait") == 1
+
+
+def test_settle_refunds_the_unused_token_estimate():
+    controller = admission.AdmissionController(tpm=1000)
+
+    async def main():
+        async with controller.slot(800) as slot:
+            slot.settle(200)
+
+    asyncio.run(main())
+
+    assert controller.tokens.level == pytest.approx(800, abs=1)
+
+
+def test_a_shed_turn_ends_with_the_shed_message(monkeypatch):
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController(tpm=60, max_queue_wait=1))
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        result = asyncio.run(
+            agent_module.graph.ainvoke(
+                {"messages": [HumanMessage(content="what is the total?")], "workflow": "estimates", "entity_id": "est-0000"},
+                {"configurable": {"model_backend": "fake", "fake_script": [{"steps": [{"content": "unreachable"}]}]}},
+            )
+        )
+
+    last = result["messages"][-1]
+    assert isinstance(last, AIMessage)
+    assert last.content == admission.SHED_MESSAGE
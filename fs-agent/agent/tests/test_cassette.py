@@ -0,0 +1,149 @@
+import asyncio
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+import cassette
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_cassette", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+SCRIPT = [
+    {
+        "steps": [
+            {"tool_calls": [{"name": "get_project_total", "args": {"estimate_id": "{entity_id}"}}]},
+            {"content": "The total is shown above."},
+        ]
+    }
+]
+
+
+def _record(monkeypatch, tmp_path, turns=1):
+    monkeypatch.setattr(cassette, "CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setattr(agent_module, "FAST_PATH_ENABLED", False)
+    agent_module.response_cache.clear()
+    paths = []
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        for _ in range(turns):
+            result = asyncio.run(
+                agent_module.graph.ainvoke(
+                    {"messages": [HumanMessage(content="what is the total?")], "workflow": "estimates", "entity_id": "est-0000"},
+                    {
+                        "configurable": {
+                            "model_backend": "fake",
+                            "fake_script": SCRIPT,
+                            "fake_latency_ms": 150,
+                            "record_cassette": "1",
+                            "openai_api_key": "sk-secret",
+                        }
+                    },
+                )
+            )
+            paths.append(next(str(path) for path in tmp_path.glob("*.jsonl") if str(path) not in paths))
+    agent_module.response_cache.clear()
+    return paths[-1], result
+
+
+def test_recorded_turn_replays_offline_with_its_timings(monkeypatch, tmp_path):
+    path, recorded = _record(monkeypatch, tmp_path)
+    entries = cassette.load(path)
+    kinds = [entry["kind"] for entry in entries]
+    assert kinds[0] == "turn" and kinds[-1] == "end"
+    assert kinds.count("model") == 2
+    assert kinds.count("tool") == 1
+    assert "supabase" in kinds
+    text = Path(path).read_text()
+    assert "sk-secret" not in text and "127.0.0.1" not in text and "service" not in text.lower()
+
+    # The fake Supabase is gone; every request must be answered from the cassette.
+    report = asyncio.run(cassette.replay(path, agent_module.graph))
+
+    assert report["misses"] == [] and report["unmatched_writes"] == []
+    assert report["divergences"] == []
+    assert report["calls"]["model"] == 2 and report["calls"]["tool"] == 1
+    assert report["unused"]["model"] == 0
+    assert report["replayed_seconds"] >= 0.3
+    assert report["recorded_seconds"] >= 0.3
+
+    untimed = asyncio.run(cassette.replay(path, agent_module.graph, timing=False))
+    assert untimed["replayed_seconds"] < 0.3
+    assert untimed["misses"] == []
+
+
+def test_replay_reports_misses_and_divergences(monkeypatch, tmp_path):
+    path, _ = _record(monkeypatch, tmp_path)
+    lines = [json.loads(line) for line in Path(path).read_text().splitlines()]
+    for entry in lines:
+        if entry["kind"] == "supabase" and "estimate_wbs_rows" in entry["target"]:
+            entry["body"] = "[]"
+    Path(path).write_text("\n".join(json.dumps(entry) for entry in lines) + "\n")
+
+    report = asyncio.run(cassette.replay(path, agent_module.graph, timing=False))
+
+    assert [divergence["tool"] for divergence in report["divergences"]] == ["get_project_total"]
+
+    replayer = cassette.Replayer(path, timing=False)
+    with cassette.replaying(replayer):
+        response = agent_module.supabase_request("POST", "http://supabase.replay/rest/v1/contract_notes", json=[{}])
+    assert response.status_code == 204
+    assert replayer.unmatched_writes == ["POST /rest/v1/contract_notes"]
+
+
+def test_a_later_turn_is_recorded_without_the_caches_an_earlier_turn_filled(monkeypatch, tmp_path):
+    # The same question twice: without the bypass the second turn would be answered
+    # from the response cache and its cassette would hold no model or Supabase calls.
+    path, _ = _record(monkeypatch, tmp_path, turns=2)
+    kinds = [entry["kind"] for entry in cassette.load(path)]
+    assert kinds.count("model") == 2 and kinds.count("tool") == 1
+    assert "supabase" in kinds
+
+    # Caches left warm by other turns in this process must not answer the replay either.
+    report = asyncio.run(cassette.replay(path, agent_module.graph, timing=False))
+    again = asyncio.run(cassette.replay(path, agent_module.graph, timing=False))
+
+    for result in (report, again):
+        assert result["misses"] == [] and result["divergences"] == []
+        assert result["calls"]["model"] == 2 and result["calls"]["tool"] == 1
+
+
+def test_the_record_header_needs_the_server_opt_in(monkeypatch):
+    header = {"configurable": {"x-copilot-record-cassette": "1"}}
+    monkeypatch.setattr(cassette, "RECORD_ALL", False)
+    monkeypatch.setattr(cassette, "ALLOW_HEADER", False)
+    assert not cassette.recording_requested(header)
+    assert cassette.recording_requested({"configurable": {"record_cassette": "1"}})
+
+    monkeypatch.setattr(cassette, "ALLOW_HEADER", True)
+    assert cassette.recording_requested(header)
+
+
+def test_cassettes_are_capped_in_size_and_count(monkeypatch, tmp_path):
+    monkeypatch.setattr(cassette, "CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setattr(cassette, "MAX_BYTES", 400)
+    monkeypatch.setattr(cassette, "MAX_FILES", 3)
+    for idx in range(4):
+        old = tmp_path / f"old-{idx}.jsonl"
+        old.write_text("{}\n")
+        os.utime(old, (idx, idx))
+
+    config = {"configurable": {"record_cassette": "1", "thread_id": "t"}}
+    recorder = cassette.begin_turn("turn-1", {"messages": []}, config)
+    for _ in range(20):
+        recorder.write("supabase", body="x" * 50)
+    path = cassette.end_turn("turn-1")
+
+    assert sorted(name.name for name in tmp_path.iterdir()) == ["old-2.jsonl", "old-3.jsonl", "t-turn-1.jsonl"]
+    text = Path(path).read_text()
+    end = cassette.load(path)[-1]
+    assert end["kind"] == "end" and end["truncated"] is True
+    assert len(text) <= 400 + len(json.dumps(end, separators=(",", ":"))) + 1
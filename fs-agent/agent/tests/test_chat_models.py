@@ -0,0 +1,60 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from chat_models import ScriptedChatModel, get_chat_model
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_chat_models", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_scripted_model_emits_tool_call_then_text():
+    model = ScriptedChatModel()
+    system = SystemMessage(content="Current entity ID: est-9")
+    first = model.invoke([system, HumanMessage(content="What does this cost?")])
+    assert first.tool_calls[0]["name"] == "get_project_total"
+    assert first.tool_calls[0]["args"] == {"estimate_id": "est-9"}
+
+    second = model.invoke([
+        system,
+        HumanMessage(content="What does this cost?"),
+        first,
+        ToolMessage(content="{}", tool_call_id=first.tool_calls[0]["id"]),
+    ])
+    assert not second.tool_calls
+    assert "total" in second.content
+    assert second.usage_metadata["total_tokens"] > 0
+
+
+def test_get_chat_model_respects_config_and_rejects_unknown_backend():
+    model = get_chat_model({"configurable": {"model_backend": "fake", "fake_latency_ms": 5}})
+    assert isinstance(model, ScriptedChatModel)
+    assert model.latency_ms == 5
+
+    with pytest.raises(ValueError):
+        get_chat_model({"configurable": {"model_backend": "carrier-pigeon"}})
+
+
+def test_graph_runs_end_to_end_with_fake_backend(monkeypatch):
+    monkeypatch.setattr(agent_module, "fetch_wbs_rows", lambda _id: [])
+    result = asyncio.run(
+        agent_module.graph.ainvoke(
+            {
+                "messages": [HumanMessage(content="roughly how much does this cost by role?")],
+                "workflow": "estimates",
+                "entity_id": "est-1",
+            },
+            {"configurable": {"model_backend": "fake"}},
+        )
+    )
+
+    messages = result["messages"]
+    assert any(isinstance(message, ToolMessage) and message.name == "get_project_total" for message in messages)
+    assert isinstance(messages[-1], AIMessage)
+    assert not messages[-1].tool_calls
@@ -0,0 +1,90 @@
+import asyncio
+import importlib.util
+import json
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+from checkpoint_store import CompactingSqliteSaver
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_checkpoints", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+QUESTIONS = [
+    "roughly how much does this cost by role?",
+    "what stage is this estimate in?",
+    "roughly how much does this cost by role?",
+    "what stage is this estimate in?",
+]
+
+
+def _run_turns(saver, thread_id, questions, monkeypatch):
+    graph = agent_module.workflow.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": thread_id, "model_backend": "fake"}}
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        agent_module.response_cache.clear()
+        for question in questions:
+            asyncio.run(
+                graph.ainvoke(
+                    {"messages": [HumanMessage(content=question)], "workflow": "estimates", "entity_id": "est-0000"},
+                    config,
+                )
+            )
+    return graph, config
+
+
+def _message_refs(saver):
+    rows = saver.conn.execute("SELECT channel_refs FROM compact_checkpoints").fetchall()
+    return [refs["messages"] for refs in (json.loads(row[0]) for row in rows) if "messages" in refs]
+
+
+def test_round_trip_stores_message_deltas_and_shared_blobs(tmp_path, monkeypatch):
+    saver = CompactingSqliteSaver(str(tmp_path / "store.sqlite"), base_every=4, compact_every=0)
+    graph, config = _run_turns(saver, "thread-a", QUESTIONS, monkeypatch)
+
+    state = graph.get_state(config).values
+    assert [m.content for m in state["messages"] if isinstance(m, HumanMessage)] == QUESTIONS
+    history = list(graph.get_state_history(config))
+    assert len(history) == saver.stats()["checkpoints"]
+
+    refs = _message_refs(saver)
+    deltas = [ref for ref in refs if ref["parent"]]
+    # A workflow subgraph adds at most a tool call, its result and the reply per checkpoint.
+    assert deltas and all(len(ref["append"]) <= 3 for ref in deltas)
+    assert all(ref["depth"] < 4 for ref in refs)
+    # Every message is stored once, however many checkpoints include it.
+    assert saver.stats()["blobs"] < sum(len(ref["append"]) for ref in refs) + len(refs) * 4
+
+    # A second saver (another worker or a restart) reads the same state without the write cache.
+    other = CompactingSqliteSaver(saver.path, compact_every=0)
+    restored = other.get_tuple(config).checkpoint["channel_values"]
+    assert restored["messages"] == state["messages"]
+    assert restored["entity_id"] == "est-0000"
+
+
+def test_compaction_keeps_latest_state_and_drops_unreferenced_blobs(tmp_path, monkeypatch):
+    saver = CompactingSqliteSaver(str(tmp_path / "store.sqlite"), base_every=50, compact_every=0, keep=3)
+    graph, config = _run_turns(saver, "thread-b", QUESTIONS, monkeypatch)
+    before = graph.get_state(config).values
+    blobs_before = saver.stats()["blobs"]
+
+    result = saver.compact()
+
+    assert result["checkpoints"] > 0
+    assert saver.stats()["checkpoints"] == 3
+    assert graph.get_state(config).values["messages"] == before["messages"]
+    assert saver.stats()["blobs"] <= blobs_before
+    # The oldest kept checkpoint was re-based, so no delta points at a deleted checkpoint.
+    kept = {row[0] for row in saver.conn.execute("SELECT checkpoint_id FROM compact_checkpoints")}
+    assert all(ref["parent"] in kept for ref in _message_refs(saver) if ref["parent"])
+
+    # Writing continues on top of the compacted thread.
+    _run_turns(saver, "thread-b", QUESTIONS[:1], monkeypatch)
+    assert len(graph.get_state(config).values["messages"]) > len(before["messages"])
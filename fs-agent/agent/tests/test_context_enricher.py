@@ -0,0 +1,121 @@
+import asyncio
+import importlib.util
+import time
+from pathlib import Path
+
+import metrics
+import resilience
+from context_enricher import FACT_SHEET_HEADER, estimate_facts, estimate_tokens, render_fact_sheet
+from core import compute_quote_summary
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_enricher", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_fact_sheet_respects_the_token_budget_in_priority_order():
+    rows = [{"id": f"r{i}", "role": f"Role {i}", "hours": 10 + i} for i in range(40)]
+    summary = compute_quote_summary(rows, {"currency": "EUR", "payment_terms": "Net 30"}, [], [])
+    facts = estimate_facts(summary)
+    assert facts[0] == f"Total: {sum(10 + i for i in range(40)):,} hours, EUR {summary['total_cost']:,.0f}"
+    assert facts[1].startswith("Hours by role: Role 39 49h, Role 38 48h")
+
+    sheet = render_fact_sheet(facts, budget=80)
+    assert sheet.startswith(FACT_SHEET_HEADER)
+    assert estimate_tokens(sheet) <= 80
+    assert "- Total:" in sheet and "Hours by role" not in sheet  # too long for the budget, so dropped
+    assert render_fact_sheet(facts, budget=10) == ""
+
+
+def test_entity_fact_sheet_is_cached_per_turn_and_version(monkeypatch):
+    metrics.reset()
+    agent_module.fact_sheets.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1, wbs_rows=5, notes=3)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        state = {"workflow": "estimates", "entity_id": "est-0000", "trace_id": "turn-1"}
+
+        sheet = asyncio.run(agent_module.entity_fact_sheet(state, wait=True))
+        assert "- Total: 50 hours" in sheet
+        assert "Engagement Lead" in sheet and "Payment terms: Net 30" in sheet
+
+        requests_before = sum(fake.requests.values())
+        assert asyncio.run(agent_module.entity_fact_sheet(state, wait=True)) == sheet
+        assert sum(fake.requests.values()) == requests_before  # same turn: no reads at all
+
+        # A new turn re-checks the version stamp but reuses the sheet.
+        assert asyncio.run(agent_module.entity_fact_sheet({**state, "trace_id": "turn-2"}, wait=True)) == sheet
+        assert metrics.cache_lookups.value(cache="fact_sheet", result="hit") == 2
+
+        fake.store.update("estimate_wbs_rows", [("id", "eq.est-0000-wbs-000")], {"hours": 14})
+        refreshed = asyncio.run(agent_module.entity_fact_sheet({**state, "trace_id": "turn-3"}, wait=True))
+        assert "- Total: 60 hours" in refreshed
+
+        contract = asyncio.run(
+            agent_module.entity_fact_sheet(
+                {"workflow": "contracts", "entity_id": "agr-0000", "trace_id": "turn-4"}, wait=True
+            )
+        )
+    assert "- Agreement: MSA with Client 0" in contract
+    assert "- Current version: 1" in contract
+    assert "- Notes: 3" in contract
+    assert "- Open review proposals: 3" in contract
+
+
+def test_entity_fact_sheet_is_omitted_and_not_cached_when_a_read_fails(monkeypatch):
+    agent_module.fact_sheets.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0, wbs_rows=5)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        stamp = asyncio.run(agent_module.fetch_entity_version_stamp("estimates", "est-0000"))
+        state = {
+            "workflow": "estimates",
+            "entity_id": "est-0000",
+            "trace_id": "turn-1",
+            "response_cache_key": {"stamp": stamp},
+        }
+        try:
+            fake.fail_tables["estimate_quote_rates"] = 500
+            assert asyncio.run(agent_module.entity_fact_sheet(state, wait=True)) == ""
+            assert not agent_module.fact_sheets.built_in_turn("estimates", "est-0000", "turn-1")
+
+            # Without a version stamp the sheet is neither built nor cached, even though the
+            # sheet's own reads (which skip the artifacts) would succeed.
+            fake.fail_tables = {"estimate_artifacts": 500}
+            state = {"workflow": "estimates", "entity_id": "est-0000", "trace_id": "turn-2"}
+            assert asyncio.run(agent_module.entity_fact_sheet(state, wait=True)) == ""
+            assert not agent_module.fact_sheets.built_in_turn("estimates", "est-0000", "turn-2")
+        finally:
+            resilience.breakers.clear()
+
+        fake.fail_tables.clear()
+        assert "- Total: 50 hours" in asyncio.run(agent_module.entity_fact_sheet({**state, "trace_id": "turn-3"}, wait=True))
+
+
+def test_a_missing_fact_sheet_is_built_without_delaying_the_model_call(monkeypatch):
+    agent_module.fact_sheets.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0, wbs_rows=5)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        fake.latency_ms = 200
+        state = {"workflow": "estimates", "entity_id": "est-0000", "trace_id": "turn-1"}
+
+        async def turn():
+            started = time.perf_counter()
+            first = await agent_module.entity_fact_sheet(state)
+            seconds = time.perf_counter() - started
+            # A later call in the turn joins the build that is already running.
+            return first, seconds, await agent_module.entity_fact_sheet(state, wait=True)
+
+        first, seconds, sheet = asyncio.run(turn())
+        wbs_reads = fake.requests[("GET", "estimate_wbs_rows", 200)]
+
+    assert first == "" and seconds < 0.1
+    assert "- Total: 50 hours" in sheet
+    assert wbs_reads == 2  # the version stamp and one build
@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_contract_versions", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_concurrent_apply_proposals_get_distinct_versions(monkeypatch):
+    with FakeSupabase(latency_ms=5) as fake:
+        seed_fixtures(fake.store, estimates=0, agreements=1, notes=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+
+        def apply(_):
+            return agent_module.apply_proposals.invoke({"agreement_id": "agr-0000", "proposal_ids": "prop-1"})
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(apply, range(6)))
+        agent_module.note_queue.flush("agr-0000")
+
+        assert sorted(result["new_version"] for result in results) == [2, 3, 4, 5, 6, 7]
+        versions = fake.store.tables["contract_versions"]
+        assert sorted(row["version_number"] for row in versions) == [1, 2, 3, 4, 5, 6, 7]
+        assert fake.store.tables["contract_agreements"][0]["current_version"] == 7
+        # One round trip per version; no read of the latest version number first.
+        assert fake.requests[("POST", "create_contract_version", 200)] == 6
+        assert ("GET", "contract_versions", 200) not in fake.requests
+
+        duplicate = requests.post(
+            f"{fake.url}/rest/v1/contract_versions",
+            json={"agreement_id": "agr-0000", "version_number": 7, "content": "x"},
+            timeout=5,
+        )
+        assert duplicate.status_code == 409
+
+
+def test_concurrent_apply_proposals_keep_both_edits(monkeypatch):
+    with FakeSupabase(latency_ms=5) as fake:
+        seed_fixtures(fake.store, estimates=0, agreements=1, notes=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+
+        # Both callers read version 1 before either writes, so one of them must conflict.
+        barrier = threading.Barrier(2)
+        first_reads = threading.local()
+        fetch_agreement_record = agent_module.fetch_agreement_record
+
+        def fetch_in_lockstep(agreement_id):
+            record = fetch_agreement_record(agreement_id)
+            if not getattr(first_reads, "done", False):
+                first_reads.done = True
+                barrier.wait(timeout=5)
+            return record
+
+        monkeypatch.setattr(agent_module, "fetch_agreement_record", fetch_in_lockstep)
+
+        def apply(proposal_id):
+            return agent_module.apply_proposals.invoke({"agreement_id": "agr-0000", "proposal_ids": proposal_id})
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(apply, ["prop-1", "prop-2"]))
+        agent_module.note_queue.flush("agr-0000")
+
+        assert sorted(result["new_version"] for result in results) == [2, 3]
+        assert fake.requests[("POST", "create_contract_version", 409)] == 1
+        content = fake.store.tables["contract_agreements"][0]["content"]
+        assert content.startswith("Payment terms: Net 30. Client may terminate with 60 days notice.")
+
+
+def test_a_new_version_refreshes_the_turns_cached_reads_and_fact_sheet(monkeypatch):
+    agent_module.fact_sheets.clear()
+    tables = ["contract_agreements", "contract_versions"]
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=0, agreements=1, notes=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        state = {"workflow": "contracts", "entity_id": "agr-0000", "trace_id": "turn-1"}
+
+        async def turn():
+            # As intent_router leaves it: the stamp read at the start of the turn.
+            state["response_cache_key"] = {"stamp": await agent_module.fetch_entity_version_stamp("contracts", "agr-0000")}
+            with agent_module.read_cache.turn_scope("turn-1"):
+                await asyncio.gather(*agent_module.prefetch_entity_bundle("contracts", "agr-0000"))
+                before = await agent_module.entity_fact_sheet(state, wait=True)
+                generation = agent_module.read_cache.read_cache.generation(tables)
+                result = await asyncio.to_thread(
+                    agent_module.apply_proposals.invoke, {"agreement_id": "agr-0000", "proposal_ids": "prop-1"}
+                )
+                record = await asyncio.to_thread(agent_module.fetch_agreement_record, "agr-0000")
+                after = await agent_module.entity_fact_sheet(state, wait=True)
+                return before, generation, result, record, after, agent_module.read_cache.read_cache.generation(tables)
+
+        before, generation, result, record, after, later_generation = asyncio.run(turn())
+        agent_module.note_queue.flush("agr-0000")
+
+    assert result["new_version"] == 2
+    assert "- Current version: 1" in before
+    assert all(later > earlier for earlier, later in zip(generation, later_generation))
+    assert record["current_version"] == 2
+    assert "- Current version: 2" in after
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from core import build_wbs_rows, compute_quote_summary
+
+AGENT_DIR = Path(__file__).resolve().parents[1]
+
+
+def _imported_heavy_modules(code: str, cwd: Path) -> str:
+    probe = (
+        f"{code}; import sys; "
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'langchain', 'langchain_core', 'langgraph', 'requests'}))"
+    )
+    return subprocess.run([sys.executable, "-c", probe], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_core_and_package_import_without_langchain():
+    assert _imported_heavy_modules("import core", AGENT_DIR) == "[]"
+    assert _imported_heavy_modules("import agent; agent.build_msa_content", AGENT_DIR.parent) == "[]"
+
+
+def test_quote_summary_prefers_positive_overrides():
+    rows = [
+        {"id": "r1", "task_code": "A", "role": "Backend Engineer", "hours": 10},
+        {"id": "r2", "task_code": "B", "role": "QA Lead", "hours": 4},
+        {"id": "r3", "task_code": "C", "role": "Unknown Role", "hours": 2},
+    ]
+    summary = compute_quote_summary(
+        rows,
+        {"currency": "EUR", "payment_terms": "Net 30"},
+        [{"role": "backend engineer", "rate": 120}, {"role": "QA Lead", "rate": 90}],
+        [{"wbs_row_id": "r2", "rate": 100}, {"wbs_row_id": "r1", "rate": 0}],
+    )
+
+    assert [line["rate"] for line in summary["lines"]] == [120, 100, 150]
+    assert summary["total_cost"] == 1200 + 400 + 300
+    assert summary["total_hours"] == 16
+    assert summary["currency"] == "EUR"
+
+
+def test_build_wbs_rows_adds_requirement_and_artifact_rows():
+    rows = build_wbs_rows([{"filename": "brief.pdf"}], ["SSO login"])
+    codes = [row["taskCode"] for row in rows]
+    assert codes[:5] == ["DISC-101", "ARCH-110", "PLAN-210", "BACK-330", "QA-450"]
+    assert "REQ-001" in codes and "ART-BRI" in codes
@@ -0,0 +1,88 @@
+import asyncio
+import importlib.util
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import deadlines
+import metrics
+from fake_supabase import FakeSupabase, seed_fixtures
+from supabase_client import supabase_request
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_deadlines", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_timeouts_are_capped_by_the_deadline():
+    assert deadlines.timeout(10) == 10
+    with deadlines.deadline_scope(time.time() + 2):
+        assert 1 < deadlines.timeout(10) <= 2
+        assert deadlines.timeout(0.5) == 0.5
+    with deadlines.deadline_scope(time.time() - 1):
+        with pytest.raises(deadlines.DeadlineExceeded):
+            deadlines.timeout(10)
+
+    assert deadlines.turn_deadline({"configurable": {"deadline_seconds": "5"}}) == pytest.approx(time.time() + 5, abs=1)
+
+
+def test_requested_deadlines_are_validated_and_capped():
+    def requested(value):
+        return deadlines.turn_deadline({"configurable": {"x-copilot-deadline-seconds": value}}) - time.time()
+
+    for bad in ("soon", "-5", "nan", "inf", [30]):
+        assert requested(bad) == pytest.approx(deadlines.TURN_TIMEOUT_SECONDS, abs=1), bad
+    assert requested("1e9") == pytest.approx(deadlines.MAX_TURN_TIMEOUT_SECONDS, abs=1)
+    assert requested("12.5") == pytest.approx(12.5, abs=1)
+
+
+def test_expired_deadline_fails_supabase_requests_without_sending():
+    with FakeSupabase() as fake:
+        with deadlines.deadline_scope(time.time() - 1):
+            with pytest.raises(deadlines.DeadlineExceeded):
+                supabase_request("GET", f"{fake.url}/rest/v1/estimates", headers={"apikey": fake.service_role_key})
+        assert not fake.requests
+
+
+def _run(monkeypatch, script, configurable):
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        return asyncio.run(
+            agent_module.graph.ainvoke(
+                {"messages": [HumanMessage(content="keep checking the total")], "workflow": "estimates", "entity_id": "est-0000"},
+                {"configurable": {"model_backend": "fake", "fake_script": script, **configurable}},
+            )
+        )
+
+
+def test_step_budget_ends_a_looping_turn_with_a_partial_answer(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(deadlines, "MAX_MODEL_CALLS", 2)
+    loop = {"tool_calls": [{"name": "get_project_total", "args": {"estimate_id": "{entity_id}"}}]}
+    result = _run(monkeypatch, [{"steps": [loop] * 10}], {})
+
+    messages = result["messages"]
+    assert sum(isinstance(message, ToolMessage) for message in messages) == 2
+    assert "too many steps" in messages[-1].content
+    assert "get_project_total" in messages[-1].content
+    assert metrics.turn_budget_stops.value(reason="steps", workflow="estimates") == 1
+
+
+def test_deadline_cuts_off_a_slow_model_call(monkeypatch):
+    started = time.perf_counter()
+    result = _run(
+        monkeypatch,
+        [{"steps": [{"content": "This answer takes too long."}]}],
+        {"fake_latency_ms": 5000, "deadline_seconds": 1.5},
+    )
+
+    assert time.perf_counter() - started < 3
+    last = result["messages"][-1]
+    assert isinstance(last, AIMessage)
+    assert "ran out of time" in last.content
@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import intents
+import resilience
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_intents", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_match_intent_routes_common_estimate_commands():
+    for text in ("What's the project total?", "how much does this project cost", "Can you show the quote total for this estimate"):
+        match = intents.match_intent([HumanMessage(content=text)], "estimates", "est-1")
+        assert match is not None, text
+        assert match["args"] == {"estimate_id": "est-1"}
+
+    match = intents.match_intent([HumanMessage(content="Summarize pushbacks")], "contracts", "agr-1")
+    assert match["tool_name"] == "summarize_pushbacks"
+    assert match["args"] == {"agreement_id": "agr-1"}
+
+
+def test_match_intent_falls_back_when_unsure():
+    intents.reset_intent_stats()
+    # wrong workflow, no entity, nuanced phrasing, and frontend tool results all go to the model
+    assert intents.match_intent([HumanMessage(content="summarize pushbacks")], "estimates", "est-1") is None
+    assert intents.match_intent([HumanMessage(content="what's the project total")], "estimates", None) is None
+    assert intents.match_intent(
+        [HumanMessage(content="what's the project total if we drop the QA tasks and add a designer")],
+        "estimates",
+        "est-1",
+    ) is None
+    assert intents.match_intent([ToolMessage(content="ok", tool_call_id="1")], "estimates", "est-1") is None
+    # generate_wbs deletes and reinserts rows, so it never runs without the model
+    assert intents.match_intent([HumanMessage(content="please generate the WBS")], "estimates", "est-1") is None
+
+    stats = intents.get_intent_stats()
+    assert stats["total_hits"] == 0
+    assert stats["misses"] == 3
+    assert stats["skipped"] == 2
+
+
+def test_intent_stats_report_hit_rate():
+    intents.reset_intent_stats()
+    intents.match_intent([HumanMessage(content="what is the project total")], "estimates", "est-1")
+    intents.match_intent([HumanMessage(content="rewrite the scope section")], "estimates", "est-1")
+
+    stats = intents.get_intent_stats()
+    assert stats["hits"] == {"project_total": 1}
+    assert stats["hit_rate"] == 0.5
+
+
+def test_intent_router_answers_project_total_without_model(monkeypatch):
+    monkeypatch.setattr(
+        agent_module,
+        "fetch_wbs_rows",
+        lambda _id: [{"id": "r1", "task_code": "ENG-1", "description": "Build", "role": "Engineer", "hours": 10}],
+    )
+    monkeypatch.setattr(agent_module, "fetch_quote_record", lambda _id: {"currency": "USD", "payment_terms": "Net 30"})
+    monkeypatch.setattr(agent_module, "fetch_quote_rates", lambda _id: [{"role": "Engineer", "rate": 200}])
+    monkeypatch.setattr(agent_module, "fetch_quote_overrides", lambda _id: [])
+
+    state = {
+        "messages": [HumanMessage(content="what's the project total?")],
+        "workflow": "estimates",
+        "entity_id": "est-1",
+    }
+    command = asyncio.run(agent_module.intent_router(state, {}))
+
+    assert command.goto == agent_module.END
+    reply = command.update["messages"][0]
+    assert isinstance(reply, AIMessage)
+    assert "USD 2,000.00" in reply.content
+    assert "Net 30" in reply.content
+
+
+def test_a_failing_fast_path_tool_falls_back_to_the_model(monkeypatch):
+    agent_module.response_cache.clear()
+    breaker = resilience.breakers.get("estimate_wbs_rows")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    try:
+        with FakeSupabase() as fake:
+            seed_fixtures(fake.store, estimates=1, agreements=0)
+            monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+            monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+            direct = agent_module.get_project_total.invoke({"estimate_id": "est-0000"})
+            result = asyncio.run(
+                agent_module.graph.ainvoke(
+                    {"messages": [HumanMessage(content="what's the project total?")], "workflow": "estimates", "entity_id": "est-0000"},
+                    {"configurable": {"model_backend": "fake", "fake_script": [{"steps": [{"content": "Supabase is unavailable right now."}]}]}},
+                )
+            )
+    finally:
+        resilience.breakers.clear()
+
+    # An open circuit is an error, not an estimate without WBS rows.
+    assert "circuit" in direct["error"] and "total_cost" not in direct
+    last = result["messages"][-1]
+    assert isinstance(last, AIMessage)
+    assert last.content == "Supabase is unavailable right now."
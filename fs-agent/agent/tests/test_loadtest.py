@@ -0,0 +1,73 @@
+import json
+
+import requests
+
+import loadtest
+from fake_supabase import FakeSupabase, seed_fixtures
+
+
+def test_fake_supabase_speaks_postgrest():
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1, wbs_rows=3, notes=2)
+        base = f"{fake.url}/rest/v1"
+
+        response = requests.get(
+            f"{base}/estimate_wbs_rows",
+            params={"estimate_id": "eq.est-0000", "select": "task_code,hours", "order": "sort_order.desc", "limit": "2"},
+            headers={"Prefer": "count=exact"},
+            timeout=5,
+        )
+        assert response.status_code == 200
+        assert [row["task_code"] for row in response.json()] == ["TASK-002", "TASK-001"]
+        assert response.headers["Content-Range"] == "0-1/3"
+
+        created = requests.post(
+            f"{base}/contract_notes",
+            json={"agreement_id": "agr-0000", "note_text": "hello"},
+            headers={"Prefer": "return=representation"},
+            timeout=5,
+        )
+        assert created.status_code == 201
+        assert created.json()[0]["note_text"] == "hello"
+
+        patched = requests.patch(
+            f"{base}/contract_agreements",
+            params={"id": "eq.agr-0000"},
+            json={"current_version": 2},
+            headers={"Prefer": "return=representation"},
+            timeout=5,
+        )
+        assert patched.json()[0]["current_version"] == 2
+        assert fake.requests[("GET", "estimate_wbs_rows", 200)] == 1
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(100, 0, -1)]
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 95) == 95
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile(values, 100) == 100
+    assert loadtest.percentile([3.0, 1.0, 2.0], 50) == 2
+    assert loadtest.percentile([], 95) == 0.0
+
+
+def test_loadtest_reports_node_and_tool_percentiles(tmp_path):
+    report_path = tmp_path / "report.json"
+    exit_code = loadtest.main(
+        [
+            "--sessions", "4",
+            "--turns", "2",
+            "--llm-latency-ms", "1",
+            "--llm-tokens-per-second", "0",
+            "--db-latency-ms", "0",
+            "--ramp-seconds", "0",
+            "--json", str(report_path),
+        ]
+    )
+
+    assert exit_code == 0
+    report = json.loads(report_path.read_text())[0]
+    assert report["errors"] == 0
+    assert report["turns"] == 8
+    assert {"turn", "node:intent_router", "node:chat_node", "tool:get_project_total"} <= set(report["latency"])
+    assert report["latency"]["turn"]["p99_ms"] >= report["latency"]["turn"]["p50_ms"]
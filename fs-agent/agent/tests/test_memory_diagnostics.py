@@ -0,0 +1,76 @@
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage
+
+import memory_diagnostics
+from memory_diagnostics import MemoryMonitor
+from webapp import app
+
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    was_tracing = tracemalloc.is_tracing()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def test_growth_alert_needs_sustained_growth_past_threshold(monkeypatch):
+    monitor = MemoryMonitor(growth_window=3, growth_threshold_mb=1)
+    retained = []
+    for _ in range(4):
+        retained.append(bytearray(600 * 1024))
+        monitor.take_snapshot()
+    assert monitor.alert is not None
+    assert monitor.alert["growth_bytes"] > 1024 * 1024
+    assert any("test_memory_diagnostics.py" in line["location"] for line in monitor.report()["snapshot"]["growth_since_start"])
+
+    retained.clear()
+    monitor.take_snapshot()
+    assert monitor.alert is None
+
+
+def test_thread_state_sizes_are_ranked():
+    monitor = MemoryMonitor()
+    monitor.record_state("small", {"messages": [HumanMessage(content="hi")], "workflow": "estimates"})
+    monitor.record_state(
+        "large",
+        {
+            "messages": [HumanMessage(content="hi"), AIMessage(content="x" * 5000)],
+            "entity_data": {"rows": list(range(100))},
+            "workflow": "contracts",
+        },
+    )
+
+    largest = monitor.largest_threads(limit=1)[0]
+    assert largest["thread_id"] == "large"
+    assert largest["messages"] >= 5000
+    assert largest["entity_data"] > 0
+    assert largest["message_count"] == 2
+
+
+def test_debug_memory_route_takes_snapshot_on_demand(monkeypatch):
+    monitor = MemoryMonitor(interval_seconds=3600)
+    monkeypatch.setattr(memory_diagnostics, "monitor", monitor)
+    monitor.start()
+    try:
+        body = TestClient(app).get("/debug/memory", params={"snapshot": "true"}).json()
+    finally:
+        monitor.stop()
+    assert body["snapshot"]["traced_bytes"] > 0
+    assert body["rss_bytes"] > 0
+    assert body["alert"] is None
+
+
+def test_debug_memory_route_does_not_start_tracemalloc_when_disabled(monkeypatch):
+    monkeypatch.setattr(memory_diagnostics, "monitor", MemoryMonitor())
+    was_tracing = tracemalloc.is_tracing()
+
+    response = TestClient(app).get("/debug/memory", params={"snapshot": "true"})
+
+    assert response.status_code == 409
+    assert response.json()["snapshot"] == {}
+    assert tracemalloc.is_tracing() == was_tracing
+    assert TestClient(app).get("/debug/memory").status_code == 200
@@ -0,0 +1,112 @@
+import asyncio
+import importlib.util
+import os
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+
+import metrics
+import usage
+import worker_stats
+from fake_supabase import FakeSupabase, seed_fixtures
+from webapp import app
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_metrics", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ("tool",), buckets=(0.1, 1.0))
+    try:
+        histogram.observe(0.05, tool="a")
+        histogram.observe(0.5, tool="a")
+        histogram.observe(5, tool="a")
+        lines = histogram.render()
+    finally:
+        metrics.REGISTRY.remove(histogram)
+
+    assert 'test_latency_seconds_bucket{tool="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{tool="a",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{tool="a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{tool="a"} 3' in lines
+
+
+def test_turn_metrics_are_labelled_by_workflow(monkeypatch):
+    metrics.reset()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        agent_module.response_cache.clear()
+        for _ in range(2):
+            asyncio.run(
+                agent_module.graph.ainvoke(
+                    {
+                        "messages": [HumanMessage(content="roughly how much does this cost by role?")],
+                        "workflow": "estimates",
+                        "entity_id": "est-0000",
+                    },
+                    {"configurable": {"model_backend": "fake"}},
+                )
+            )
+
+    assert metrics.node_duration.snapshot(node="chat_node", workflow="estimates", status="ok")["count"] == 2
+    assert metrics.tool_duration.snapshot(tool="get_project_total", workflow="estimates", status="success")["count"] == 1
+    assert metrics.turn_duration.snapshot(workflow="estimates", status="ok")["count"] == 2
+    assert metrics.turn_tokens.snapshot(direction="input", workflow="estimates")["sum"] > 0
+    assert metrics.cache_lookups.value(cache="response", result="hit", workflow="estimates") == 1
+    assert metrics.supabase_requests.value(table="estimate_quote", method="GET", status=200, workflow="estimates") >= 1
+    assert metrics.inflight_sessions.value(workflow="estimates") == 0
+
+    body = TestClient(app).get("/metrics").text
+    assert "# TYPE copilot_tool_duration_seconds histogram" in body
+    assert 'copilot_cache_lookups_total{cache="response",result="hit",workflow="estimates"} 1' in body
+
+
+def test_metrics_and_usage_add_up_every_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(worker_stats, "METRICS_DIR", str(tmp_path))
+    metrics.reset()
+    usage.ledger.clear()
+
+    def record_as(worker, calls, depth):
+        monkeypatch.setattr(worker_stats, "worker_id", lambda: worker)
+        metrics.reset()
+        usage.ledger.clear()
+        for _ in range(calls):
+            metrics.model_calls.inc(tier="small", model="m", outcome="ok", workflow="estimates")
+            metrics.model_latency.observe(0.2, tier="small", model="m", workflow="estimates")
+        metrics.write_queue_depth.set(depth, queue="contract_notes")
+        usage.ledger.record(usage.model_call_usage("estimates", 100 * calls, 10, 0.2, 0.01), thread_id="thread-1")
+        worker_stats.write_snapshot(str(tmp_path))
+
+    try:
+        record_as("101", calls=2, depth=4)
+        record_as("102", calls=9, depth=9)
+        os.utime(tmp_path / "worker-102.json", (0, 0))  # a worker that died long ago
+        # The answering worker refreshes its own snapshot before merging.
+        monkeypatch.setattr(worker_stats, "worker_id", lambda: "103")
+        metrics.reset()
+        usage.ledger.clear()
+        metrics.model_calls.inc(tier="small", model="m", outcome="ok", workflow="estimates")
+        metrics.write_queue_depth.set(1, queue="contract_notes")
+        usage.ledger.record(usage.model_call_usage("estimates", 50, 5, 0.1, 0.01), thread_id="thread-1")
+
+        client = TestClient(app)
+        text = client.get("/metrics").text
+        report = client.get("/usage").json()
+    finally:
+        metrics.reset()
+        usage.ledger.clear()
+
+    assert 'copilot_model_calls_total{tier="small",model="m",outcome="ok",workflow="estimates"} 3' in text
+    assert 'copilot_model_call_duration_seconds_count{tier="small",model="m",workflow="estimates"} 2' in text
+    assert 'copilot_write_queue_depth{queue="contract_notes",worker="101"} 4' in text
+    assert 'copilot_write_queue_depth{queue="contract_notes",worker="103"} 1' in text
+    assert 'worker="102"' not in text
+    assert report["workers"] == 2
+    assert report["totals"]["input_tokens"] == 250 and report["totals"]["model_calls"] == 2
+    assert report["threads"] == [{"thread_id": "thread-1", "tokens": 265, "cost_usd": 0.02}]
@@ -0,0 +1,78 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import metrics
+import model_tiers
+from chat_models import ScriptedChatModel
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_model_tiers", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_select_tier_prefers_small_model_for_tool_dispatch(monkeypatch):
+    def tier(text):
+        return model_tiers.select_tier([HumanMessage(content=text)])
+
+    assert tier("add a note saying the client wants net 45") == "small"
+    assert tier("What's the project total?") == "small"
+    assert tier("draft a limitation of liability clause for this MSA") == "large"
+    assert tier("add a note explaining why we rejected the indemnity change") == "large"
+    assert tier("add " + "very " * 40 + "long note") == "large"
+    assert tier("hello") == "large"
+
+    monkeypatch.setattr(model_tiers, "MODEL_TIERING_ENABLED", False)
+    assert tier("add a note saying hi") == "large"
+
+
+def test_tool_call_problems_validates_backend_and_frontend_tools():
+    frontend = {"name": "addNote", "description": "Add a note", "parameters": {
+        "type": "object", "properties": {"note": {"type": "string"}}, "required": ["note"],
+    }}
+    tools = [agent_module.add_agreement_note, frontend]
+
+    def problems(*calls):
+        response = AIMessage(content="", tool_calls=[
+            {"name": name, "args": args, "id": f"call_{idx}", "type": "tool_call"} for idx, (name, args) in enumerate(calls)
+        ])
+        return model_tiers.tool_call_problems(response, tools)
+
+    assert problems(("add_agreement_note", {"agreement_id": "agr-1", "note": "hi"}), ("addNote", {"note": "hi"})) == []
+    assert problems(("add_agreement_note", {"agreement_id": "agr-1"}))
+    assert problems(("addNote", {}))
+    assert problems(("generate_wbs", {"estimate_id": "est-1"})) == ["generate_wbs: unknown tool"]
+
+
+def test_invalid_small_tier_tool_call_escalates_to_large_model(monkeypatch):
+    metrics.reset()
+    small = ScriptedChatModel(
+        script=[{"steps": [{"tool_calls": [{"name": "add_agreement_note", "args": {"note": "Follow up."}}]}]}],
+        model_name="small-fake",
+    )
+    large = ScriptedChatModel(script=[{"steps": [{"content": "Which agreement should I add the note to?"}]}])
+    models = []
+
+    def get_chat_model(config, model):
+        models.append(model)
+        return small if model == model_tiers.SMALL_MODEL else large
+
+    monkeypatch.setattr(agent_module, "get_chat_model", get_chat_model)
+    result = asyncio.run(
+        agent_module.graph.ainvoke(
+            {"messages": [HumanMessage(content="add a note saying follow up")], "workflow": "contracts"},
+            {"configurable": {"model_backend": "fake"}},
+        )
+    )
+
+    assert models == [model_tiers.SMALL_MODEL, model_tiers.LARGE_MODEL]
+    assert not any(isinstance(message, ToolMessage) for message in result["messages"])
+    assert result["messages"][-1].content == "Which agreement should I add the note to?"
+    assert metrics.model_calls.value(tier="small", model=model_tiers.SMALL_MODEL, outcome="escalated", workflow="contracts") == 1
+    assert metrics.model_calls.value(tier="large", model=model_tiers.LARGE_MODEL, outcome="ok", workflow="contracts") == 1
+    # The discarded small-tier reply still counts toward the model's token usage.
+    assert metrics.llm_tokens.value(direction="input", model="small-fake", workflow="contracts") > 0
@@ -0,0 +1,67 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+import profiling
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_profiling", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def _busy_render(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def test_profile_requested_by_flag_header_or_sampling(monkeypatch):
+    assert profiling.profile_requested({"configurable": {"profile": True}})
+    assert profiling.profile_requested({"configurable": {"x-copilot-profile": "1"}})
+    assert not profiling.profile_requested({"configurable": {"x-copilot-profile": "off"}})
+    assert not profiling.profile_requested({})
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1)
+    assert profiling.profile_requested({})
+
+
+def test_sampler_writes_folded_stacks(tmp_path):
+    profiler = profiling.SamplingProfiler(interval_ms=1, output_dir=str(tmp_path))
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_render, args=(stop,))
+    worker.start()
+    profiler.start("trace-1")
+    time.sleep(0.1)
+    path = profiler.stop("trace-1")
+    stop.set()
+    worker.join()
+
+    lines = Path(path).read_text().splitlines()
+    assert path.endswith("trace-1.folded")
+    assert any("_busy_render (test_profiling.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+    assert not profiler.active
+    assert profiler.stop("never-started") is None
+
+
+def test_profiled_turn_writes_file_named_by_trace_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling.profiler, "output_dir", str(tmp_path))
+    monkeypatch.setattr(agent_module, "fetch_wbs_rows", lambda _id: [])
+    result = asyncio.run(
+        agent_module.graph.ainvoke(
+            {
+                "messages": [HumanMessage(content="hello there")],
+                "workflow": "estimates",
+                "entity_id": "est-1",
+            },
+            {"configurable": {"model_backend": "fake", "fake_latency_ms": 20, "profile": True}},
+        )
+    )
+
+    assert (tmp_path / f"{result['trace_id']}.folded").exists()
+    assert not profiling.profiler.active
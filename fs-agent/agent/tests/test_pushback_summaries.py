@@ -0,0 +1,56 @@
+import importlib.util
+from pathlib import Path
+
+import pushback_summaries
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_pushback_summaries", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_merge_notes_skips_overlap_and_keeps_latest():
+    summary = pushback_summaries.new_summary({"type": "MSA", "counterparty": "Acme"})
+    notes = [
+        {"id": f"n{idx}", "note_text": f"note {idx}", "created_at": f"2025-01-01T00:00:{idx:02d}+00:00"}
+        for idx in range(8)
+    ]
+    assert pushback_summaries.merge_notes(summary, notes[:6], lookback_seconds=2) == 6
+    # The overlap re-read of n4/n5 is not counted again.
+    assert pushback_summaries.merge_notes(summary, notes[4:], lookback_seconds=2) == 2
+
+    assert summary["note_count"] == 8
+    assert [note["note_text"] for note in summary["recent"]] == ["note 7", "note 6", "note 5", "note 4", "note 3"]
+    assert set(summary["seen"]) == {"n5", "n6", "n7"}
+    assert pushback_summaries.fetch_since(summary, lookback_seconds=2) == "2025-01-01T00:00:05.000000Z"
+
+
+def test_summaries_page_the_history_once_then_read_only_new_notes(monkeypatch):
+    pushback_summaries.summaries.clear()
+    monkeypatch.setattr(pushback_summaries.summaries, "page_size", 4)
+    # Seeded notes are seconds apart; without this the lookback window would re-read them all.
+    monkeypatch.setattr(pushback_summaries.summaries, "lookback_seconds", 0)
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=0, agreements=1, notes=10)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+
+        def summarize():
+            return agent_module.summarize_pushbacks.invoke({"agreement_id": "agr-0000"})
+
+        first = summarize()
+        assert first["note_count"] == 10
+        assert fake.requests[("GET", "contract_notes", 200)] == 3
+        assert fake.requests[("GET", "contract_agreements", 200)] == 1
+
+        agent_module.add_agreement_note.invoke({"agreement_id": "agr-0000", "note": "Client rejects the liability cap."})
+        second = summarize()
+        third = summarize()
+
+    assert second["note_count"] == third["note_count"] == 11
+    assert "- Client rejects the liability cap." in second["summary"].splitlines()[3]
+    # The header is cached; each later call is one incremental notes read.
+    assert fake.requests[("GET", "contract_agreements", 200)] == 1
+    assert fake.requests[("GET", "contract_notes", 200)] == 5
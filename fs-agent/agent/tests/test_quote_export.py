@@ -0,0 +1,87 @@
+import csv
+import importlib.util
+import io
+from pathlib import Path
+
+import pytest
+import requests
+
+import quote_export
+import resilience
+from fake_supabase import FakeSupabase, seed_fixtures
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_quote_export", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0, wbs_rows=7)
+        fake.store.insert(
+            "estimate_quote_overrides", {"estimate_id": "est-0000", "wbs_row_id": "est-0000-wbs-002", "rate": 999}
+        )
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        monkeypatch.setattr(quote_export, "EXPORT_PAGE_SIZE", 3)
+        yield fake
+
+
+def test_csv_export_streams_pages_and_returns_a_link(fake):
+    result = agent_module.export_quote.invoke({"estimate_id": "est-0000"})
+    expected = agent_module.get_project_total.invoke({"estimate_id": "est-0000"})
+
+    assert "error" not in result
+    assert result["rows"] == 7
+    assert result["total_cost"] == expected["total_cost"]
+    assert result["storage_path"].startswith("quote-exports/est-0000/quote-")
+    # WBS rows are read page by page (3 + 3 + 1), not in one request.
+    assert fake.requests[("GET", "estimate_wbs_rows", 200)] == 1 + 3
+
+    download = requests.get(result["download_url"], timeout=5)
+    assert download.headers["Content-Type"] == "text/csv; charset=utf-8"
+    rows = list(csv.reader(io.StringIO(download.text)))
+    assert rows[0] == quote_export.HEADER
+    assert rows[3][0] == "TASK-002" and rows[3][4] == "999.00"
+    assert [line[0] for line in rows[1:8]] == [f"TASK-{idx:03d}" for idx in range(7)]
+    assert rows[8] == []
+    assert rows[9:] == [
+        ["Total Hours", f"{expected['total_hours']:.2f}"],
+        ["Total Cost", f"USD {expected['total_cost']:.2f}"],
+        ["Payment Terms", "Net 30"],
+        ["Delivery Timeline", "Delivery within 8 weeks"],
+    ]
+
+
+def test_xlsx_export_writes_the_same_rows(fake):
+    openpyxl = pytest.importorskip("openpyxl")
+    result = agent_module.export_quote.invoke({"estimate_id": "est-0000", "export_format": "xlsx"})
+
+    workbook = openpyxl.load_workbook(io.BytesIO(requests.get(result["download_url"], timeout=5).content))
+    rows = list(workbook["Quote"].iter_rows(values_only=True))
+    assert list(rows[0]) == quote_export.HEADER
+    assert rows[-2][0] == "Payment Terms"
+    assert len(rows) == 1 + 7 + 1 + 4
+
+
+def test_export_rejects_unknown_formats_and_empty_estimates(fake):
+    assert "Unsupported export format" in agent_module.export_quote.invoke({"estimate_id": "est-0000", "export_format": "pdf"})["error"]
+    assert agent_module.export_quote.invoke({"estimate_id": "est-9999"}) == {"message": "No WBS rows available. Approve a WBS first."}
+    assert not any(key.startswith("quote-exports/est-9999") for key in fake.store.objects)
+
+
+@pytest.mark.parametrize("table", ["estimate_quote", "estimate_quote_rates", "estimate_quote_overrides"])
+def test_a_failed_pricing_read_aborts_the_export(fake, table):
+    fake.fail_tables[table] = 500
+    try:
+        result = agent_module.export_quote.invoke({"estimate_id": "est-0000"})
+    finally:
+        resilience.breakers.clear()
+
+    assert result["error"].startswith("Unable to export quote:")
+    assert not fake.store.objects
+    # Neither the upload nor the signed-URL request (both POSTs) was made.
+    assert not any(method == "POST" for method, _, _ in fake.requests)
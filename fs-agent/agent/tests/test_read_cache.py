@@ -0,0 +1,115 @@
+import asyncio
+import importlib.util
+import json
+import threading
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+import metrics
+import read_cache
+from fake_supabase import FakeSupabase, seed_fixtures
+from read_cache import ReadCache, make_key
+from supabase_client import supabase_request
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_read_cache", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_prefetch_runs_during_the_model_call_and_serves_the_tool(monkeypatch):
+    metrics.reset()
+    with FakeSupabase(latency_ms=20) as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        monkeypatch.setattr(agent_module.response_cache, "ttl_seconds", 0)
+        # The fact sheet would read the same tables (and their version stamps) before the tool does.
+        monkeypatch.setattr(agent_module, "FACT_SHEET_ENABLED", False)
+        result = asyncio.run(
+            agent_module.graph.ainvoke(
+                {
+                    "messages": [HumanMessage(content="roughly how much does this cost by role?")],
+                    "workflow": "estimates",
+                    "entity_id": "est-0000",
+                },
+                {"configurable": {"model_backend": "fake", "fake_latency_ms": 150}},
+            )
+        )
+
+        # get_project_total read every table once: the prefetch did the reading.
+        for table in ("estimate_wbs_rows", "estimate_quote", "estimate_quote_rates", "estimate_quote_overrides"):
+            assert fake.requests[("GET", table, 200)] == 1, table
+
+    assert result["messages"][-1].content
+    hits = sum(metrics.cache_lookups.value(cache="read", result=result, workflow="estimates") for result in ("hit", "inflight"))
+    assert hits == 4
+
+
+def test_only_prefetched_reads_are_cached_and_writes_invalidate():
+    read_cache.read_cache.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1, notes=2)
+        headers = {"apikey": fake.service_role_key, "Authorization": f"Bearer {fake.service_role_key}"}
+        url = f"{fake.url}/rest/v1/contract_notes"
+        params = {"agreement_id": "eq.agr-0000", "select": "note_text"}
+
+        supabase_request("GET", url, params=params, headers=headers)
+        assert len(read_cache.read_cache) == 0
+
+        token = read_cache._filling.set(True)
+        try:
+            prefetched = supabase_request("GET", url, params=params, headers=headers)
+        finally:
+            read_cache._filling.reset(token)
+        assert supabase_request("GET", url, params=dict(reversed(params.items())), headers=headers) is prefetched
+        assert fake.requests[("GET", "contract_notes", 200)] == 2
+
+        supabase_request("POST", url, json={"agreement_id": "agr-0000", "note_text": "new"}, headers=headers)
+        fresh = supabase_request("GET", url, params=params, headers=headers)
+        assert fresh is not prefetched
+        assert len(fresh.json()) == len(prefetched.json()) + 1
+
+
+def test_write_during_prefetch_discards_the_stale_response():
+    cache = ReadCache(ttl_seconds=60)
+    key = make_key("https://x/rest/v1/contract_notes", {"agreement_id": "eq.1"})
+    with cache.fill(key, "contract_notes") as slot:
+        # A concurrent reader waits on the in-flight prefetch rather than deadlocking.
+        reader = threading.Thread(target=cache.get, args=(key, "contract_notes"))
+        reader.start()
+        cache.invalidate("contract_notes")
+        slot.set_result("stale")
+        reader.join()
+
+    assert cache.get(key, "contract_notes") is None
+    assert len(cache) == 0
+
+
+def test_a_later_turn_does_not_see_rows_prefetched_by_an_earlier_one(monkeypatch):
+    monkeypatch.setattr(agent_module, "FAST_PATH_ENABLED", False)
+    agent_module.response_cache.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+
+        def total_hours():
+            result = asyncio.run(
+                agent_module.graph.ainvoke(
+                    {"messages": [HumanMessage(content="what's the project total?")], "workflow": "estimates", "entity_id": "est-0000"},
+                    {"configurable": {"model_backend": "fake", "fake_latency_ms": 50}},
+                )
+            )
+            (tool_message,) = [message for message in result["messages"] if isinstance(message, ToolMessage)]
+            return json.loads(tool_message.content)["total_hours"]
+
+        before = total_hours()
+        # An edit from the web app, between turns.
+        row = fake.store.tables["estimate_wbs_rows"][0]
+        row.update(hours=row["hours"] + 1000, updated_at="2030-01-01T00:00:00Z")
+        assert total_hours() == before + 1000
+
+    assert len(read_cache.read_cache) == 0
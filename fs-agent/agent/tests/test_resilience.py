@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import metrics
+import resilience
+from fake_supabase import FakeSupabase, seed_fixtures
+from supabase_client import supabase_request
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    metrics.reset()
+    resilience.breakers.clear()
+    monkeypatch.setattr(resilience, "RETRY_BASE_SECONDS", 0.001)
+    yield
+    resilience.breakers.clear()
+
+
+def _get(fake, table="estimates"):
+    return supabase_request(
+        "GET", f"{fake.url}/rest/v1/{table}", params={"select": "id"}, headers={"apikey": fake.service_role_key}
+    )
+
+
+def test_transient_read_failures_are_retried():
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=2, agreements=0)
+        fake.transient_failures["estimates"] = 2
+        response = _get(fake)
+
+    assert response.status_code == 200 and len(response.json()) == 2
+    assert fake.requests[("GET", "estimates", 503)] == 2
+    assert metrics.supabase_retries.value(table="estimates", reason="503") == 2
+
+
+def test_writes_are_not_retried():
+    with FakeSupabase() as fake:
+        fake.transient_failures["contract_notes"] = 1
+        response = supabase_request(
+            "POST", f"{fake.url}/rest/v1/contract_notes", json={"agreement_id": "agr-1", "content": "hi"},
+            headers={"apikey": fake.service_role_key},
+        )
+
+    assert response.status_code == 503
+    assert sum(count for (method, _, _), count in fake.requests.items() if method == "POST") == 1
+
+
+def test_breaker_opens_per_table_and_recovers_through_a_probe(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRIES", 0)
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        fake.fail_tables["estimates"] = 500
+        for _ in range(resilience.BREAKER_FAILURES):
+            assert _get(fake).status_code == 500
+        sent = sum(fake.requests.values())
+
+        with pytest.raises(resilience.CircuitOpenError):
+            _get(fake)
+        assert sum(fake.requests.values()) == sent
+        assert _get(fake, "agreements").status_code == 200
+        assert metrics.supabase_breaker_state.value(table="estimates") == 2
+        assert metrics.supabase_breaker_rejections.value(table="estimates") == 1
+
+        breaker = resilience.breakers.get("estimates")
+        breaker.reset_seconds = 0
+        del fake.fail_tables["estimates"]
+        assert _get(fake).status_code == 200
+        assert breaker.state == resilience.CLOSED
+
+
+def test_bulkhead_caps_concurrent_requests(monkeypatch):
+    bulkhead = resilience.Bulkhead(limit=2, wait_seconds=0.05)
+    monkeypatch.setattr(resilience, "bulkhead", bulkhead)
+    errors = []
+
+    def read(fake):
+        try:
+            _get(fake)
+        except requests.RequestException as exc:
+            errors.append(exc)
+
+    with FakeSupabase(latency_ms=300) as fake:
+        threads = [threading.Thread(target=read, args=(fake,)) for _ in range(4)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert time.perf_counter() - started < 1
+    assert len(errors) == 2 and all(isinstance(error, resilience.BulkheadFullError) for error in errors)
+    assert metrics.supabase_bulkhead_rejections.value() == 2
+    assert metrics.supabase_inflight.value() == 0
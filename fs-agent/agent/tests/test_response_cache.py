@@ -0,0 +1,90 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from fake_supabase import FakeSupabase, seed_fixtures
+from response_cache import ResponseCache, turn_is_read_only
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_response_cache", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_cache_serves_answer_until_version_stamp_changes():
+    cache = ResponseCache(ttl_seconds=60, max_entries=10)
+    key = cache.make_key("estimates", "est-1", "Total for this estimate?", "2025-01-01#4")
+    cache.put(key, "USD 10,000")
+
+    same = cache.make_key("estimates", "est-1", "total for this estimate", "2025-01-01#4")
+    assert cache.get(same) == "USD 10,000"
+
+    newer = cache.make_key("estimates", "est-1", "total for this estimate", "2025-01-02#5")
+    assert cache.get(newer) is None
+    assert cache.get(same) is None  # the stale entry was evicted
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 1
+
+
+def test_cache_skips_follow_ups_and_can_be_disabled():
+    cache = ResponseCache(ttl_seconds=60, max_entries=10)
+    assert cache.make_key("estimates", "est-1", "and what about QA?", "v1") is None
+    assert cache.make_key("estimates", "est-1", "total?", None) is None
+
+    disabled = ResponseCache(ttl_seconds=0, max_entries=10)
+    assert not disabled.enabled
+
+
+def test_turn_is_read_only_rejects_mutating_tools():
+    read_turn = [
+        HumanMessage(content="total?"),
+        AIMessage(content="", tool_calls=[{"name": "get_project_total", "args": {}, "id": "1"}]),
+        ToolMessage(content="{}", tool_call_id="1"),
+    ]
+    write_turn = [
+        HumanMessage(content="add a note"),
+        AIMessage(content="", tool_calls=[{"name": "add_agreement_note", "args": {}, "id": "1"}]),
+    ]
+    assert turn_is_read_only(read_turn)
+    assert not turn_is_read_only(write_turn)
+
+
+def test_intent_router_serves_cached_answer(monkeypatch):
+    async def fake_stamp(_workflow, _entity_id):
+        return "v1"
+
+    monkeypatch.setattr(agent_module, "fetch_entity_version_stamp", fake_stamp)
+    agent_module.response_cache.clear()
+    key = agent_module.response_cache.make_key("contracts", "agr-1", "who is the counterparty", "v1")
+    agent_module.response_cache.put(key, "Acme Corp")
+
+    state = {
+        "messages": [HumanMessage(content="Who is the counterparty?")],
+        "workflow": "contracts",
+        "entity_id": "agr-1",
+    }
+    command = asyncio.run(agent_module.intent_router(state, {}))
+
+    assert command.goto == agent_module.END
+    assert command.update["messages"][0].content == "Acme Corp"
+
+
+def test_uploading_an_artifact_changes_the_estimate_stamp(monkeypatch):
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        before = asyncio.run(agent_module.fetch_entity_version_stamp("estimates", "est-0000"))
+        with fake.store.lock:
+            fake.store.tables.setdefault("estimate_artifacts", []).append(
+                {"id": "art-1", "estimate_id": "est-0000", "filename": "rfp.pdf", "size_bytes": 10, "created_at": "2025-02-01T00:00:00Z"}
+            )
+        after = asyncio.run(agent_module.fetch_entity_version_stamp("estimates", "est-0000"))
+
+    assert before is not None and after is not None
+    assert before != after
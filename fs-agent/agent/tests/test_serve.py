@@ -0,0 +1,86 @@
+import asyncio
+import json
+import sys
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+
+import serve
+from fake_supabase import FakeSupabase, seed_fixtures
+
+
+def _use_fake_backends(monkeypatch, fake):
+    import agent
+
+    # The module serve.create_app compiles (agent.py, or agent/agent.py when imported as a package).
+    agent_module = sys.modules[agent.chat_node.__module__]
+    monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+    monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+    monkeypatch.setenv("COPILOT_MODEL_BACKEND", "fake")
+    agent_module.response_cache.clear()
+    return agent_module
+
+
+def test_conversation_survives_a_restart(tmp_path, monkeypatch):
+    db = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "thread-1", "model_backend": "fake"}}
+
+    async def turn(question):
+        # Every call opens a fresh checkpointer and graph, like a new worker process would.
+        async with serve.open_checkpointer(db) as checkpointer:
+            graph = agent_module.workflow.compile(checkpointer=checkpointer)
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content=question)], "workflow": "estimates", "entity_id": "est-0000"},
+                config,
+            )
+            return (await graph.aget_state(config)).values
+
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        agent_module = _use_fake_backends(monkeypatch, fake)
+        first = asyncio.run(turn("roughly how much does this cost by role?"))
+        second = asyncio.run(turn("what stage is this estimate in?"))
+
+    assert len(second["messages"]) > len(first["messages"])
+    assert second["messages"][0].content == "roughly how much does this cost by role?"
+    assert second["entity_id"] == "est-0000"
+
+
+def test_agui_endpoint_streams_a_persisted_run(tmp_path, monkeypatch):
+    db = str(tmp_path / "checkpoints.sqlite")
+    body = {
+        "threadId": "thread-agui",
+        "runId": "run-1",
+        "state": {"workflow": "estimates", "entity_id": "est-0000"},
+        "messages": [{"id": "m1", "role": "user", "content": "roughly how much does this cost by role?"}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        _use_fake_backends(monkeypatch, fake)
+        with TestClient(serve.create_app(db)) as client:
+            response = client.post("/", json=body, headers={"accept": "text/event-stream"})
+            assert client.get("/live").status_code == 200
+            assert "copilot_node_duration_seconds" in client.get("/metrics").text
+
+    assert response.status_code == 200
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    types = [event["type"] for event in events]
+    assert types[0] == "RUN_STARTED" and types[-1] == "RUN_FINISHED"
+
+    async def stored_messages():
+        async with serve.open_checkpointer(db) as checkpointer:
+            state = await checkpointer.aget({"configurable": {"thread_id": "thread-agui"}})
+            return state["channel_values"]["messages"]
+
+    assert len(asyncio.run(stored_messages())) >= 2
+
+
+def test_request_config_forwards_copilot_headers():
+    class FakeRequest:
+        headers = {"x-copilot-profile": "1", "authorization": "secret"}
+
+    assert serve.request_config(FakeRequest()) == {"configurable": {"x-copilot-profile": "1"}}
+    assert serve.is_postgres_url("postgresql://db/agent") and not serve.is_postgres_url("checkpoints.sqlite")
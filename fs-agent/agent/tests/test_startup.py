@@ -0,0 +1,90 @@
+import importlib.util
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import startup
+import webapp
+from fake_supabase import FakeSupabase, seed_fixtures
+from startup import Readiness
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_startup", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def _refused():
+    raise ConnectionError("refused")
+
+
+def test_optional_step_failures_do_not_block_readiness():
+    readiness = Readiness()
+    readiness.register("schemas", lambda: 3)
+    readiness.register("llm", lambda: 1 / 0, required=False)
+    assert readiness.run()
+    report = readiness.report()
+    assert report["status"] == "ready"
+    assert report["steps"]["schemas"]["detail"] == 3
+    assert report["steps"]["llm"]["status"] == "error"
+
+    readiness.register("pool", _refused)
+    assert not readiness.run()
+    assert readiness.report()["status"] == "failed"
+
+
+def test_failed_required_steps_are_retried_until_ready(monkeypatch):
+    monkeypatch.setattr(startup, "WARM_STARTUP_ENABLED", True)
+    monkeypatch.setattr(startup, "WARM_RETRY_SECONDS", 0.01)
+    calls = {"schemas": 0, "pool": 0}
+
+    def schemas():
+        calls["schemas"] += 1
+        return 3
+
+    def pool():
+        calls["pool"] += 1
+        if calls["pool"] < 3:
+            _refused()
+        return "warm"
+
+    readiness = Readiness()
+    readiness.register("schemas", schemas)
+    readiness.register("pool", pool)
+    readiness.start()
+
+    assert readiness.wait(timeout=5)
+    report = readiness.report()
+    assert report["status"] == "ready"
+    assert report["steps"]["pool"]["status"] == "ok"
+    assert report["steps"]["pool"]["attempts"] == 3
+    assert calls == {"schemas": 1, "pool": 3}
+
+
+def test_ready_route_gates_on_warm_up(monkeypatch):
+    readiness = Readiness()
+    readiness.register("slow", lambda: "done")
+    monkeypatch.setattr(webapp, "readiness", readiness)
+    client = TestClient(webapp.app)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/live").status_code == 200
+    readiness.run()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["steps"]["slow"]["status"] == "ok"
+
+
+def test_agent_warm_up_opens_supabase_pool(monkeypatch):
+    monkeypatch.setenv("COPILOT_SUPABASE_WARM_CONNECTIONS", "3")
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        assert agent_module.warm_supabase_pool()["connections"] == 3
+        assert fake.requests[("GET", "estimates", 200)] == 3
+
+    assert len(agent_module.backend_tool_schemas()) == len(agent_module.backend_tools)
+    assert agent_module.warm_templates()["sow_chars"] > 0
+    assert startup.readiness.report()["status"] == "ready"  # warm-up disabled under test
@@ -0,0 +1,145 @@
+import asyncio
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.errors import GraphRecursionError
+
+import metrics
+import read_cache
+import tracing
+from fake_supabase import FakeSupabase, seed_fixtures
+from supabase_client import table_of
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_tracing", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_span_is_noop_when_tracing_is_off():
+    tracing.set_exporter(None)
+    with tracing.span("anything", table="x") as span:
+        span.set(status=200)
+    assert span is tracing.NOOP_SPAN
+    assert tracing.current_span() is tracing.NOOP_SPAN
+
+
+def test_table_of_parses_rest_rpc_and_storage_urls():
+    assert table_of("https://x.supabase.co/rest/v1/contract_notes?select=id") == "contract_notes"
+    assert table_of("https://x.supabase.co/rest/v1/rpc/allocate_version") == "allocate_version"
+    assert table_of("https://x.supabase.co/storage/v1/object/public/exemplars/msa.pdf") == "exemplars"
+
+
+def test_turn_spans_share_trace_and_thread_ids(tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces.jsonl"
+    tracing.set_exporter(tracing.JsonlExporter(str(trace_file)))
+    try:
+        with FakeSupabase() as fake:
+            seed_fixtures(fake.store, estimates=1, agreements=1)
+            monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+            monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+            monkeypatch.setattr(agent_module.response_cache, "ttl_seconds", 0)
+            # Reads should happen (and nest) under the tool span, not the chat_node prefetch.
+            monkeypatch.setattr(read_cache, "PREFETCH_ENABLED", False)
+            asyncio.run(
+                agent_module.graph.ainvoke(
+                    {
+                        "messages": [HumanMessage(content="roughly how much does this cost by role?")],
+                        "workflow": "estimates",
+                        "entity_id": "est-0000",
+                    },
+                    {"configurable": {"model_backend": "fake", "thread_id": "thread-42"}},
+                )
+            )
+    finally:
+        tracing.set_exporter(None)
+
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    names = [span["name"] for span in spans]
+    assert {"intent_router", "chat_node", "tool_node", "tool", "supabase"} <= set(names)
+    assert len({span["trace_id"] for span in spans}) == 1
+    assert {span["thread_id"] for span in spans} == {"thread-42"}
+
+    by_id = {span["span_id"]: span for span in spans}
+    tool_span = next(span for span in spans if span["name"] == "tool")
+    assert tool_span["attributes"]["tool"] == "get_project_total"
+    assert by_id[tool_span["parent_id"]]["name"] == "tool_node"
+
+    db_spans = [span for span in spans if span["name"] == "supabase" and span["parent_id"] == tool_span["span_id"]]
+    assert {span["attributes"]["table"] for span in db_spans} >= {"estimate_wbs_rows", "estimate_quote"}
+    assert all(span["attributes"]["method"] == "GET" and span["attributes"]["status"] == 200 for span in db_spans)
+    assert all(span["attributes"]["bytes"] > 0 for span in db_spans)
+
+    chat_span = next(span for span in spans if span["name"] == "chat_node")
+    assert chat_span["attributes"]["tool_calls"] == ["get_project_total"]
+    assert chat_span["attributes"]["input_tokens"] > 0
+
+
+def test_otlp_payload_shape():
+    tracing.set_exporter(tracing.JsonlExporter("/dev/null"))
+    try:
+        with tracing.span("outer", thread_id="t-1") as outer:
+            with tracing.span("inner", table="estimates", status=200) as inner:
+                inner.event("retry", attempt=1)
+    finally:
+        tracing.set_exporter(None)
+
+    payload = tracing.OtlpExporter.payload([outer, inner])
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert spans[0]["traceId"] == spans[1]["traceId"] and len(spans[0]["traceId"]) == 32
+    attributes = {item["key"]: item["value"] for item in spans[1]["attributes"]}
+    assert attributes["status"] == {"intValue": "200"}
+    assert attributes["thread_id"] == {"stringValue": "t-1"}
+    assert spans[1]["events"][0]["name"] == "retry"
+
+
+LOOPING_SCRIPT = [{"steps": [{"tool_calls": [{"name": "get_project_total", "args": {"estimate_id": "est-1"}}]}] * 20}]
+
+
+def _looping_turn(config):
+    state = {"messages": [HumanMessage(content="what is the total?")], "workflow": "estimates", "entity_id": "est-1"}
+    return state, {"configurable": {"model_backend": "fake", "fake_script": LOOPING_SCRIPT, **config}}
+
+
+def test_turn_guard_ends_a_turn_that_hit_the_recursion_limit(monkeypatch):
+    monkeypatch.setattr(agent_module, "FAST_PATH_ENABLED", False)
+    metrics.reset()
+    state, config = _looping_turn({})
+
+    async def run():
+        with tracing.turn_guard():
+            await agent_module.graph.ainvoke(state, {**config, "recursion_limit": 4})
+
+    with pytest.raises(GraphRecursionError):
+        asyncio.run(run())
+
+    assert metrics.turns.active() == 0
+    assert metrics.turn_duration.snapshot(workflow="estimates", status="error")["count"] == 1
+
+
+def test_turn_guard_ends_a_cancelled_stream(monkeypatch):
+    monkeypatch.setattr(agent_module, "FAST_PATH_ENABLED", False)
+    metrics.reset()
+    state, config = _looping_turn({"fake_latency_ms": 50})
+
+    async def stream(first_update):
+        with tracing.turn_guard():
+            async for _ in agent_module.graph.astream(state, config, stream_mode="updates"):
+                first_update.set()
+
+    async def main():
+        first_update = asyncio.Event()
+        task = asyncio.create_task(stream(first_update))
+        await asyncio.wait_for(first_update.wait(), 10)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    assert metrics.turns.active() == 0
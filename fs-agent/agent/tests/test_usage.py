@@ -0,0 +1,106 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import usage
+from fake_supabase import FakeSupabase, seed_fixtures
+from webapp import app
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_usage", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def test_merge_usage_sums_nested_totals():
+    left = usage.model_call_usage("estimates", 100, 20, 0.5, 0.01)
+    right = usage.tool_call_usage("estimates", [{"tool": "generate_wbs", "seconds": 1.5, "result": "x" * 400}])
+    merged = usage.merge_usage(usage.merge_usage(left, right), left)
+
+    assert merged["input_tokens"] == 200
+    assert merged["model_calls"] == 2
+    assert merged["workflows"]["estimates"]["tool_calls"] == 1
+    assert merged["tools"]["generate_wbs"] == {"calls": 1, "seconds": 1.5, "result_tokens": 100, "errors": 0}
+    assert usage.thread_tokens(merged) == 240
+
+
+def test_compact_history_keeps_whole_recent_turns():
+    messages = []
+    for idx in range(5):
+        messages += [HumanMessage(content=f"question {idx} " + "word " * 200), AIMessage(content="answer " * 50)]
+    messages.append(HumanMessage(content="latest"))
+
+    kept = usage.compact_history(messages, keep_tokens=700)
+
+    assert isinstance(kept[0], HumanMessage)
+    assert kept[-1].content == "latest"
+    assert 1 < len(kept) < len(messages)
+    assert usage.compact_history(messages, keep_tokens=0) == [messages[-1]]
+
+
+def test_thread_usage_is_checkpointed_and_reported(monkeypatch):
+    usage.ledger.clear()
+    graph = agent_module.workflow.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "usage-thread", "model_backend": "fake"}}
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, estimates=1, agreements=1)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        monkeypatch.setattr(agent_module.response_cache, "ttl_seconds", 0)
+        for _ in range(2):
+            asyncio.run(
+                graph.ainvoke(
+                    {
+                        "messages": [HumanMessage(content="roughly how much does this cost by role?")],
+                        "workflow": "estimates",
+                        "entity_id": "est-0000",
+                    },
+                    config,
+                )
+            )
+
+    totals = graph.get_state(config).values["usage"]
+    assert totals["model_calls"] == 4
+    assert totals["tool_calls"] == 2
+    assert totals["tools"]["get_project_total"]["result_tokens"] > 0
+    assert totals["workflows"]["estimates"]["input_tokens"] == totals["input_tokens"] > 0
+
+    report = TestClient(app).get("/usage").json()
+    assert report["totals"]["model_calls"] == 4
+    assert list(report["tools"]) == ["get_project_total"]
+    assert report["threads"][0]["thread_id"] == "usage-thread"
+
+
+def test_exhausted_budget_drops_expensive_tools_and_compacts_history(monkeypatch):
+    monkeypatch.setenv("COPILOT_THREAD_TOKEN_BUDGET_ESTIMATES", "1000")
+    calls = []
+
+    async def call_model(tier, config, tools, messages):
+        calls.append((tools, messages))
+        return AIMessage(content="Done.", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}), 0.01
+
+    monkeypatch.setattr(agent_module, "call_model", call_model)
+    history = [
+        HumanMessage(content="old question " + "word " * 4000),
+        AIMessage(content="old answer"),
+        HumanMessage(content="generate the wbs again"),
+    ]
+    state = {
+        "messages": history,
+        "workflow": "estimates",
+        "usage": usage.model_call_usage("estimates", 1500, 100, 1.0, 0.0),
+    }
+    result = asyncio.run(agent_module.chat_node(state, {"configurable": {}}))
+
+    tools, messages = calls[0]
+    names = {agent_module._tool_name(tool) for tool in tools}
+    assert "generate_wbs" not in names and "get_project_total" in names
+    assert usage.BUDGET_EXHAUSTED_NOTE in messages[0].content
+    assert messages[1:] == history[-1:]
+    assert result.update["usage"]["model_calls"] == 2
+    assert not any(isinstance(message, ToolMessage) for message in messages)
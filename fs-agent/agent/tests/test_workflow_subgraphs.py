@@ -0,0 +1,72 @@
+import asyncio
+import importlib.util
+import json
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_subgraphs", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+def _tool_names(scope):
+    return {schema["function"]["name"] for schema in agent_module.backend_tool_schemas(scope)}
+
+
+def test_each_workflow_binds_a_smaller_tool_set():
+    assert _tool_names("global") == set(agent_module.backend_tool_names)
+    assert "generate_wbs" not in _tool_names("contracts")
+    assert "summarize_pushbacks" not in _tool_names("estimates")
+    global_size = len(json.dumps(agent_module.backend_tool_schemas("global")))
+    for scope in ("estimates", "contracts"):
+        assert len(json.dumps(agent_module.backend_tool_schemas(scope))) < global_size
+
+    assert agent_module.tool_scope("contracts") == "contracts"
+    assert agent_module.tool_scope(None) == "global"
+    assert agent_module.tool_scope("policies") == "global"
+
+
+def _run(workflow, question, script):
+    async def collect():
+        namespaces = []
+        async for namespace, _ in agent_module.graph.astream(
+            {"messages": [HumanMessage(content=question)], "workflow": workflow},
+            {"configurable": {"model_backend": "fake", "fake_script": script}},
+            stream_mode="updates",
+            subgraphs=True,
+        ):
+            namespaces.append(namespace)
+        return namespaces
+
+    return asyncio.run(collect())
+
+
+def test_router_dispatches_to_the_workflow_subgraph():
+    script = [{"steps": [{"content": "Hello."}]}]
+    for workflow, scope in (("contracts", "contracts"), ("estimates", "estimates"), (None, "global")):
+        namespaces = _run(workflow, "hello there", script)
+        inner = {namespace[0].split(":")[0] for namespace in namespaces if namespace}
+        assert inner == {scope}
+
+
+def test_out_of_scope_tool_call_is_rejected_by_the_subgraph():
+    script = [
+        {
+            "steps": [
+                {"tool_calls": [{"name": "generate_wbs", "args": {"estimate_id": "est-1"}}]},
+                {"content": "That is not available here."},
+            ]
+        }
+    ]
+    result = asyncio.run(
+        agent_module.graph.ainvoke(
+            {"messages": [HumanMessage(content="build a wbs")], "workflow": "contracts"},
+            {"configurable": {"model_backend": "fake", "fake_script": script}},
+        )
+    )
+    tool_message = next(message for message in result["messages"] if isinstance(message, ToolMessage))
+    assert tool_message.status == "error"
+    assert "generate_wbs" in tool_message.content
@@ -0,0 +1,196 @@
+import importlib.util
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import metrics
+import pushback_summaries
+import write_behind
+from fake_supabase import FakeSupabase, seed_fixtures
+from write_behind import WriteBehindQueue
+
+AGENT_PATH = Path(__file__).resolve().parents[1] / "agent.py"
+spec = importlib.util.spec_from_file_location("copilot_agent_write_behind", AGENT_PATH)
+agent_module = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(agent_module)  # type: ignore[arg-type]
+
+
+class Recorder:
+    def __init__(self, fail: int = 0):
+        self.batches = []
+        self.fail = fail
+        self.sent = threading.Event()
+
+    def __call__(self, rows):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("backend down")
+        self.batches.append(rows)
+        self.sent.set()
+
+
+def test_queue_flushes_in_bulk_by_size_and_by_interval():
+    metrics.reset()
+    by_size = Recorder()
+    queue = WriteBehindQueue("by_size", by_size, batch_size=3, flush_seconds=60)
+    for idx in range(3):
+        assert queue.enqueue({"n": idx}, key="a")
+    assert by_size.sent.wait(5)
+    assert by_size.batches == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+    assert metrics.write_queue_flushed.value(queue="by_size", trigger="size") == 3
+
+    by_time = Recorder()
+    queue = WriteBehindQueue("by_time", by_time, batch_size=100, flush_seconds=0.05)
+    queue.enqueue({"n": 1})
+    queue.enqueue({"n": 2})
+    assert by_time.sent.wait(5)
+    assert by_time.batches == [[{"n": 1}, {"n": 2}]]
+    assert metrics.write_queue_depth.value(queue="by_time") == 0
+
+
+def test_keyed_flush_sends_only_that_keys_rows():
+    send = Recorder()
+    queue = WriteBehindQueue("keyed", send, batch_size=100, flush_seconds=60)
+    queue.enqueue({"n": 1}, key="a")
+    queue.enqueue({"n": 2}, key="b")
+
+    assert queue.flush("a") == 1
+    assert send.batches == [[{"n": 1}]]
+    assert queue.pending() == queue.pending("b") == 1
+
+
+def test_full_queue_drops_and_close_spools_unsent_rows(tmp_path):
+    metrics.reset()
+    failing = Recorder(fail=10)
+    queue = WriteBehindQueue("spooled", failing, batch_size=100, flush_seconds=60, max_pending=2, spool_dir=str(tmp_path))
+    assert queue.enqueue({"n": 1}, key="a") and queue.enqueue({"n": 2}, key="a")
+    assert not queue.enqueue({"n": 3}, key="a")
+    assert metrics.write_queue_dropped.value(queue="spooled", reason="full") == 1
+
+    queue.close()
+    assert not queue.enqueue({"n": 4})
+    assert metrics.write_queue_flush_failures.value(queue="spooled") == 1
+    assert (tmp_path / "spooled.jsonl").exists()
+
+    send = Recorder()
+    restarted = WriteBehindQueue("spooled", send, batch_size=100, flush_seconds=60, spool_dir=str(tmp_path))
+    assert not (tmp_path / "spooled.jsonl").exists()
+    restarted.close()
+    assert send.batches == [[{"n": 1}, {"n": 2}]]
+    assert metrics.write_queue_flushed.value(queue="spooled", trigger="shutdown") == 2
+
+
+def test_only_one_starting_worker_requeues_the_spool(tmp_path, monkeypatch):
+    def slow_loads(line):
+        time.sleep(0.02)  # widen the window between reading the spool and removing it
+        return json.loads(line)
+
+    monkeypatch.setattr(write_behind, "json", SimpleNamespace(loads=slow_loads, dumps=json.dumps))
+    (tmp_path / "claimed.jsonl").write_text(
+        "".join(json.dumps({"key": "a", "row": {"n": n}}) + "\n" for n in range(3)), encoding="utf-8"
+    )
+    barrier = threading.Barrier(8)
+    queues, errors = [], []
+
+    def start():
+        barrier.wait()
+        try:
+            queues.append(WriteBehindQueue("claimed", Recorder(), batch_size=100, flush_seconds=60, spool_dir=str(tmp_path)))
+        except Exception as exc:  # pragma: no cover - the failure this test guards against
+            errors.append(exc)
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(queue.pending() for queue in queues) == [0] * 7 + [3]
+    assert list(tmp_path.iterdir()) == []
+    for queue in queues:
+        queue.close()
+
+
+def test_system_notes_are_batched_and_user_notes_are_sent_at_once(monkeypatch):
+    pushback_summaries.summaries.clear()
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, agreements=1, notes=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        monkeypatch.setattr(agent_module.note_queue, "flush_seconds", 60)
+
+        for note in ("Client wants Net 45.", "Legal reviewing the cap."):
+            result = agent_module.add_agreement_note.invoke({"agreement_id": "agr-0000", "note": note})
+            assert result["message"] == "Note added to agreement agr-0000"
+        assert len(fake.store.tables["contract_notes"]) == 2
+        agent_module.add_system_note("agr-0000", "Copilot applied proposals prop-1.")
+        agent_module.add_system_note("agr-0000", "Copilot applied proposals prop-2.")
+        assert len(fake.store.tables["contract_notes"]) == 2
+
+        summary = agent_module.summarize_pushbacks.invoke({"agreement_id": "agr-0000"})
+
+    assert summary["note_count"] == 4
+    assert "Client wants Net 45." in summary["summary"]
+    assert fake.requests[("POST", "contract_notes", 201)] == 3
+    assert agent_module.note_queue.pending() == 0
+
+
+def test_a_rejected_user_note_is_reported(monkeypatch):
+    with FakeSupabase() as fake:
+        seed_fixtures(fake.store, agreements=1, notes=0)
+        monkeypatch.setattr(agent_module, "SUPABASE_URL", fake.url)
+        monkeypatch.setattr(agent_module, "SUPABASE_SERVICE_ROLE_KEY", fake.service_role_key)
+        fake.fail_tables["contract_notes"] = 409
+        result = agent_module.add_agreement_note.invoke({"agreement_id": "agr-0000", "note": "Client wants Net 45."})
+
+    assert result["error"].startswith("Unable to add note:")
+    assert agent_module.note_queue.pending() == 0
+
+
+class Rejected(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status})()
+
+
+def test_a_rejected_row_is_dead_lettered_without_blocking_the_queue(tmp_path):
+    metrics.reset()
+    batches = []
+
+    def send(rows):
+        if any(row.get("bad") for row in rows):
+            # e.g. a note on an agreement deleted since it was queued: 409 foreign key violation.
+            raise Rejected(409)
+        batches.append(rows)
+
+    queue = WriteBehindQueue("rejecting", send, batch_size=100, flush_seconds=0.05, spool_dir=str(tmp_path))
+    queue.enqueue({"n": 0, "bad": True}, key="deleted")
+    for idx in range(1, 21):
+        queue.enqueue({"n": idx}, key=f"agr-{idx % 2}")
+
+    deadline = time.monotonic() + 5
+    while sum(map(len, batches)) < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.close()
+
+    assert queue.pending() == 0
+    assert sorted(row["n"] for batch in batches for row in batch) == list(range(1, 21))
+    assert metrics.write_queue_dropped.value(queue="rejecting", reason="rejected") == 1
+    assert metrics.write_queue_flush_failures.value(queue="rejecting") == 0
+    (dead_letter,) = (tmp_path / "rejecting.rejected.jsonl").read_text().splitlines()
+    assert json.loads(dead_letter)["row"] == {"n": 0, "bad": True}
+
+
+def test_server_errors_keep_the_rows_queued():
+    queue = WriteBehindQueue("unavailable", lambda rows: _raise(Rejected(503)), batch_size=100, flush_seconds=60)
+    queue.enqueue({"n": 1})
+    assert queue.flush() == 0
+    assert queue.pending() == 1
+
+
+def _raise(exc):
+    raise exc
@@ -0,0 +1,545 @@
+"""
+Structured tracing for the copilot graph.
+
+Spans cover each graph node (intent_router, chat_node, tool_node), each tool
+invocation and each Supabase HTTP call. Every span carries the turn's trace id
+and the LangGraph thread id, so one copilot conversation can be followed end to
+end. Tracing is off unless `COPILOT_TRACE_EXPORTER` is set:
+
+- "jsonl": append one JSON object per finished span to `COPILOT_TRACE_FILE`.
+- "otlp": batch spans to an OpenTelemetry collector over OTLP/HTTP JSON
+  (`COPILOT_OTLP_ENDPOINT`, default http://localhost:4318).
+
+When tracing is off, `span()` returns a shared no-op object and nothing is timed,
+allocated or exported. The node and tool wrappers at the bottom also feed the
+always-on counters in metrics.py.
+"""
+
+import asyncio
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from langgraph.graph import END
+from langgraph.prebuilt import ToolNode
+
+import cassette
+import deadlines
+import memory_diagnostics
+import metrics
+import profiling
+import read_cache
+import usage
+
+TRACE_EXPORTER = os.environ.get("COPILOT_TRACE_EXPORTER", "").lower()
+TRACE_FILE = os.environ.get("COPILOT_TRACE_FILE", "copilot-traces.jsonl")
+OTLP_ENDPOINT = os.environ.get("COPILOT_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.environ.get("COPILOT_TRACE_SERVICE", "copilot-agent")
+
+# (trace_id, span_id, thread_id) of the innermost open span.
+_context: ContextVar[Optional[Tuple[str, str, Optional[str]]]] = ContextVar("copilot_trace_context", default=None)
+_current: ContextVar[Optional["Span"]] = ContextVar("copilot_current_span", default=None)
+# Tool calls made by the running tool_node step, for its usage delta.
+_tool_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("copilot_tool_calls", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def thread_id_of(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    configurable = (config or {}).get("configurable") or {}
+    thread_id = configurable.get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+class _NoopSpan:
+    """
+    Stand-in returned by span() while tracing is off.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def event(self, name: str, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "thread_id", "attributes", "events",
+        "status", "error", "start_ns", "end_ns", "_started", "_tokens",
+    )
+
+    def __init__(self, name: str, trace_id: Optional[str], thread_id: Optional[str], attributes: Dict[str, Any]):
+        parent = _context.get()
+        self.name = name
+        self.trace_id = trace_id or (parent[0] if parent else new_trace_id())
+        self.thread_id = thread_id or (parent[2] if parent else None)
+        # A span that opens a different trace starts a new tree.
+        self.parent_id = parent[1] if parent and parent[0] == self.trace_id else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self._started = 0.0
+        self._tokens = None
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self._tokens = (
+            _context.set((self.trace_id, self.span_id, self.thread_id)),
+            _current.set(self),
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        self.end_ns = self.start_ns + int(duration * 1e9)
+        context_token, current_token = self._tokens
+        _current.reset(current_token)
+        _context.reset(context_token)
+        if exc is not None:
+            self.status = "error"
+            self.error = f"{type(exc).__name__}: {exc}"
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(self)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread_id": self.thread_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class JsonlExporter:
+    """
+    Append finished spans to a JSON-lines file, one object per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+
+    def flush(self):
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OtlpExporter:
+    """
+    Batch spans to an OpenTelemetry collector over OTLP/HTTP with JSON encoding.
+    A daemon thread posts a batch every `interval` seconds or once `batch_size`
+    spans are queued; spans that do not fit in `max_queue` are dropped.
+    """
+
+    def __init__(self, endpoint: str, interval: float = 2.0, batch_size: int = 256, max_queue: int = 8192):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="copilot-otlp-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            if len(self._queue) >= self.batch_size:
+                self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._queue = self._queue, []
+        if not batch:
+            return
+        try:
+            requests.post(self.url, json=self.payload(batch), timeout=5)
+        except Exception:
+            # Telemetry must never break the agent; the batch is lost.
+            self.dropped += len(batch)
+
+    @staticmethod
+    def payload(spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "copilot"},
+                            "spans": [
+                                {
+                                    "traceId": span.trace_id,
+                                    "spanId": span.span_id,
+                                    "parentSpanId": span.parent_id or "",
+                                    "name": span.name,
+                                    "kind": 1,
+                                    "startTimeUnixNano": str(span.start_ns),
+                                    "endTimeUnixNano": str(span.end_ns),
+                                    "attributes": _otlp_attributes(
+                                        {**span.attributes, "thread_id": span.thread_id, "error": span.error}
+                                    ),
+                                    "events": [
+                                        {
+                                            "name": event["name"],
+                                            "timeUnixNano": str(event["time_ns"]),
+                                            "attributes": _otlp_attributes(event["attributes"]),
+                                        }
+                                        for event in span.events
+                                    ],
+                                    "status": {"code": 2 if span.status == "error" else 1},
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def _exporter_from_env():
+    if TRACE_EXPORTER == "jsonl":
+        return JsonlExporter(TRACE_FILE)
+    if TRACE_EXPORTER == "otlp":
+        return OtlpExporter(OTLP_ENDPOINT)
+    if TRACE_EXPORTER:
+        raise ValueError(f"Unknown COPILOT_TRACE_EXPORTER {TRACE_EXPORTER!r}; expected 'jsonl' or 'otlp'.")
+    return None
+
+
+_exporter = _exporter_from_env()
+
+
+def set_exporter(exporter) -> None:
+    """
+    Replace the active exporter (None turns tracing off). Used by tests and tools
+    that want spans without going through the environment.
+    """
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def span(name: str, trace_id: Optional[str] = None, thread_id: Optional[str] = None, **attributes):
+    """
+    Open a span as a context manager. Nested spans inherit the trace and thread
+    ids of the enclosing span, including across `asyncio.to_thread` and the
+    executors LangChain uses for sync tools (both copy contextvars).
+    """
+    if _exporter is None:
+        return NOOP_SPAN
+    return Span(name, trace_id, thread_id, attributes)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def event(name: str, **attributes) -> None:
+    """
+    Record a point-in-time event on the current span. In development the event is
+    also printed, replacing the ad-hoc `[Copilot]` log lines.
+    """
+    current_span().event(name, **attributes)
+    if os.environ.get("ENVIRONMENT") == "development":
+        details = " ".join(f"{key}={value}" for key, value in attributes.items())
+        print(f"[Copilot][{name}] {details}")
+
+
+def traced_node(name: str, starts_turn: bool = False):
+    """
+    Instrument an async graph node `(state, config)`: a span carrying the turn's
+    trace id (from state) and the thread id (from config), plus node latency,
+    token and turn metrics labelled by the state's workflow.
+
+    The entry node passes `starts_turn=True`; it then receives a freshly minted
+    `trace_id` and the turn's `deadline` in its state and must write both back in
+    its update. A turn ends when a node returns a Command that routes to END (or
+    raises), or else when the enclosing `turn_guard()` exits. The node runs
+    inside the state's deadline (see deadlines.py).
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(state, config):
+            if starts_turn:
+                state = {**state, "trace_id": new_trace_id(), "deadline": deadlines.turn_deadline(config)}
+            trace_id = state.get("trace_id")
+            workflow = state.get("workflow")
+            if starts_turn:
+                begin_turn(trace_id, workflow, config)
+                cassette.begin_turn(trace_id, state, config)
+            workflow_token = metrics.set_workflow(workflow)
+            memory_diagnostics.record_state(thread_id_of(config), state)
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                with span(name, trace_id=trace_id, thread_id=thread_id_of(config)):
+                    with (
+                        deadlines.deadline_scope(state.get("deadline")),
+                        read_cache.turn_scope(trace_id),
+                        cassette.turn_scope(trace_id),
+                    ):
+                        result = await func(state, config)
+            except BaseException:
+                status = "error"
+                end_turn(trace_id, status="error")
+                raise
+            finally:
+                metrics.node_duration.observe(time.perf_counter() - started, node=name, status=status)
+                metrics.reset_workflow(workflow_token)
+            _record_turn_progress(trace_id, workflow, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _record_turn_progress(trace_id: Optional[str], workflow: Optional[str], result: Any) -> None:
+    update = getattr(result, "update", None) or {}
+    for message in update.get("messages", []) if isinstance(update, dict) else []:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+            model = (getattr(message, "response_metadata", None) or {}).get("model_name", "unknown")
+            metrics.turns.add_tokens(trace_id, input_tokens, output_tokens)
+            metrics.llm_tokens.inc(input_tokens, direction="input", model=model, workflow=workflow or "none")
+            metrics.llm_tokens.inc(output_tokens, direction="output", model=model, workflow=workflow or "none")
+    if getattr(result, "goto", None) == END:
+        end_turn(trace_id)
+
+
+_guarded_turns: ContextVar[Optional[List[str]]] = ContextVar("copilot_guarded_turns", default=None)
+
+
+def begin_turn(trace_id: str, workflow: Optional[str], config: Optional[Dict[str, Any]]) -> None:
+    guarded = _guarded_turns.get()
+    if guarded is not None:
+        guarded.append(trace_id)
+    metrics.turns.begin(trace_id, workflow)
+    if profiling.profile_requested(config):
+        profiling.profiler.start(trace_id)
+
+
+def end_turn(trace_id: Optional[str], status: str = "ok") -> None:
+    metrics.turns.end(trace_id, status=status)
+    read_cache.read_cache.discard_turn(trace_id)
+    recorded = cassette.end_turn(trace_id, status)
+    if recorded:
+        event("cassette_recorded", trace_id=trace_id, path=recorded)
+    if profiling.profiler.active:
+        path = profiling.profiler.stop(trace_id)
+        if path:
+            event("profile_written", trace_id=trace_id, path=path)
+
+
+@contextmanager
+def turn_guard() -> Iterator[List[str]]:
+    """
+    Wrap one graph run (`ainvoke`, `astream`, an AG-UI stream). Turns it began
+    that no node ended, because the run hit the recursion limit, was cancelled
+    between nodes or stopped at an interrupt, are ended on exit with status
+    "error", "cancelled" or "ok", which releases the in-flight gauge, the
+    turn's read-cache entries, cassette and profile.
+    """
+    guarded: List[str] = []
+    token = _guarded_turns.set(guarded)
+    status = "ok"
+    try:
+        yield guarded
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        try:
+            _guarded_turns.reset(token)
+        except ValueError:
+            pass  # an abandoned stream finalized from another context
+        for trace_id in guarded:
+            end_turn(trace_id, status=status)
+
+
+class TracedToolNode(ToolNode):
+    """
+    ToolNode that records a `tool_node` span per step and a `tool` span per tool
+    call, with the matching latency metrics, and adds the step's tool usage to
+    the thread totals in the state's `usage` (see usage.py).
+    """
+
+    def _func(self, input, config, *, store):
+        with self._node_scope(input, config) as calls:
+            output = super()._func(input, config, store=store)
+        return _with_tool_usage(output, input, config, calls)
+
+    async def _afunc(self, input, config, *, store):
+        with self._node_scope(input, config) as calls:
+            output = await super()._afunc(input, config, store=store)
+        return _with_tool_usage(output, input, config, calls)
+
+    def _run_one(self, call, input_type, config):
+        with _tool_scope(call.get("name"), call.get("args")) as scope:
+            scope.message = super()._run_one(call, input_type, config)
+            return scope.message
+
+    async def _arun_one(self, call, input_type, config):
+        with _tool_scope(call.get("name"), call.get("args")) as scope:
+            scope.message = await super()._arun_one(call, input_type, config)
+            return scope.message
+
+    @contextmanager
+    def _node_scope(self, state, config):
+        trace_id = _state_field(state, "trace_id")
+        workflow_token = metrics.set_workflow(_state_field(state, "workflow"))
+        calls: List[Dict[str, Any]] = []
+        calls_token = _tool_calls.set(calls)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            with span("tool_node", trace_id=trace_id, thread_id=thread_id_of(config)):
+                with (
+                    deadlines.deadline_scope(_state_field(state, "deadline")),
+                    read_cache.turn_scope(trace_id),
+                    cassette.turn_scope(trace_id),
+                ):
+                    yield calls
+        except BaseException:
+            status = "error"
+            end_turn(trace_id, status="error")
+            raise
+        finally:
+            metrics.node_duration.observe(time.perf_counter() - started, node="tool_node", status=status)
+            metrics.reset_workflow(workflow_token)
+            _tool_calls.reset(calls_token)
+
+
+def _with_tool_usage(output: Any, state: Any, config: Any, calls: List[Dict[str, Any]]) -> Any:
+    if not isinstance(output, dict) or not calls:
+        return output
+    delta = usage.tool_call_usage(_state_field(state, "workflow"), calls)
+    usage.ledger.record(delta, thread_id_of(config))
+    return {**output, "usage": usage.merge_usage(_state_field(state, "usage"), delta)}
+
+
+class _ToolScope:
+    __slots__ = ("message",)
+
+    def __init__(self):
+        self.message = None
+
+
+@contextmanager
+def _tool_scope(tool_name: Optional[str], args: Any = None):
+    scope = _ToolScope()
+    started = time.perf_counter()
+    status = "error"
+    with span("tool", tool=tool_name) as tool_span:
+        try:
+            yield scope
+            status = getattr(scope.message, "status", None) or "success"
+            tool_span.set(status=status)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.tool_duration.observe(seconds, tool=tool_name, status=status)
+            result = getattr(scope.message, "content", None)
+            calls = _tool_calls.get()
+            if calls is not None:
+                calls.append({"tool": tool_name, "seconds": seconds, "result": result, "status": status})
+            cassette.record_tool(tool_name, args, result, status, seconds)
+
+
+def _state_field(state: Any, field: str) -> Optional[str]:
+    if isinstance(state, dict):
+        return state.get(field)
+    return getattr(state, field, None)
@@ -0,0 +1,230 @@
+"""
+Per-thread and per-workflow token, cost and call accounting, with budgets.
+
+Each model call and tool step adds its usage to the thread totals in the graph
+state's `usage` field, so they are saved with the thread's checkpoints:
+
+    {"input_tokens", "output_tokens", "model_calls", "model_seconds", "cost_usd",
+     "tool_calls", "tool_seconds", "tool_result_tokens",
+     "workflows": {workflow: {same totals}},
+     "tools": {tool: {"calls", "seconds", "result_tokens", "errors"}}}
+
+The same deltas go into a process-wide `ledger`, which `webapp.py` serves at
+`/usage` to show which workflows and tools drive cost and latency (summed over
+serve.py's workers by worker_stats.py).
+
+`COPILOT_THREAD_TOKEN_BUDGET` (default 0: no budget) caps the tokens one thread
+may use. `COPILOT_THREAD_TOKEN_BUDGET_<WORKFLOW>` overrides it for one workflow.
+When a thread reaches `COPILOT_BUDGET_COMPACT_RATIO` of its budget (default
+0.8), chat_node sends the model only the most recent messages, up to
+`COPILOT_COMPACT_KEEP_TOKENS` (default 2000). Once the budget is used up, the
+tools in EXPENSIVE_TOOLS are no longer offered to the model.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from context_enricher import estimate_tokens
+from intents import message_text
+
+THREAD_TOKEN_BUDGET = int(os.environ.get("COPILOT_THREAD_TOKEN_BUDGET", "0"))
+BUDGET_COMPACT_RATIO = float(os.environ.get("COPILOT_BUDGET_COMPACT_RATIO", "0.8"))
+COMPACT_KEEP_TOKENS = int(os.environ.get("COPILOT_COMPACT_KEEP_TOKENS", "2000"))
+REPORT_TOP_THREADS = 20
+LEDGER_MAX_THREADS = 1000
+
+# Tools that write many rows or produce large documents; refused once a thread is over budget.
+EXPENSIVE_TOOLS = frozenset({"generate_wbs", "create_agreements_from_estimate", "apply_proposals", "export_quote"})
+
+BUDGET_EXHAUSTED_NOTE = (
+    "This conversation has used up its token budget. Do not start new drafting or generation work; "
+    "answer briefly and suggest starting a new conversation for larger changes."
+)
+
+
+def merge_usage(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Add the numbers in `right` to `left`, recursing into nested totals.
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if isinstance(value, dict):
+            merged[key] = merge_usage(merged.get(key), value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _with_workflow(totals: Dict[str, Any], workflow: Optional[str]) -> Dict[str, Any]:
+    return {**totals, "workflows": {workflow or "none": dict(totals)}}
+
+
+def model_call_usage(
+    workflow: Optional[str], input_tokens: int, output_tokens: int, seconds: float, cost_usd: Optional[float]
+) -> Dict[str, Any]:
+    return _with_workflow(
+        {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "model_calls": 1,
+            "model_seconds": seconds,
+            "cost_usd": cost_usd or 0.0,
+        },
+        workflow,
+    )
+
+
+def tool_call_usage(workflow: Optional[str], calls: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Usage delta for tool calls given as `{"tool", "seconds", "result", "status"}` dicts.
+    """
+    delta: Dict[str, Any] = {}
+    for call in calls:
+        result_tokens = estimate_tokens(str(call.get("result") or ""))
+        delta = merge_usage(
+            delta,
+            {
+                **_with_workflow(
+                    {"tool_calls": 1, "tool_seconds": call["seconds"], "tool_result_tokens": result_tokens},
+                    workflow,
+                ),
+                "tools": {
+                    call["tool"] or "unknown": {
+                        "calls": 1,
+                        "seconds": call["seconds"],
+                        "result_tokens": result_tokens,
+                        "errors": 1 if call.get("status") == "error" else 0,
+                    }
+                },
+            },
+        )
+    return delta
+
+
+def thread_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    usage = usage or {}
+    return int(usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+
+def budget_for(workflow: Optional[str]) -> int:
+    if workflow:
+        override = os.environ.get(f"COPILOT_THREAD_TOKEN_BUDGET_{workflow.upper()}")
+        if override:
+            return int(override)
+    return THREAD_TOKEN_BUDGET
+
+
+def budget_status(usage: Optional[Dict[str, Any]], workflow: Optional[str]) -> str:
+    """
+    "ok", "compact" (near the budget) or "exhausted".
+    """
+    budget = budget_for(workflow)
+    if budget <= 0:
+        return "ok"
+    used = thread_tokens(usage)
+    if used >= budget:
+        return "exhausted"
+    if used >= budget * BUDGET_COMPACT_RATIO:
+        return "compact"
+    return "ok"
+
+
+def compact_history(messages: Sequence[BaseMessage], keep_tokens: int = COMPACT_KEEP_TOKENS) -> List[BaseMessage]:
+    """
+    The most recent messages that fit in `keep_tokens`, starting at a user message so
+    no tool result is sent without the call that produced it. The latest user turn is
+    always kept.
+    """
+    start = None
+    used = 0
+    for idx in range(len(messages) - 1, -1, -1):
+        used += estimate_tokens(message_text(messages[idx]))
+        if isinstance(messages[idx], HumanMessage):
+            if start is not None and used > keep_tokens:
+                break
+            start = idx
+    return list(messages[start:]) if start is not None else list(messages)
+
+
+class UsageLedger:
+    """
+    Process-wide usage totals, per workflow, tool and (most recently active) thread.
+    """
+
+    def __init__(self, max_threads: int = LEDGER_MAX_THREADS):
+        self.max_threads = max_threads
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Any] = {}
+        self._threads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def record(self, delta: Dict[str, Any], thread_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._totals = merge_usage(self._totals, delta)
+            if thread_id:
+                self._threads[thread_id] = merge_usage(self._threads.get(thread_id), delta)
+                self._threads.move_to_end(thread_id)
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Totals with workflows sorted by cost and tools by time spent.
+        """
+        with self._lock:
+            totals = dict(self._totals)
+            threads = dict(self._threads)
+        return usage_report(totals, threads)
+
+    def export(self) -> Dict[str, Any]:
+        """
+        The totals and each thread's tokens and cost, as JSON-serialisable data for
+        `merged_report` in another process.
+        """
+        with self._lock:
+            totals = dict(self._totals)
+            threads = {
+                thread_id: {key: usage.get(key, 0) for key in ("input_tokens", "output_tokens", "cost_usd")}
+                for thread_id, usage in self._threads.items()
+            }
+        return {"totals": totals, "threads": threads}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._totals = {}
+            self._threads.clear()
+
+
+def usage_report(totals: Dict[str, Any], threads: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    totals = dict(totals)
+    workflows = totals.pop("workflows", {})
+    tools = totals.pop("tools", {})
+    top_threads = sorted(threads.items(), key=lambda item: thread_tokens(item[1]), reverse=True)
+    return {
+        "totals": totals,
+        "workflows": dict(sorted(workflows.items(), key=lambda item: item[1].get("cost_usd", 0), reverse=True)),
+        "tools": dict(sorted(tools.items(), key=lambda item: item[1].get("seconds", 0), reverse=True)),
+        "threads": [
+            {"thread_id": thread_id, "tokens": thread_tokens(usage), "cost_usd": usage.get("cost_usd", 0)}
+            for thread_id, usage in top_threads[:REPORT_TOP_THREADS]
+        ],
+    }
+
+
+def merged_report(exports: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The report for several ledgers' `export()`s; a thread continued on another worker is added up.
+    """
+    totals: Dict[str, Any] = {}
+    threads: Dict[str, Dict[str, Any]] = {}
+    for exported in exports:
+        totals = merge_usage(totals, exported.get("totals"))
+        for thread_id, usage in (exported.get("threads") or {}).items():
+            threads[thread_id] = merge_usage(threads.get(thread_id), usage)
+    return usage_report(totals, threads)
+
+
+ledger = UsageLedger()
@@ -0,0 +1,78 @@
+"""
+Operational HTTP routes served next to the LangGraph API.
+
+langgraph.json mounts this app through `"http": {"app": "./webapp.py:app"}`, so
+the routes share the agent's process (and therefore its in-process metrics).
+The production server in serve.py includes the same `router`; with several
+workers, `/metrics` and `/usage` cover all of them (worker_stats.py), while
+`/debug/memory` describes the worker that answered.
+"""
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+import memory_diagnostics
+import worker_stats
+from startup import readiness
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    return PlainTextResponse(worker_stats.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/debug/memory")
+def memory_report(snapshot: bool = False, limit: int = 10):
+    """
+    Allocation snapshot summary, growth alert and the largest thread states.
+    Pass `snapshot=true` to take a fresh snapshot instead of returning the last periodic one;
+    that needs COPILOT_MEMORY_DIAGNOSTICS=1, so the route can never switch tracemalloc on.
+    """
+    monitor = memory_diagnostics.monitor
+    # Memory is per process; say which one answered.
+    worker = {"worker": worker_stats.worker_id()}
+    if snapshot:
+        if not monitor.running:
+            return JSONResponse(
+                {
+                    **monitor.report(limit=limit),
+                    **worker,
+                    "error": "Memory diagnostics are off; set COPILOT_MEMORY_DIAGNOSTICS=1.",
+                },
+                status_code=409,
+            )
+        monitor.take_snapshot()
+    return {**monitor.report(limit=limit), **worker}
+
+
+@router.get("/usage")
+def usage_report():
+    """
+    Token, cost and latency totals since the server started, by workflow, tool and thread.
+    """
+    return worker_stats.usage_report()
+
+
+@router.get("/live")
+def live():
+    """
+    Liveness: the process is up and serving HTTP.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+def ready():
+    """
+    Readiness: 200 once the warm-up in startup.py has finished, 503 before (or if a required step failed).
+    """
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+app = FastAPI(title="Copilot agent operations")
+app.include_router(router)
@@ -0,0 +1,113 @@
+"""
+`/metrics` and `/usage` for the whole server when serve.py runs several workers.
+
+Every worker process keeps its own metrics registry and usage ledger, and the OS
+hands each scrape to whichever worker accepts it. When `COPILOT_METRICS_DIR` is
+set (serve.py points it at a fresh temporary directory when it starts more than
+one worker), each worker writes a snapshot of both to `<dir>/worker-<pid>.json`
+every `COPILOT_METRICS_SNAPSHOT_SECONDS` (default 5) and removes it at shutdown.
+The worker that answers `/metrics` or `/usage` refreshes its own snapshot and
+merges all of them: counters, histograms and usage totals are summed, gauges
+keep one series per worker under a `worker` label. A snapshot not refreshed for
+`COPILOT_METRICS_STALE_SECONDS` (default 60) belongs to a worker that died and
+is skipped; its counters restart from zero with its replacement, as Prometheus
+expects of a restarted process.
+
+Without `COPILOT_METRICS_DIR` (one worker, or `langgraph dev`) the routes
+report the process they run in, as before.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import metrics
+import usage
+
+METRICS_DIR = os.environ.get("COPILOT_METRICS_DIR", "")
+SNAPSHOT_SECONDS = float(os.environ.get("COPILOT_METRICS_SNAPSHOT_SECONDS", "5"))
+STALE_SECONDS = float(os.environ.get("COPILOT_METRICS_STALE_SECONDS", "60"))
+
+
+def worker_id() -> str:
+    return str(os.getpid())
+
+
+def snapshot_path(directory: Optional[str] = None) -> Path:
+    return Path(directory or METRICS_DIR) / f"worker-{worker_id()}.json"
+
+
+def write_snapshot(directory: Optional[str] = None) -> None:
+    """
+    Replace this worker's snapshot; readers never see a half-written file.
+    """
+    path = snapshot_path(directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"worker": worker_id(), "metrics": metrics.export(), "usage": usage.ledger.export()}
+    # The publisher task and a scrape can both write at once; each gets its own temporary file.
+    partial = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    partial.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(partial, path)
+
+
+def remove_snapshot(directory: Optional[str] = None) -> None:
+    try:
+        snapshot_path(directory).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def read_snapshots(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Every live worker's snapshot, this worker's included.
+    """
+    snapshots = []
+    cutoff = time.time() - STALE_SECONDS
+    for path in sorted(Path(directory or METRICS_DIR).glob("worker-*.json")):
+        try:
+            if path.stat().st_mtime < cutoff:
+                continue
+            snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+        except (FileNotFoundError, ValueError):
+            continue  # the worker exited, or the file is from something else
+    return snapshots
+
+
+def _current_snapshots() -> List[Dict[str, Any]]:
+    write_snapshot()
+    return read_snapshots()
+
+
+def render_metrics() -> str:
+    """
+    The `/metrics` page: every worker's metrics when they are shared, else this process's.
+    """
+    if not METRICS_DIR:
+        return metrics.render()
+    return metrics.render_workers({snapshot["worker"]: snapshot["metrics"] for snapshot in _current_snapshots()})
+
+
+def usage_report() -> Dict[str, Any]:
+    """
+    The `/usage` report: every worker's ledger when they are shared, else this process's.
+    """
+    if not METRICS_DIR:
+        return usage.ledger.report()
+    snapshots = _current_snapshots()
+    return {**usage.merged_report(snapshot["usage"] for snapshot in snapshots), "workers": len(snapshots)}
+
+
+async def publish_periodically(interval: float = SNAPSHOT_SECONDS) -> None:
+    """
+    Keep this worker's snapshot fresh so the other workers can report it (serve.py lifespan).
+    """
+    while True:
+        try:
+            await asyncio.to_thread(write_snapshot)
+        except Exception as exc:
+            print(f"[Copilot][metrics] Writing the worker snapshot failed: {exc}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,256 @@
+"""
+Write-behind queue for non-critical audit writes.
+
+System notes on agreements (the ones `apply_proposals` leaves behind) used to
+be POSTed one row at a time inside the turn; notes the user asks for with
+`add_agreement_note` still are, so the tool can report a failed insert. They now go into a queue and a background thread sends them as bulk
+inserts when `COPILOT_WRITE_BEHIND_BATCH` rows are waiting (default 50) or
+`COPILOT_WRITE_BEHIND_INTERVAL_MS` has passed since the last flush (default
+1000). Reads that depend on the queued rows (`summarize_pushbacks`, the
+response cache's version stamp) flush the agreement's rows first, so a turn
+always sees its own notes.
+
+At most `COPILOT_WRITE_BEHIND_MAX_PENDING` rows wait at once (default 10000);
+further rows are dropped, counted and logged. A batch that fails transiently
+(connection error, timeout, 5xx, 408/429) keeps its rows and tries again on
+the next interval. A batch the database rejects (any other 4xx, e.g. a note on
+an agreement deleted since) is retried row by row, so one bad row cannot hold
+up the rest of the queue; rows that are still rejected are dropped, counted
+with reason "rejected", and appended to `<COPILOT_WRITE_BEHIND_SPOOL>/<queue>.rejected.jsonl`
+when a spool directory is set. `close()` (at shutdown) flushes everything; rows
+that still cannot be sent are appended to `<COPILOT_WRITE_BEHIND_SPOOL>/<queue>.jsonl`
+when a spool directory is set, and re-queued by the next process that starts
+(with several workers, only the first to rename the spool file re-queues it).
+
+`COPILOT_WRITE_BEHIND=0` sends every write synchronously, as before.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+WRITE_BEHIND_ENABLED = os.environ.get("COPILOT_WRITE_BEHIND", "1") != "0"
+BATCH_SIZE = int(os.environ.get("COPILOT_WRITE_BEHIND_BATCH", "50"))
+FLUSH_SECONDS = float(os.environ.get("COPILOT_WRITE_BEHIND_INTERVAL_MS", "1000")) / 1000
+MAX_PENDING = int(os.environ.get("COPILOT_WRITE_BEHIND_MAX_PENDING", "10000"))
+SPOOL_DIR = os.environ.get("COPILOT_WRITE_BEHIND_SPOOL", "")
+CLOSE_TIMEOUT_SECONDS = 10.0
+
+Row = Dict[str, Any]
+# Client errors that are worth retrying; any other 4xx means the rows themselves are bad.
+TRANSIENT_CLIENT_STATUSES = {408, 425, 429}
+
+
+def is_rejection(exc: BaseException) -> bool:
+    """
+    True if `exc` is an HTTP error saying the rows can never be inserted as they are.
+    """
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in TRANSIENT_CLIENT_STATUSES
+
+
+class WriteBehindQueue:
+    """
+    Rows waiting to be bulk-inserted by `send(rows)`, each tagged with a key (e.g. the
+    agreement id) so readers can flush just the rows they depend on.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[List[Row]], Any],
+        batch_size: int = BATCH_SIZE,
+        flush_seconds: float = FLUSH_SECONDS,
+        max_pending: int = MAX_PENDING,
+        spool_dir: str = SPOOL_DIR,
+    ):
+        self.name = name
+        self.send = send
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.spool_path = Path(spool_dir) / f"{name}.jsonl" if spool_dir else None
+        self._cond = threading.Condition()
+        # Sends are serialized so a keyed flush cannot overtake a batch already in flight.
+        self._send_lock = threading.Lock()
+        self._pending: List[Tuple[Optional[str], Row]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._load_spool()
+
+    def enqueue(self, row: Row, key: Optional[str] = None) -> bool:
+        """
+        Queue `row`. Returns False (and counts a drop) if the queue is full or closed.
+        """
+        with self._cond:
+            if self._closed or len(self._pending) >= self.max_pending:
+                reason = "closed" if self._closed else "full"
+                metrics.write_queue_dropped.inc(queue=self.name, reason=reason)
+                print(f"[Copilot][write-behind] Dropped a {self.name} row: queue {reason}")
+                return False
+            self._pending.append((key, row))
+            self._set_depth()
+            self._start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def pending(self, key: Optional[str] = None) -> int:
+        with self._cond:
+            return sum(1 for item_key, _ in self._pending if key is None or item_key == key)
+
+    def flush(self, key: Optional[str] = None, trigger: str = "read") -> int:
+        """
+        Send the pending rows (only those for `key`, if given) now, in batches.
+        Returns the number of rows sent; rows whose batch failed go back to the queue.
+        """
+        with self._send_lock:
+            with self._cond:
+                if key is None:
+                    batch, self._pending = self._pending, []
+                else:
+                    batch = [item for item in self._pending if item[0] == key]
+                    self._pending = [item for item in self._pending if item[0] != key]
+            sent = 0
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                try:
+                    self.send([row for _, row in chunk])
+                except Exception as exc:
+                    if is_rejection(exc):
+                        sent += self._send_one_by_one(chunk)
+                        continue
+                    metrics.write_queue_flush_failures.inc(queue=self.name)
+                    print(f"[Copilot][write-behind] Flushing {len(chunk)} {self.name} rows failed: {exc}")
+                    with self._cond:
+                        self._pending[:0] = batch[start:]
+                    break
+                sent += len(chunk)
+            if sent:
+                metrics.write_queue_flushed.inc(sent, queue=self.name, trigger=trigger)
+            with self._cond:
+                self._set_depth()
+            return sent
+
+    def _send_one_by_one(self, chunk: List[Tuple[Optional[str], Row]]) -> int:
+        """
+        Retry a rejected batch row by row: send the good rows, dead-letter the rejected
+        ones and re-queue the rest if the backend starts failing. Send lock held.
+        """
+        sent = 0
+        rejected = []
+        for index, (key, row) in enumerate(chunk):
+            try:
+                self.send([row])
+            except Exception as exc:
+                if not is_rejection(exc):
+                    metrics.write_queue_flush_failures.inc(queue=self.name)
+                    with self._cond:
+                        self._pending[:0] = chunk[index:]
+                    break
+                rejected.append((key, row, str(exc)))
+                continue
+            sent += 1
+        if rejected:
+            self._dead_letter(rejected)
+        return sent
+
+    def _dead_letter(self, rejected: List[Tuple[Optional[str], Row, str]]) -> None:
+        metrics.write_queue_dropped.inc(len(rejected), queue=self.name, reason="rejected")
+        print(f"[Copilot][write-behind] Dropped {len(rejected)} {self.name} rows the database rejected: {rejected[0][2]}")
+        if self.spool_path is None:
+            return
+        path = self.spool_path.with_suffix(".rejected.jsonl")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as dead_letters:
+            for key, row, error in rejected:
+                dead_letters.write(json.dumps({"key": key, "row": row, "error": error}) + "\n")
+
+    def close(self, timeout: float = CLOSE_TIMEOUT_SECONDS) -> None:
+        """
+        Stop the flusher, send everything still queued and spool what cannot be sent.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush(trigger="shutdown")
+        with self._cond:
+            leftover, self._pending = self._pending, []
+            self._set_depth()
+        if not leftover:
+            return
+        if self.spool_path is None:
+            metrics.write_queue_dropped.inc(len(leftover), queue=self.name, reason="shutdown")
+            print(f"[Copilot][write-behind] Dropped {len(leftover)} unsent {self.name} rows at shutdown")
+            return
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.spool_path.open("a", encoding="utf-8") as spool:
+            for key, row in leftover:
+                spool.write(json.dumps({"key": key, "row": row}) + "\n")
+        print(f"[Copilot][write-behind] Spooled {len(leftover)} unsent {self.name} rows to {self.spool_path}")
+
+    def _start(self) -> None:
+        # Called with the lock held; the flusher thread starts with the first queued row.
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.batch_size,
+                    timeout=max(0.0, last_flush + self.flush_seconds - time.monotonic()),
+                )
+                if self._closed:
+                    return
+                full = len(self._pending) >= self.batch_size
+                due = time.monotonic() - last_flush >= self.flush_seconds
+                if not self._pending or not (full or due):
+                    if due:
+                        last_flush = time.monotonic()
+                    continue
+            queued = self.pending()
+            sent = self.flush(trigger="size" if full else "interval")
+            last_flush = time.monotonic()
+            if sent < queued:
+                # Back off for one interval instead of hammering a failing backend.
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=self.flush_seconds)
+
+    def _load_spool(self) -> None:
+        if self.spool_path is None:
+            return
+        # Every serve.py worker loads the spool at import. Renaming it first is atomic, so
+        # exactly one of them claims the rows and the others find no file.
+        claimed = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}-{id(self)}.claimed")
+        try:
+            os.replace(self.spool_path, claimed)
+        except FileNotFoundError:
+            return
+        entries = []
+        for line in claimed.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                entries.append((entry.get("key"), entry["row"]))
+        claimed.unlink()
+        with self._cond:
+            self._pending.extend(entries)
+            self._set_depth()
+            if entries:
+                self._start()
+        print(f"[Copilot][write-behind] Re-queued {len(entries)} spooled {self.name} rows")
+
+    def _set_depth(self) -> None:
+        metrics.write_queue_depth.set(len(self._pending), queue=self.name)
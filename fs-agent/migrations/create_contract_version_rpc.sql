@@ -0,0 +1,100 @@
+-- Migration: Allocate contract version numbers atomically
+-- Run this in your Supabase SQL editor
+
+-- Renumber any duplicates left behind by concurrent writers before adding the constraint
+WITH ranked AS (
+  SELECT id,
+         ROW_NUMBER() OVER (PARTITION BY agreement_id ORDER BY version_number, created_at, id) AS version_number
+  FROM contract_versions
+)
+UPDATE contract_versions v
+SET version_number = ranked.version_number
+FROM ranked
+WHERE v.id = ranked.id
+  AND v.version_number IS DISTINCT FROM ranked.version_number
+  AND EXISTS (
+    SELECT 1 FROM contract_versions d
+    WHERE d.agreement_id = v.agreement_id
+    GROUP BY d.agreement_id, d.version_number
+    HAVING COUNT(*) > 1
+  );
+
+UPDATE contract_agreements a
+SET current_version = latest.version_number
+FROM (
+  SELECT agreement_id, MAX(version_number) AS version_number
+  FROM contract_versions
+  GROUP BY agreement_id
+) latest
+WHERE a.id = latest.agreement_id
+  AND a.current_version IS DISTINCT FROM latest.version_number;
+
+-- One row per (agreement, version number); also serves the latest-version lookup
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint WHERE conname = 'contract_versions_agreement_version_key'
+  ) THEN
+    ALTER TABLE contract_versions
+    ADD CONSTRAINT contract_versions_agreement_version_key UNIQUE (agreement_id, version_number);
+  END IF;
+END $$;
+
+-- Drop earlier signatures so PostgREST never sees two overloads.
+DO $$
+DECLARE
+  existing regprocedure;
+BEGIN
+  FOR existing IN SELECT oid::regprocedure FROM pg_proc WHERE proname = 'create_contract_version' LOOP
+    EXECUTE 'DROP FUNCTION ' || existing;
+  END LOOP;
+END $$;
+
+-- Insert the next version of an agreement and make it current, in one transaction.
+-- The agreement row is locked first, so concurrent callers are serialized and each
+-- gets the next number; no client-side read of current_version is needed.
+-- Callers that edited the content they read pass the version they read as
+-- p_expected_version; if another version was created since, the call fails with
+-- HTTP 409 (SQLSTATE PT409) instead of overwriting that version's changes.
+CREATE OR REPLACE FUNCTION create_contract_version(
+  p_agreement_id contract_agreements.id%TYPE,
+  p_content contract_versions.content%TYPE,
+  p_notes contract_versions.notes%TYPE DEFAULT NULL,
+  p_created_by contract_versions.created_by%TYPE DEFAULT NULL,
+  p_expected_version INTEGER DEFAULT NULL
+)
+RETURNS contract_versions
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  locked_version INTEGER;
+  next_version INTEGER;
+  created contract_versions;
+BEGIN
+  SELECT COALESCE(current_version, 0) INTO locked_version
+  FROM contract_agreements WHERE id = p_agreement_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Agreement % not found', p_agreement_id USING ERRCODE = 'no_data_found';
+  END IF;
+  IF p_expected_version IS NOT NULL AND locked_version <> p_expected_version THEN
+    RAISE EXCEPTION 'Agreement % is at version %, not %', p_agreement_id, locked_version, p_expected_version
+      USING ERRCODE = 'PT409';
+  END IF;
+
+  SELECT COALESCE(MAX(version_number), 0) + 1 INTO next_version
+  FROM contract_versions
+  WHERE agreement_id = p_agreement_id;
+
+  INSERT INTO contract_versions (agreement_id, version_number, content, notes, created_by)
+  VALUES (p_agreement_id, next_version, p_content, p_notes, p_created_by)
+  RETURNING * INTO created;
+
+  UPDATE contract_agreements
+  SET content = p_content,
+      current_version = next_version,
+      updated_at = NOW()
+  WHERE id = p_agreement_id;
+
+  RETURN created;
+END;
+$$;
@@ -4,7 +4,7 @@ import {
   copilotRuntimeNextJSAppRouterEndpoint,
 } from "@copilotkit/runtime";
 
-import { LangGraphAgent } from "@ag-ui/langgraph"
+import { LangGraphAgent, LangGraphHttpAgent } from "@ag-ui/langgraph"
 import { NextRequest } from "next/server";
  
 // 1. You can use any service adapter here for multi-agent support. We use
@@ -12,14 +12,19 @@ import { NextRequest } from "next/server";
 const serviceAdapter = new ExperimentalEmptyAdapter();
  
 // 2. Create the CopilotRuntime instance and utilize the LangGraph AG-UI
-//    integration to setup the connection.
-const runtime = new CopilotRuntime({
-  agents: {
-    "sample_agent": new LangGraphAgent({
+//    integration to setup the connection. LANGGRAPH_AGUI_URL points at the
+//    production server (agent/serve.py); otherwise talk to `langgraph dev`.
+const sampleAgent = process.env.LANGGRAPH_AGUI_URL
+  ? new LangGraphHttpAgent({ url: process.env.LANGGRAPH_AGUI_URL })
+  : new LangGraphAgent({
       deploymentUrl: process.env.LANGGRAPH_DEPLOYMENT_URL || "http://localhost:8123",
       graphId: "sample_agent",
       langsmithApiKey: process.env.LANGSMITH_API_KEY || "",
-    }),
+    });
+
+const runtime = new CopilotRuntime({
+  agents: {
+    "sample_agent": sampleAgent,
   }
 });
  
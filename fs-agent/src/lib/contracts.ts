@@ -248,44 +248,20 @@ export async function createVersion(
   agreementId: string,
   payload: VersionPayload,
 ): Promise<AgreementVersion> {
-  // Get current version number
-  const { data: agreement, error: agreementError } = await supabase
-    .from("contract_agreements")
-    .select("current_version")
-    .eq("id", agreementId)
-    .single();
-  if (agreementError) {
-    throw agreementError;
-  }
-
-  const newVersionNumber = (agreement.current_version as number) + 1;
-
-  // Create new version
+  // The database allocates the version number and updates the agreement in one
+  // transaction (migrations/create_contract_version_rpc.sql).
   const { data: version, error: versionError } = await supabase
-    .from("contract_versions")
-    .insert({
-      agreement_id: agreementId,
-      version_number: newVersionNumber,
-      content: payload.content,
-      created_by: payload.created_by ?? null,
-      notes: payload.notes ?? null,
+    .rpc("create_contract_version", {
+      p_agreement_id: agreementId,
+      p_content: payload.content,
+      p_notes: payload.notes ?? null,
+      p_created_by: payload.created_by ?? null,
     })
-    .select()
     .single();
   if (versionError) {
     throw versionError;
   }
 
-  // Update agreement with new version and content
-  await supabase
-    .from("contract_agreements")
-    .update({
-      current_version: newVersionNumber,
-      content: payload.content,
-      updated_at: new Date().toISOString(),
-    })
-    .eq("id", agreementId);
-
   return version as AgreementVersion;
 }
 